@@ -1,10 +1,17 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from routers import locations, camera, upload
 from routers.rtsp_camera import router as rtsp_router
 from routers.threat_analysis import router as threat_router
 import asyncio
 from services.video_processor import video_processor
+from services.inference_scheduler import inference_scheduler
+from services.model_backend import get_model_status
+from services.rtsp_camera import rtsp_camera_service
+from services.capture_workers import capture_pool
+from services.count_store import count_store
+from services.stream_resolver import stream_resolver
 from fastapi import WebSocket, WebSocketDisconnect
 
 app = FastAPI(title="Crowdex Backend", version="2.0.0")
@@ -25,13 +32,47 @@ app.include_router(camera.router)
 app.include_router(rtsp_router)
 app.include_router(threat_router)  # Threat Analysis (Fight/Bomb/Accident detection)
 
+@app.on_event("startup")
+async def warm_up_models():
+    # Load and warm up the detector replicas in background threads so the
+    # server starts accepting requests immediately; /api/ready reports progress.
+    inference_scheduler.start()
+    # Capture threads resolve YouTube URLs on this loop (refreshes run here too)
+    stream_resolver.bind()
+    # Keep saved cameras marked "headless" counting without viewers
+    rtsp_camera_service.headless.start()
+
+@app.on_event("shutdown")
+async def stop_capture():
+    # Release camera connections and stop capture worker processes
+    rtsp_camera_service.stop_all_streams()
+    capture_pool.shutdown()
+    count_store.close()
+
 @app.get("/")
 def read_root():
     return {"message": "Crowdex Backend API is running"}
 
 @app.get("/api/health")
 def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "ready": inference_scheduler.is_ready(),
+        "models": get_model_status()
+    }
+
+@app.get("/api/ready")
+def readiness_check():
+    """Readiness probe: 200 once person detection is warmed up, 503 until then."""
+    ready = inference_scheduler.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "models": get_model_status(),
+            "inference": inference_scheduler.get_stats()
+        }
+    )
 
 @app.websocket("/ws/upload/{file_id}/progress")
 async def upload_progress_ws(websocket: WebSocket, file_id: str):
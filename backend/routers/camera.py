@@ -9,8 +9,8 @@ camera_service = CameraService(0)  # Default webcam
 async def websocket_live_endpoint(websocket: WebSocket):
     await websocket.accept()
     try:
-        # Just stream counts
-        async for frame_bytes, count in camera_service.generate_frames():
+        # Just stream counts (no annotation or encoding needed)
+        async for frame_bytes, count in camera_service.generate_frames(annotate=False):
             await websocket.send_json({"count": count})
     except WebSocketDisconnect:
         camera_service.stop()
@@ -3,11 +3,22 @@ RTSP Camera Router - Endpoints for public CCTV stream access and YOLO detection
 """
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
-from fastapi.responses import JSONResponse
-from services.rtsp_camera import rtsp_camera_service, PUBLIC_CAMERAS
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from services.rtsp_camera import rtsp_camera_service, PUBLIC_CAMERAS, STREAM_VARIANTS
+from services.stream_hub import stream_hub
+from services.stream_metrics import render_prometheus
+from services.frame_protocol import pack_frame
+from services.clip_recorder import clip_recorder
+from services.inference_scheduler import inference_scheduler
+from services.rate_controller import rate_controller
+from services.capture_workers import capture_pool
+from services.count_store import count_store, LEVELS_BY_NAME
 from pydantic import BaseModel
 from typing import Optional
 import asyncio
+import time
+import numpy as np
+import uuid
 
 router = APIRouter(prefix="/api/rtsp", tags=["rtsp-camera"])
 
@@ -22,12 +33,36 @@ class CreateCameraRequest(BaseModel):
     url: str
     location: Optional[str] = "Custom"
     description: Optional[str] = ""
+    # Tiled high-resolution inference for dense crowds
+    tiled: Optional[bool] = False
+    tile_size: Optional[int] = None
+    tile_overlap: Optional[float] = None
+    # Counting engine: "detection", "density" or "auto" (density above density_threshold)
+    counting_engine: Optional[str] = "detection"
+    density_threshold: Optional[int] = None
+    density_calibration: Optional[float] = None
+    # Processing rate bounds; the rate controller stays within them under load
+    min_fps: Optional[float] = None
+    max_fps: Optional[float] = None
+    # Count continuously (at headless_fps, without encoding) even when nobody is watching
+    headless: Optional[bool] = False
+    headless_fps: Optional[float] = None
 
 class UpdateCameraRequest(BaseModel):
     name: Optional[str] = None
     url: Optional[str] = None
     location: Optional[str] = None
     description: Optional[str] = None
+    tiled: Optional[bool] = None
+    tile_size: Optional[int] = None
+    tile_overlap: Optional[float] = None
+    counting_engine: Optional[str] = None
+    density_threshold: Optional[int] = None
+    density_calibration: Optional[float] = None
+    min_fps: Optional[float] = None
+    max_fps: Optional[float] = None
+    headless: Optional[bool] = None
+    headless_fps: Optional[float] = None
 
 
 @router.get("/cameras")
@@ -39,11 +74,11 @@ async def get_available_cameras():
     
     for cam in all_cams:
         # Check if stream is active
-        status = rtsp_camera_service.get_stream_status(cam["id"])
+        uptime = rtsp_camera_service.get_uptime(cam["id"])
         cameras.append({
             **cam,
-            "is_active": status is not None,
-            "uptime": status["uptime"] if status else 0
+            "is_active": uptime is not None,
+            "uptime": uptime or 0
         })
     return {"cameras": cameras}
 
@@ -80,7 +115,7 @@ async def start_stream(request: StartStreamRequest):
     if not request.camera_id and not request.custom_url:
         raise HTTPException(status_code=400, detail="Either camera_id or custom_url is required")
     
-    success = rtsp_camera_service.start_stream(
+    success = await rtsp_camera_service.start_stream(
         camera_id=camera_id,
         custom_url=request.custom_url
     )
@@ -92,8 +127,11 @@ async def start_stream(request: StartStreamRequest):
 
 
 @router.post("/stream/stop/{camera_id}")
-async def stop_stream(camera_id: str):
-    """Stop a camera stream"""
+async def stop_stream(camera_id: str, force: bool = False):
+    """Stop a camera stream (kept running while other viewers are subscribed unless forced)"""
+    subscribers = stream_hub.subscriber_count(camera_id)
+    if subscribers > 0 and not force:
+        return {"status": "in_use", "camera_id": camera_id, "subscribers": subscribers}
     rtsp_camera_service.stop_stream(camera_id)
     return {"status": "stopped", "camera_id": camera_id}
 
@@ -105,17 +143,151 @@ async def get_stream_status(camera_id: str):
     if status:
         return status
     else:
-        return {"id": camera_id, "active": False}
+        # Stopped streams report why they ended ("stopped", "idle" or "failed")
+        return {"id": camera_id, "active": False, "health": rtsp_camera_service.ended_streams.get(camera_id)}
+
+
+@router.get("/metrics")
+async def get_stream_metrics(format: str = "json"):
+    """
+    Per-stream performance metrics (capture FPS, stage timings p50/p95/p99, drops, reconnects, viewers)
+    format: "json" (default) or "prometheus" (text exposition format for scraping)
+    """
+    streams = rtsp_camera_service.get_metrics()
+    if format == "prometheus":
+        return PlainTextResponse(render_prometheus(streams), media_type="text/plain; version=0.0.4")
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'prometheus'")
+    return {
+        "timestamp": time.time(),
+        "streams": streams,
+        "inference": inference_scheduler.get_stats(),
+        "rate_control": rate_controller.get_stats(),
+        "capture_workers": capture_pool.get_stats(),
+        "headless": rtsp_camera_service.headless.get_stats(),
+        "count_store": count_store.get_stats()
+    }
+
+
+@router.post("/clips/{camera_id}")
+async def save_camera_clip(camera_id: str, pre_seconds: Optional[float] = None, post_seconds: Optional[float] = None):
+    """
+    Save a clip of an active camera around now (pre-event frames from the buffer, post-event as they arrive)
+    Fetch it from /api/threat/clips/{clip_id} once written
+    """
+    kwargs = {}
+    if pre_seconds is not None:
+        kwargs["pre_seconds"] = pre_seconds
+    if post_seconds is not None:
+        kwargs["post_seconds"] = post_seconds
+    clip_id = str(uuid.uuid4())
+    if not clip_recorder.request_clip(camera_id, clip_id, time.time(), metadata={"camera_id": camera_id}, **kwargs):
+        raise HTTPException(status_code=404, detail="No buffered frames for this camera (is the stream active?)")
+    return {"status": "recording", "clip_id": clip_id, "camera_id": camera_id}
+
+
+@router.get("/counts/{camera_id}")
+async def get_count_history(
+    camera_id: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    resolution: Optional[str] = None
+):
+    """
+    Recorded person counts of a camera (headless cameras record continuously)
+    start/end: Unix timestamps (default: the last hour up to now)
+    resolution: "1s", "1m", "15m" or "1h" (default: finest with at most 2000 buckets)
+    """
+    if resolution is not None and resolution not in LEVELS_BY_NAME:
+        raise HTTPException(status_code=400, detail=f"Unknown resolution; expected one of {', '.join(LEVELS_BY_NAME)}")
+    end = time.time() if end is None else end
+    start = end - 3600 if start is None else start
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    series = await asyncio.to_thread(count_store.query, camera_id, start, end, resolution)
+    return {
+        "camera_id": camera_id,
+        "resolution": series["resolution"],
+        "timestamps": series["timestamps"].tolist(),
+        "mean": np.round(series["mean"], 2).tolist(),
+        "min": series["min"].tolist(),
+        "max": series["max"].tolist(),
+        "samples": series["samples"].tolist(),
+    }
+
+
+MJPEG_BOUNDARY = "crowdexframe"
+
+
+@router.get("/mjpeg/{camera_id}")
+async def mjpeg_stream(camera_id: str, variant: str = "full", fps: Optional[float] = None):
+    """
+    MJPEG (multipart/x-mixed-replace) stream for <img> tags, video walls and NVRs
+    Serves the camera pipeline's already-encoded frames; no extra inference per client
+    variant: "full", "half" or "thumb"; fps: optional per-client frame rate cap
+    """
+    if variant not in STREAM_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"Unknown variant; expected one of {', '.join(STREAM_VARIANTS)}")
+    if fps is not None and fps <= 0:
+        raise HTTPException(status_code=400, detail="fps must be positive")
+    
+    if not rtsp_camera_service.get_stream_status(camera_id):
+        if not await rtsp_camera_service.start_stream(camera_id):
+            raise HTTPException(status_code=404, detail="Camera not found or stream unavailable")
+    
+    min_interval = 1.0 / fps if fps else 0.0
+    
+    async def parts():
+        frames = rtsp_camera_service.generate_packets(camera_id, variant)
+        last_sent = 0.0
+        try:
+            async for packet in frames:
+                # Per-client cap: skip frames instead of slowing the shared pipeline
+                if packet.timestamp - last_sent < min_interval:
+                    continue
+                last_sent = packet.timestamp
+                jpeg = packet.variants[variant]
+                yield (
+                    f"--{MJPEG_BOUNDARY}\r\n"
+                    f"Content-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(jpeg)}\r\n"
+                    f"X-Person-Count: {packet.count}\r\n\r\n"
+                ).encode() + jpeg + b"\r\n"
+        finally:
+            # Client went away: release the hub subscription
+            await frames.aclose()
+    
+    return StreamingResponse(
+        parts(),
+        media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}",
+        headers={"Cache-Control": "no-cache, no-store", "Pragma": "no-cache"}
+    )
 
 
 @router.websocket("/ws/stream/{camera_id}")
-async def websocket_rtsp_stream(websocket: WebSocket, camera_id: str):
+async def websocket_rtsp_stream(
+    websocket: WebSocket,
+    camera_id: str,
+    variant: str = "full",
+    protocol: str = "json",
+    boxes: bool = False
+):
     """
     WebSocket endpoint for receiving live CCTV stream with YOLO detection
-    Sends: binary JPEG frames alternating with JSON detection data
+    protocol=json (default): binary JPEG frames alternating with JSON detection data
+    protocol=binary: one message per frame, header + optional boxes + JPEG (see services/frame_protocol.py)
+    variant: "full" (640x480), "half" (320x240) or "thumb" (160x120)
+    boxes: include the detection boxes in binary frames
+    All clients of a camera share one inference loop (see services/stream_hub.py)
     """
     await websocket.accept()
-    print(f"[WS] Client connected for camera: {camera_id}")
+    if variant not in STREAM_VARIANTS:
+        await websocket.close(code=1008, reason=f"Unknown variant; expected one of {', '.join(STREAM_VARIANTS)}")
+        return
+    if protocol not in ("json", "binary"):
+        await websocket.close(code=1008, reason="Unknown protocol; expected 'json' or 'binary'")
+        return
+    print(f"[WS] Client connected for camera: {camera_id} ({variant})")
     
     # Start stream if not already active
     # Check if it's a known camera (saved or public) or needs custom URL logic (which should be handled by start_stream mostly)
@@ -125,20 +297,30 @@ async def websocket_rtsp_stream(websocket: WebSocket, camera_id: str):
         # We try simple start. If it logic requires a custom URL not in the saved/public list, 
         # it would have failed before reaching here usually, or we need to pass URL.
         # But for saved cameras, the service knows the URL.
-        rtsp_camera_service.start_stream(camera_id)
+        await rtsp_camera_service.start_stream(camera_id)
     
     # Wait a bit for stream to initialize
     await asyncio.sleep(1)
     
+    frames = rtsp_camera_service.generate_packets(camera_id, variant)
     try:
-        async for frame_bytes, count in rtsp_camera_service.generate_processed_frames(camera_id):
+        async for packet in frames:
             try:
+                if protocol == "binary":
+                    # Header, boxes and JPEG in a single message
+                    await websocket.send_bytes(pack_frame(
+                        packet.seq, packet.count, packet.timestamp, packet.variants[variant],
+                        captured_at=packet.captured_at,
+                        boxes=packet.boxes if boxes else None
+                    ))
+                    continue
+                
                 # Send frame as binary
-                await websocket.send_bytes(frame_bytes)
+                await websocket.send_bytes(packet.variants[variant])
                 
                 # Send detection data as JSON
                 await websocket.send_json({
-                    "count": count,
+                    "count": packet.count,
                     "camera_id": camera_id,
                     "timestamp": asyncio.get_event_loop().time()
                 })
@@ -151,6 +333,8 @@ async def websocket_rtsp_stream(websocket: WebSocket, camera_id: str):
     except Exception as e:
         print(f"[WS] Error in RTSP stream: {e}")
     finally:
+        # Release the hub subscription right away instead of waiting for GC
+        await frames.aclose()
         try:
             await websocket.close()
         except:
@@ -5,13 +5,14 @@ Endpoints:
 - POST /api/threat/analyze - Analyze video for threats (upload or YouTube)
 - GET /api/threat/alerts - Get recent threat alerts
 - PATCH /api/threat/alerts/{id} - Update alert status
+- GET /api/threat/clips/{id} - Pre/post-event clip manifest (and /video to play it)
 - WebSocket /ws/threat/stream/{analysis_id} - Real-time analysis stream
 
 Privacy-First: All alerts are admin-only, never shown on public dashboard.
 """
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Tuple
 import asyncio
@@ -21,6 +22,8 @@ import cv2
 import time
 import base64
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 router = APIRouter(prefix="/api/threat", tags=["Threat Analysis"])
 
@@ -40,60 +43,118 @@ class AlertStatusUpdate(BaseModel):
 # Analysis state storage
 active_analyses = {}
 
+# Threat detectors run in this pool so analyses never block the event loop
+THREAT_WORKERS = int(os.getenv("CROWDEX_THREAT_WORKERS", "3"))
+_detector_pool = ThreadPoolExecutor(max_workers=THREAT_WORKERS, thread_name_prefix="threat-detector")
 
-def get_youtube_stream_url(youtube_url: str) -> Optional[str]:
+# Detectors fed by the shared pose inference
+POSE_THREATS = ("fight", "accident")
+
+
+def _read_sampled_frame(cap, frame_skip: int):
+    """Decode the next frame, then grab() past the frame_skip - 1 frames that are not analysed."""
+    ret, frame = cap.read()
+    skipped = 0
+    if ret:
+        for _ in range(frame_skip - 1):
+            if not cap.grab():
+                break
+            skipped += 1
+    return ret, frame, skipped
+
+
+async def _run_detectors(detectors: dict, frame, timestamp: float):
     """
-    Extract direct stream URL from YouTube live stream or VOD.
-    Uses yt-dlp - tries multiple format options for compatibility.
-    Matches logic in rtsp_camera.py for maximum compatibility.
+    Run the enabled detectors on one frame concurrently in the worker pool.
+    Pose-based detectors wait for the single shared pose inference; the others
+    start right away. Drawing is deferred (see _render_frame).
+    
+    Returns:
+        (pose or None, {threat_type: result}) - failed detectors are left out
     """
-    import subprocess
-    import os
-    
-    # Get the path to yt-dlp in the venv
-    venv_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    yt_dlp_paths = [
-        os.path.join(venv_path, 'venv', 'Scripts', 'yt-dlp.exe'),  # Windows venv
-        os.path.join(venv_path, 'venv', 'bin', 'yt-dlp'),  # Linux venv
-        'yt-dlp',  # System PATH
-        'yt-dlp.exe',  # Windows PATH
-    ]
-    
-    yt_dlp_cmd = None
-    for path in yt_dlp_paths:
-        if os.path.exists(path) or path in ['yt-dlp', 'yt-dlp.exe']:
-            yt_dlp_cmd = path
-            break
-            
-    if not yt_dlp_cmd:
-        print("[ThreatAnalysis] yt-dlp not found")
-        return None
-        
-    # Format options from rtsp_camera.py (proven to work)
-    format_options = [
-        'best[height<=480]',  # Best quality up to 480p
-        'best[height<=720]',  # Best quality up to 720p
-        'worst',  # Worst quality (fastest)
-        'best',  # Best available
-    ]
-    
-    for fmt in format_options:
-        try:
-            print(f"[ThreatAnalysis] Trying {yt_dlp_cmd} with format: {fmt} for {youtube_url}")
-            result = subprocess.run(
-                [yt_dlp_cmd, '-g', '-f', fmt, '--no-warnings', youtube_url],
-                capture_output=True,
-                text=True,
-                timeout=45
-            )
-            if result.returncode == 0 and result.stdout.strip():
-                url = result.stdout.strip().split('\n')[0]
-                print(f"[ThreatAnalysis] Resolved stream URL: {url[:60]}...")
-                return url
-        except Exception as e:
-            print(f"[ThreatAnalysis] yt-dlp error with format {fmt}: {e}")
+    from services.pose_estimator import get_pose_estimator
+    
+    loop = asyncio.get_running_loop()
+    pose_future = None
+    if any(threat_type in detectors for threat_type in POSE_THREATS):
+        pose_future = loop.run_in_executor(_detector_pool, get_pose_estimator().estimate, frame)
+    
+    async def run(threat_type, detector):
+        kwargs = {"annotate": False}
+        if threat_type in POSE_THREATS:
+            kwargs["pose"] = await pose_future
+        return await loop.run_in_executor(
+            _detector_pool, partial(detector.process_frame, frame, timestamp, **kwargs)
+        )
+    
+    threat_types = list(detectors)
+    outcomes = await asyncio.gather(
+        *(run(threat_type, detectors[threat_type]) for threat_type in threat_types),
+        return_exceptions=True
+    )
+    
+    results = {}
+    for threat_type, outcome in zip(threat_types, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"[ThreatAnalysis] Detector error ({threat_type}): {outcome}")
+            continue
+        results[threat_type] = outcome
+    
+    pose = None
+    if pose_future is not None and not pose_future.exception():
+        pose = pose_future.result()
+    return pose, results
+
+
+def _build_detectors(threat_types: List[str], testing_mode: bool) -> dict:
+    """
+    Fresh detector instances for one analysis, by threat type.
+    Detectors keep per-video tracking state and analyses run concurrently, so
+    they are never shared; the pose and detection models behind them are.
+    """
+    detectors = {}
+    
+    if "fight" in threat_types:
+        from services.fight_detector import FightDetector
+        detectors["fight"] = FightDetector()
+    
+    if "abandoned_object" in threat_types:
+        from services.abandoned_object_detector import AbandonedObjectDetector
+        detectors["abandoned_object"] = AbandonedObjectDetector()
+    
+    if "accident" in threat_types:
+        from services.accident_detector import AccidentDetector
+        detectors["accident"] = AccidentDetector()
+    
+    for detector in detectors.values():
+        detector.set_testing_mode(testing_mode)
+    return detectors
+
+
+def _render_frame(frame, pose, detectors: dict, results: dict, target_width: int = 640):
+    """
+    Draw all detectors' markers on one canvas and encode the preview JPEG once.
+    Returns: (canvas, preview JPEG bytes for the clip buffer, preview as base64)
+    """
+    canvas = pose.plot() if pose is not None else frame.copy()
+    for threat_type in results:
+        detectors[threat_type].draw(canvas, results[threat_type]["markers"])
     
-    return None
+    # Optimize preview frame
+    preview_frame = canvas
+    h, w = preview_frame.shape[:2]
+    if w > target_width:
+        scale = target_width / w
+        preview_frame = cv2.resize(preview_frame, (target_width, int(h * scale)))
+    
+    # Encode preview frame with lower quality for performance
+    _, buffer = cv2.imencode('.jpg', preview_frame, [cv2.IMWRITE_JPEG_QUALITY, 50])
+    jpeg = buffer.tobytes()
+    return canvas, jpeg, base64.b64encode(jpeg).decode('utf-8')
+
+
+def _encode_b64(frame) -> str:
+    return base64.b64encode(cv2.imencode('.jpg', frame)[1]).decode('utf-8')
 
 
 async def download_youtube_video(url: str, output_path: str) -> Tuple[bool, Optional[str]]:
@@ -147,54 +208,39 @@ async def process_video_for_threats(
     """Process video file for threat detection."""
     try:
         from services.alert_service import alert_service, ThreatType, make_serializable
+        from services.stream_resolver import stream_resolver
+        from services.clip_recorder import clip_recorder
         
-        # Initialize detectors based on requested types
-        detectors = {}
-        
-        if "fight" in threat_types:
-            from services.fight_detector import get_fight_detector
-            detectors["fight"] = get_fight_detector()
-            if hasattr(detectors["fight"], "set_testing_mode"):
-                detectors["fight"].set_testing_mode(testing_mode)
+        # Pre/post-event clips are cut from the preview frames (video time)
+        clip_source = f"analysis:{analysis_id}"
         
-        if "abandoned_object" in threat_types:
-            from services.abandoned_object_detector import get_abandoned_object_detector
-            detectors["abandoned_object"] = get_abandoned_object_detector()
-            if hasattr(detectors["abandoned_object"], "set_testing_mode"):
-                detectors["abandoned_object"].set_testing_mode(testing_mode)
-        
-        if "accident" in threat_types:
-            from services.accident_detector import get_accident_detector
-            detectors["accident"] = get_accident_detector()
-            if hasattr(detectors["accident"], "set_testing_mode"):
-                detectors["accident"].set_testing_mode(testing_mode)
+        # Each analysis gets its own detectors (built off the event loop: DeepSORT loads its embedders)
+        detectors = await asyncio.get_running_loop().run_in_executor(
+            _detector_pool, _build_detectors, threat_types, testing_mode
+        )
         
         # If YouTube, resolve stream URL fresh in the background task
         if youtube_url:
             print(f"[ThreatAnalysis] Resolving fresh stream URL for {youtube_url}")
-            video_path = await asyncio.to_thread(get_youtube_stream_url, youtube_url)
+            video_path = await stream_resolver.resolve(youtube_url)
             if not video_path:
                 active_analyses[analysis_id]["status"] = "error"
                 active_analyses[analysis_id]["error"] = "Failed to resolve YouTube stream URL"
                 return
 
-        # Reset detectors
-        for detector in detectors.values():
-            detector.reset()
-        
         # Open video
         is_url = video_path.startswith('http')
         if is_url:
             import os
             # Set environment for HLS/HTTPS streams
             os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = 'rtsp_transport;tcp|analyzeduration;10000000|probesize;10000000'
-            cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+            cap = await asyncio.to_thread(cv2.VideoCapture, video_path, cv2.CAP_FFMPEG)
             # Configure for streaming
             cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
             cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 15000)
             cap.set(cv2.CAP_PROP_READ_TIMEOUT_MSEC, 10000)
         else:
-            cap = cv2.VideoCapture(video_path)
+            cap = await asyncio.to_thread(cv2.VideoCapture, video_path)
 
         if not cap.isOpened():
             active_analyses[analysis_id]["status"] = "error"
@@ -221,98 +267,86 @@ async def process_video_for_threats(
         
         try:
             while cap.isOpened():
-                ret, frame = cap.read()
+                # Decode off the event loop; frames between samples are only grabbed
+                ret, frame, skipped = await asyncio.to_thread(_read_sampled_frame, cap, frame_skip)
                 if not ret:
                     break
                 
-                # Process every Nth frame
-                if frame_idx % frame_skip == 0:
-                    video_timestamp = frame_idx / fps if fps > 0 else 0
-                    
-                    combined_result = {
-                        "frame": frame,
-                        "alerts": [],
-                        "events": []
-                    }
-                    
-                    # Run each detector
-                    for threat_type, detector in detectors.items():
-                        try:
-                            result = detector.process_frame(frame, video_timestamp)
-                            
-                            # Collect alerts
-                            for alert in result.get("alerts", []):
-                                alert["threat_type"] = threat_type
-                                combined_result["alerts"].append(alert)
-                            
-                            # Collect events
-                            for event in result.get("events", []):
-                                event["threat_type"] = threat_type
-                                combined_result["events"].append(event)
-                            
-                            # Use annotated frame from last detector
-                            if "frame" in result:
-                                combined_result["frame"] = result["frame"]
-                        except Exception as e:
-                            print(f"[ThreatAnalysis] Detector error ({threat_type}): {e}")
-                    
-                    # Create alerts in alert service
-                    for alert_data in combined_result["alerts"]:
-                        threat_type_enum = ThreatType(alert_data["threat_type"])
-                        screenshot = base64.b64encode(
-                            cv2.imencode('.jpg', combined_result["frame"])[1]
-                        ).decode('utf-8')
-                        
-                        await alert_service.create_alert(
-                            threat_type=threat_type_enum,
-                            confidence=alert_data.get("confidence", 0.9),
-                            location=f"{'TEST ' if testing_mode else ''}Video analysis - {video_timestamp:.1f}s",
-                            screenshot_b64=screenshot,
-                            timestamp=video_timestamp,
-                            metadata={
-                                "analysis_id": analysis_id,
-                                "frame": frame_idx,
-                                "event_details": alert_data,
-                                "testing_mode": testing_mode
-                            }
-                        )
-                        # Sanitize alert data before appending
-                        all_alerts.append(make_serializable(alert_data))
-                    
-                    # Optimize preview frame
-                    preview_frame = combined_result["frame"]
-                    h, w = preview_frame.shape[:2]
-                    target_width = 640
-                    if w > target_width:
-                        scale = target_width / w
-                        new_h = int(h * scale)
-                        preview_frame = cv2.resize(preview_frame, (target_width, new_h))
+                video_timestamp = frame_idx / fps if fps > 0 else 0
+                
+                # Run the enabled detectors concurrently in the worker pool
+                pose, results = await _run_detectors(detectors, frame, video_timestamp)
+                
+                combined_result = {
+                    "alerts": [],
+                    "events": []
+                }
+                for threat_type, result in results.items():
+                    # Collect alerts
+                    for alert in result.get("alerts", []):
+                        alert["threat_type"] = threat_type
+                        combined_result["alerts"].append(alert)
                     
-                    # Encode preview frame with lower quality for performance
-                    _, buffer = cv2.imencode('.jpg', preview_frame, 
-                                             [cv2.IMWRITE_JPEG_QUALITY, 50])
-                    preview_b64 = base64.b64encode(buffer).decode('utf-8')
+                    # Collect events
+                    for event in result.get("events", []):
+                        event["threat_type"] = threat_type
+                        combined_result["events"].append(event)
+                
+                # Draw every detector's markers and encode the preview in the pool too
+                annotated_frame, preview_jpeg, preview_b64 = await asyncio.get_running_loop().run_in_executor(
+                    _detector_pool, _render_frame, frame, pose, detectors, results
+                )
+                clip_recorder.add_frame(clip_source, preview_jpeg, video_timestamp)
+                
+                # Create alerts in alert service
+                screenshot = None
+                for alert_data in combined_result["alerts"]:
+                    threat_type_enum = ThreatType(alert_data["threat_type"])
+                    if screenshot is None:
+                        screenshot = await asyncio.to_thread(_encode_b64, annotated_frame)
                     
-                    # Update status
-                    if is_stream:
-                        progress = min(int(frame_idx / 10), 99) # Fake progress for streams
-                    else:
-                        progress = int((frame_idx / max(total_frames, 1)) * 100)
-                        
-                    events_list = combined_result["events"][-5:] if combined_result["events"] else []
+                    metadata = {
+                        "analysis_id": analysis_id,
+                        "frame": frame_idx,
+                        "event_details": alert_data,
+                        "testing_mode": testing_mode
+                    }
+                    # Clip of the frames around the event, written once the post-event frames arrive
+                    clip_id = str(uuid.uuid4())
+                    if clip_recorder.request_clip(
+                        clip_source, clip_id, video_timestamp,
+                        metadata={"analysis_id": analysis_id, "threat_type": alert_data["threat_type"]}
+                    ):
+                        metadata["clip_id"] = clip_id
                     
-                    active_analyses[analysis_id].update({
-                        "progress": min(progress, 99),
-                        "frames_processed": frame_idx,
-                        "preview_frame": preview_b64,
-                        "current_alerts": len(all_alerts),
-                        "recent_events": make_serializable(events_list)
-                    })
+                    await alert_service.create_alert(
+                        threat_type=threat_type_enum,
+                        confidence=alert_data.get("confidence", 0.9),
+                        location=f"{'TEST ' if testing_mode else ''}Video analysis - {video_timestamp:.1f}s",
+                        screenshot_b64=screenshot,
+                        timestamp=video_timestamp,
+                        metadata=metadata
+                    )
+                    # Sanitize alert data before appending
+                    all_alerts.append(make_serializable(alert_data))
+                
+                # Update status
+                if is_stream:
+                    progress = min(int(frame_idx / 10), 99) # Fake progress for streams
+                else:
+                    progress = int((frame_idx / max(total_frames, 1)) * 100)
                     
-                    # Small delay to allow other tasks
-                    await asyncio.sleep(0.001)
+                events_list = combined_result["events"][-5:] if combined_result["events"] else []
+                
+                active_analyses[analysis_id].update({
+                    "progress": min(progress, 99),
+                    "frames_processed": frame_idx,
+                    "preview_frame": preview_b64,
+                    "current_alerts": len(all_alerts),
+                    "recent_events": make_serializable(events_list)
+                })
                 
-                frame_idx += 1
+                frame_idx += 1 + skipped
             
             # Completed
             processing_time = time.time() - start_time
@@ -331,6 +365,7 @@ async def process_video_for_threats(
             active_analyses[analysis_id]["error"] = str(e)
         finally:
             cap.release()
+            clip_recorder.close_source(clip_source)
             
             # Clean up video file ONLY if it's a local file
             try:
@@ -497,6 +532,46 @@ async def update_alert(alert_id: str, update: AlertStatusUpdate):
     return updated.to_dict()
 
 
+@router.get("/clips/{clip_id}")
+async def get_clip(clip_id: str):
+    """Clip manifest: source, event time, frame count and per-frame timestamps."""
+    from services.clip_recorder import clip_recorder
+    
+    manifest = await asyncio.to_thread(clip_recorder.get_manifest, clip_id)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Clip not found (it may still be recording)")
+    return manifest
+
+
+@router.get("/clips/{clip_id}/video")
+async def get_clip_video(clip_id: str, download: bool = False):
+    """
+    Play a clip as MJPEG (multipart/x-mixed-replace, works in an <img> tag) at its recorded pace,
+    or download the raw MJPEG file with download=true.
+    """
+    from services.clip_recorder import clip_recorder
+    
+    manifest = await asyncio.to_thread(clip_recorder.get_manifest, clip_id)
+    path = clip_recorder.clip_file(clip_id)
+    if manifest is None or path is None:
+        raise HTTPException(status_code=404, detail="Clip not found (it may still be recording)")
+    if download:
+        return FileResponse(path, media_type="video/x-motion-jpeg", filename=f"{clip_id}.mjpeg")
+    
+    async def parts():
+        with open(path, "rb") as f:
+            previous = None
+            for entry in manifest["index"]:
+                if previous is not None:
+                    await asyncio.sleep(min(1.0, max(0.0, entry["t"] - previous)))
+                previous = entry["t"]
+                f.seek(entry["offset"])
+                jpeg = f.read(entry["size"])
+                yield b"--clipframe\r\nContent-Type: image/jpeg\r\n\r\n" + jpeg + b"\r\n"
+    
+    return StreamingResponse(parts(), media_type="multipart/x-mixed-replace; boundary=clipframe")
+
+
 @router.websocket("/ws/stream/{analysis_id}")
 async def threat_analysis_stream(websocket: WebSocket, analysis_id: str):
     """Real-time threat analysis stream with live preview."""
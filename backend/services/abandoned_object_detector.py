@@ -12,6 +12,7 @@ Privacy-First: Only metadata sent as alerts, video processed at edge.
 
 import cv2
 import numpy as np
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 from collections import defaultdict
@@ -19,7 +20,8 @@ import time
 import base64
 import asyncio
 
-from ultralytics import YOLO
+from services.model_backend import load_yolo
+from services.detector import ObjectDetector, Detections
 
 
 @dataclass
@@ -71,6 +73,11 @@ class AbandonedObjectDetector:
     DISTANCE_THRESHOLD_PIXELS = 200  # Person-object separation distance
     STATIONARY_THRESHOLD_PIXELS = 30  # Object movement threshold
     CONFIDENCE_THRESHOLD = 0.5
+    # NMS settings of the original direct YOLO call (ultralytics defaults)
+    NMS_IOU = 0.7
+    MAX_DETECTIONS = 300
+    # Longest wait for the inference scheduler before treating the frame as empty
+    DETECT_TIMEOUT_SECONDS = 10.0
     
     def __init__(self, model_path: str = "yolov8n.pt"):
         """
@@ -79,7 +86,11 @@ class AbandonedObjectDetector:
         Args:
             model_path: Path to YOLOv8m model weights
         """
-        self.model = YOLO(model_path)
+        if model_path == ObjectDetector.WEIGHTS:
+            # Same weights as the person detector: detect through the inference scheduler's replicas
+            self.model = None
+        else:
+            self.model = load_yolo(model_path, task="detect", name="abandoned_object_detector")
         
         # Initialize DeepSORT or fallback
         try:
@@ -190,13 +201,16 @@ class AbandonedObjectDetector:
             return (nearest_id, min_distance)
         return None
     
-    def process_frame(self, frame: np.ndarray, timestamp: float) -> Dict:
+    def process_frame(self, frame: np.ndarray, timestamp: float, canvas: Optional[np.ndarray] = None,
+                      annotate: bool = True) -> Dict:
         """
         Process a single frame for abandoned object detection.
         
         Args:
             frame: BGR image from OpenCV
             timestamp: Current timestamp in seconds
+            canvas: Frame to draw onto in place (defaults to a copy of frame)
+            annotate: If False, skip drawing ("frame" is None); pass "markers" to draw() later
             
         Returns:
             Dict with detection results and any alerts
@@ -204,21 +218,34 @@ class AbandonedObjectDetector:
         self._frame_count += 1
         
         # Run YOLO detection
-        results = self.model(
-            frame,
-            classes=[self.PERSON_CLASS] + list(self.OBJECT_CLASSES.keys()),
-            conf=self.CONFIDENCE_THRESHOLD,
-            verbose=False
-        )
+        classes = [self.PERSON_CLASS] + list(self.OBJECT_CLASSES.keys())
+        if self.model is None:
+            from services.inference_scheduler import inference_scheduler
+            future = inference_scheduler.submit(
+                frame, conf_threshold=self.CONFIDENCE_THRESHOLD, classes=classes,
+                max_det=self.MAX_DETECTIONS, iou=self.NMS_IOU,
+            )
+            try:
+                _, detections = future.result(timeout=self.DETECT_TIMEOUT_SECONDS)
+            except FutureTimeoutError:
+                # Don't hold a threat-pool thread on a stalled batch; tracks coast for a frame
+                future.cancel()
+                print(f"[AbandonedObjectDetector] Detection timed out after {self.DETECT_TIMEOUT_SECONDS:.0f}s, "
+                      f"skipping frame")
+                detections = Detections.empty()
+        else:
+            detections = Detections.from_result(self.model(
+                frame, verbose=False, classes=classes, conf=self.CONFIDENCE_THRESHOLD,
+                iou=self.NMS_IOU, max_det=self.MAX_DETECTIONS,
+            )[0])
         
         # Separate persons and objects
         person_detections = []
         object_detections = []
         
-        for box in results[0].boxes:
-            cls_id = int(box.cls[0])
-            bbox = tuple(map(int, box.xyxy[0].tolist()))
-            conf = float(box.conf[0])
+        for box, conf, cls_id in zip(detections.boxes.tolist(), detections.confidences.tolist(),
+                                     detections.classes.tolist()):
+            bbox = tuple(map(int, box))
             
             if cls_id == self.PERSON_CLASS:
                 person_detections.append({
@@ -322,10 +349,15 @@ class AbandonedObjectDetector:
                     obj.first_abandoned_time = timestamp
         
         # Annotate frame
-        annotated_frame = self._annotate_frame(frame, person_tracks, object_tracks)
+        markers = (person_tracks, self._label_objects(object_tracks))
+        annotated_frame = None
+        if annotate:
+            annotated_frame = self._annotate_frame(frame if canvas is None else canvas, *markers,
+                                                   copy=canvas is None)
         
         return {
             "frame": annotated_frame,
+            "markers": markers,
             "persons_detected": len(person_tracks),
             "objects_detected": len(object_tracks),
             "tracked_objects": len(self.tracked_objects),
@@ -358,9 +390,23 @@ class AbandonedObjectDetector:
         
         return results
     
-    def _annotate_frame(self, frame: np.ndarray, person_tracks, object_tracks) -> np.ndarray:
-        """Draw annotations on frame."""
-        annotated = frame.copy()
+    def _label_objects(self, object_tracks) -> List[Tuple[int, Tuple, str]]:
+        """Snapshot each object track's state for drawing: (track_id, bbox, state)."""
+        labelled = []
+        for track_id, bbox in object_tracks:
+            obj = self.tracked_objects.get(track_id)
+            if track_id in self.abandoned_objects:
+                state = "abandoned"
+            elif obj and obj.first_abandoned_time:
+                state = "unattended"
+            else:
+                state = "tracked"
+            labelled.append((track_id, bbox, state))
+        return labelled
+    
+    def _annotate_frame(self, frame: np.ndarray, person_tracks, object_tracks, copy: bool = True) -> np.ndarray:
+        """Draw annotations on frame (a copy unless copy=False); object_tracks come from _label_objects()."""
+        annotated = frame.copy() if copy else frame
         
         # Draw persons (green)
         for track_id, bbox in person_tracks:
@@ -370,15 +416,14 @@ class AbandonedObjectDetector:
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
         
         # Draw objects
-        for track_id, bbox in object_tracks:
+        for track_id, bbox, state in object_tracks:
             x1, y1, x2, y2 = bbox
-            obj = self.tracked_objects.get(track_id)
             
-            if track_id in self.abandoned_objects:
+            if state == "abandoned":
                 # Red for abandoned
                 color = (0, 0, 255)
                 label = f"⚠️ ABANDONED"
-            elif obj and obj.first_abandoned_time:
+            elif state == "unattended":
                 # Orange for potentially abandoned
                 color = (0, 165, 255)
                 label = f"Unattended"
@@ -393,6 +438,10 @@ class AbandonedObjectDetector:
         
         return annotated
     
+    def draw(self, canvas: np.ndarray, markers) -> np.ndarray:
+        """Draw the "markers" of a process_frame() result onto canvas in place."""
+        return self._annotate_frame(canvas, *markers, copy=False)
+    
     def get_screenshot(self, frame: np.ndarray) -> str:
         """Encode frame as base64 JPEG."""
         _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
@@ -405,14 +454,3 @@ class AbandonedObjectDetector:
         self.object_ownership.clear()
         self.abandoned_objects.clear()
         self._frame_count = 0
-
-
-# Singleton instance
-_detector_instance = None
-
-def get_abandoned_object_detector() -> AbandonedObjectDetector:
-    """Get or create singleton detector instance."""
-    global _detector_instance
-    if _detector_instance is None:
-        _detector_instance = AbandonedObjectDetector()
-    return _detector_instance
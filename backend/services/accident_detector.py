@@ -19,7 +19,7 @@ from collections import defaultdict
 import time
 import base64
 
-from ultralytics import YOLO
+from services.pose_estimator import PoseResult, get_pose_estimator
 
 
 @dataclass
@@ -65,7 +65,8 @@ class AccidentDetector:
         Args:
             model_path: Path to YOLOv8-Pose model weights
         """
-        self.model = YOLO(model_path)
+        # Shared with the other pose-based detectors (one inference per frame)
+        self.pose_estimator = get_pose_estimator(model_path)
         
         # Tracking state
         self.prone_tracking: Dict[int, ProneTracking] = {}
@@ -194,13 +195,18 @@ class AccidentDetector:
         
         return False, 0.0
     
-    def process_frame(self, frame: np.ndarray, timestamp: float) -> Dict:
+    def process_frame(self, frame: np.ndarray, timestamp: float,
+                      pose: Optional[PoseResult] = None, canvas: Optional[np.ndarray] = None,
+                      annotate: bool = True) -> Dict:
         """
         Process a single frame for accident/medical emergency detection.
         
         Args:
             frame: BGR image from OpenCV
             timestamp: Current timestamp in seconds
+            pose: Precomputed pose for this frame (runs the shared estimator if None)
+            canvas: Frame to draw markers onto in place (defaults to a fresh pose plot)
+            annotate: If False, skip drawing ("frame" is None); pass "markers" to draw() later
             
         Returns:
             Dict with detection results and any alerts
@@ -208,15 +214,16 @@ class AccidentDetector:
         self._frame_count += 1
         frame_height = frame.shape[0]
         
-        # Run YOLOv8-Pose
-        results = self.model(frame, verbose=False)
+        # Run YOLOv8-Pose (once per frame when shared)
+        if pose is None:
+            pose = self.pose_estimator.estimate(frame)
         
         alerts = []
         prone_detections = []
         persons_detected = 0
         
-        if results[0].keypoints is not None:
-            keypoints_data = results[0].keypoints.data.cpu().numpy()
+        if pose.keypoints is not None:
+            keypoints_data = pose.keypoints
             persons_detected = len(keypoints_data)
             
             # Track which persons are still being tracked this frame
@@ -292,11 +299,18 @@ class AccidentDetector:
             for pid in stale_ids:
                 del self.prone_tracking[pid]
         
-        # Annotate frame
-        annotated_frame = self._annotate_frame(frame, results, prone_detections, alerts)
+        # Annotate frame (markers snapshot the tracking state so they can be drawn later)
+        markers = ([
+            dict(detection,
+                 emergency=detection["person_id"] in self.confirmed_emergencies,
+                 prone_since=getattr(self.prone_tracking.get(detection["person_id"]), "first_prone_time", None))
+            for detection in prone_detections
+        ], alerts)
+        annotated_frame = self._annotate_frame(pose, canvas, *markers) if annotate else None
         
         return {
             "frame": annotated_frame,
+            "markers": markers,
             "persons_detected": persons_detected,
             "prone_detected": len(prone_detections),
             "tracking": [{"person_id": t.person_id, 
@@ -307,27 +321,23 @@ class AccidentDetector:
             "timestamp": timestamp
         }
     
-    def _annotate_frame(self, frame: np.ndarray, results, 
+    def _annotate_frame(self, pose: Optional[PoseResult], canvas: Optional[np.ndarray],
                         prone_detections: List, alerts: List) -> np.ndarray:
-        """Draw annotations on frame."""
-        annotated = results[0].plot()
+        """Draw annotations onto the canvas, or onto a copy of the pose plot."""
+        annotated = pose.plot() if canvas is None else canvas
         
         # Draw prone person indicators
         for detection in prone_detections:
             x, y = detection["position"]
-            person_id = detection["person_id"]
             
-            # Check if this is a confirmed emergency
-            is_emergency = person_id in self.confirmed_emergencies
-            
-            if is_emergency:
+            if detection["emergency"]:
                 color = (0, 0, 255)  # Red for emergency
                 label = "🚨 MEDICAL EMERGENCY"
                 cv2.circle(annotated, (x, y), 60, color, 3)
             else:
                 # Calculate how long they've been prone
-                if person_id in self.prone_tracking:
-                    duration = time.time() - self.prone_tracking[person_id].first_prone_time
+                if detection["prone_since"] is not None:
+                    duration = time.time() - detection["prone_since"]
                     color = (0, 165, 255)  # Orange for monitoring
                     label = f"Prone: {duration:.0f}s"
                 else:
@@ -345,6 +355,10 @@ class AccidentDetector:
         
         return annotated
     
+    def draw(self, canvas: np.ndarray, markers) -> np.ndarray:
+        """Draw the "markers" of a process_frame() result onto canvas in place."""
+        return self._annotate_frame(None, canvas, *markers)
+    
     def get_screenshot(self, frame: np.ndarray) -> str:
         """Encode frame as base64 JPEG."""
         _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
@@ -357,14 +371,3 @@ class AccidentDetector:
         self.previous_positions.clear()
         self.next_person_id = 0
         self._frame_count = 0
-
-
-# Singleton instance
-_detector_instance = None
-
-def get_accident_detector() -> AccidentDetector:
-    """Get or create singleton detector instance."""
-    global _detector_instance
-    if _detector_instance is None:
-        _detector_instance = AccidentDetector()
-    return _detector_instance
@@ -1,12 +1,15 @@
 import cv2
 import asyncio
 from services.detector import ObjectDetector
+from services.inference_scheduler import inference_scheduler
+from services.motion_gate import MotionGate
 
 class CameraService:
     def __init__(self, source=0):
         self.source = source
         self.detector = ObjectDetector()
         self.cap = None
+        self.motion_gate = MotionGate()
 
     def start(self):
         if self.cap is None:
@@ -17,8 +20,14 @@ class CameraService:
             self.cap.release()
             self.cap = None
 
-    async def generate_frames(self):
+    async def generate_frames(self, annotate=True):
+        """
+        Yield (frame_bytes, count) for each captured frame.
+        With annotate=False no drawing or JPEG encoding happens and frame_bytes is None.
+        While the scene is static, the last detections are reused instead of running YOLO.
+        """
         self.start()
+        self.motion_gate = MotionGate()
         if not self.cap or not self.cap.isOpened():
             print("Could not open camera")
             return
@@ -32,13 +41,21 @@ class CameraService:
                 # Resize for performance
                 frame = cv2.resize(frame, (640, 480))
 
-                annotated_frame, count = self.detector.process_frame(frame)
+                if self.motion_gate.should_infer(frame):
+                    annotated_frame, detections = await inference_scheduler.process(frame, annotate=annotate)
+                    self.motion_gate.update(detections)
+                else:
+                    # Keep the video live, drawing the previous boxes on the new frame
+                    detections = self.motion_gate.last_result
+                    annotated_frame = self.detector.annotate(frame, detections, copy=False) if annotate else None
                 
                 # Encode
-                ret, buffer = cv2.imencode('.jpg', annotated_frame)
-                frame_bytes = buffer.tobytes()
+                frame_bytes = None
+                if annotate:
+                    ret, buffer = cv2.imencode('.jpg', annotated_frame)
+                    frame_bytes = buffer.tobytes()
                 
-                yield frame_bytes, count
+                yield frame_bytes, detections.count
                 
                 # approximate 30 fps
                 await asyncio.sleep(0.03)
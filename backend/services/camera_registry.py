@@ -0,0 +1,136 @@
+"""
+Camera Registry - In-memory catalog of user-saved cameras.
+
+data/saved_cameras.json is read once, on first use, into a dict indexed by
+camera id; lookups and listing never touch the disk again. Every change is
+written through to the file atomically (dump to a temp file in the same
+directory, fsync, os.replace) while holding both a thread lock and an
+advisory file lock, so a crash mid-write or a second backend process can
+never leave a truncated or interleaved file behind.
+
+The registry assumes it owns the file: edits made to it by hand while the
+backend is running are not picked up until restart.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+SAVED_CAMERAS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "saved_cameras.json")
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive advisory lock on <path>.lock (held across write and rename)."""
+    with open(path + ".lock", "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class CameraRegistry:
+    """Saved cameras indexed by id, persisted with atomic write-through."""
+
+    def __init__(self, path: str = SAVED_CAMERAS_FILE):
+        self.path = path
+        self._cameras: Dict[str, dict] = {}  # insertion-ordered, same order as the file
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            cameras = []
+            try:
+                if os.path.exists(self.path):
+                    with open(self.path, 'r') as f:
+                        cameras = json.load(f)
+            except Exception as e:
+                print(f"[Cameras] Error loading saved cameras: {e}")
+            self._cameras = {cam["id"]: cam for cam in cameras if isinstance(cam, dict) and "id" in cam}
+            self._loaded = True
+            print(f"[Cameras] Loaded {len(self._cameras)} saved cameras")
+
+    def _persist(self):
+        """Write the catalog to disk atomically (caller holds self._lock)."""
+        directory = os.path.dirname(self.path)
+        with _file_lock(self.path):
+            fd, tmp_path = tempfile.mkstemp(prefix=".saved_cameras.", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(list(self._cameras.values()), f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    def list(self) -> List[dict]:
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._cameras.values())
+
+    def get(self, camera_id: str) -> Optional[dict]:
+        self._ensure_loaded()
+        return self._cameras.get(camera_id)
+
+    def add(self, camera: dict) -> dict:
+        self._ensure_loaded()
+        with self._lock:
+            self._cameras[camera["id"]] = camera
+            self._persist()
+        return camera
+
+    def update(self, camera_id: str, updates: dict) -> Optional[dict]:
+        """Apply updates to a camera; returns the updated camera, or None if not found."""
+        self._ensure_loaded()
+        with self._lock:
+            camera = self._cameras.get(camera_id)
+            if camera is None:
+                return None
+            # Replace rather than mutate so readers holding the old dict see a consistent camera
+            camera = {**camera, **updates, "id": camera_id}
+            self._cameras[camera_id] = camera
+            self._persist()
+        return camera
+
+    def delete(self, camera_id: str) -> bool:
+        self._ensure_loaded()
+        with self._lock:
+            if self._cameras.pop(camera_id, None) is None:
+                return False
+            self._persist()
+        return True
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._cameras)
+
+
+# Singleton instance
+camera_registry = CameraRegistry()
@@ -0,0 +1,115 @@
+"""
+Capture Session - One connect-and-grab run against a camera source.
+
+Shared by the in-process capture threads (services/rtsp_camera.py) and the
+capture worker processes (services/capture_workers.py). The session only
+talks to a sink, so it has no idea where frames end up:
+
+    sink.connected()                          source opened
+    sink.grabbed(captured_at)                 a frame was grabbed (not decoded yet)
+    sink.wants_frame(captured_at) -> bool     decode this one? (pipeline free, rate allows)
+    sink.deliver(frame, captured_at, decode_ms)
+    sink.ended(reason, error, stale_url)      "eof" for finished media, "error" otherwise
+
+This module must stay light to import: worker processes are spawned and
+import it on their own.
+"""
+
+import os
+import time
+from typing import Optional, Tuple
+
+import cv2
+
+FFMPEG_CAPTURE_OPTIONS = 'rtsp_transport;tcp|analyzeduration;10000000|probesize;10000000'
+
+
+def open_capture(stream_url: str):
+    """Open a webcam ("webcam:N") or URL/file source configured for low-latency streaming."""
+    if stream_url.startswith("webcam:"):
+        return cv2.VideoCapture(int(stream_url.split(":")[1]))
+
+    # Set environment for HLS streams
+    os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = FFMPEG_CAPTURE_OPTIONS
+    cap = cv2.VideoCapture(stream_url, cv2.CAP_FFMPEG)
+    # Configure for streaming
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Minimize buffer for live streaming
+    cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 15000)  # 15 second timeout
+    cap.set(cv2.CAP_PROP_READ_TIMEOUT_MSEC, 10000)  # 10 second read timeout
+    return cap
+
+
+def run_capture_session(label: str, stream_url: str, resize: Optional[Tuple[int, int]], stop_event, sink):
+    """
+    Connect to stream_url and grab until the source fails or stop_event is set.
+
+    Args:
+        label: Camera id for log messages
+        resize: (width, height) to resize delivered frames to, or None for full resolution
+    """
+    is_webcam = stream_url.startswith("webcam:")
+    stale_url = None if is_webcam else stream_url
+    cap = None
+
+    try:
+        source_display = f"webcam {stream_url[7:]}" if is_webcam else stream_url[:60]
+        print(f"[RTSP] Connecting to stream: {source_display}...")
+        cap = open_capture(stream_url)
+
+        if not cap.isOpened():
+            print(f"[RTSP] Failed to open stream for {label}")
+            sink.ended("error", "Failed to open stream", stale_url)
+            return
+
+        print(f"[RTSP] Connected to stream successfully!")
+        sink.connected()
+
+        # Finite media (frame count known) must be paced; live sources block in grab()
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or 0
+        is_finite = cap.get(cv2.CAP_PROP_FRAME_COUNT) > 0
+        source_period = 1.0 / source_fps if is_finite and source_fps > 0 else 0.0
+        next_grab = time.time()
+
+        while not stop_event.is_set():
+            # grab() every frame to keep up with the source without converting it;
+            # only the frames the pipeline will use are retrieve()d below
+            if not cap.grab():
+                if is_finite:
+                    # End of a file or VOD: the supervisor restarts it to loop
+                    print(f"[RTSP] Stream ended for {label}")
+                    sink.ended("eof")
+                else:
+                    # Live source lost: the URL may have expired, so re-resolve on restart
+                    print(f"[RTSP] Lost stream for {label}")
+                    sink.ended("error", "Stream ended or lost frame", stale_url)
+                return
+            captured_at = time.time()
+            sink.grabbed(captured_at)
+
+            # Files and VODs can be grabbed faster than real time; pace them at the source rate
+            if source_period:
+                next_grab = max(next_grab + source_period, captured_at - source_period)
+                if next_grab > captured_at:
+                    time.sleep(next_grab - captured_at)
+
+            # Retrieve only when the pipeline has taken the previous frame and the controlled rate allows
+            if not sink.wants_frame(captured_at):
+                continue
+            decode_start = time.perf_counter()
+            ret, frame = cap.retrieve()
+            if not ret:
+                continue
+
+            # Resize for performance; tiled and density cameras keep full resolution for inference
+            if resize is not None:
+                frame = cv2.resize(frame, resize)
+
+            # Hand the frame over (the sink replaces any frame not yet taken)
+            sink.deliver(frame, captured_at, (time.perf_counter() - decode_start) * 1000)
+
+    except Exception as e:
+        print(f"[RTSP] Error in capture thread: {e}")
+        sink.ended("error", str(e))
+    finally:
+        if cap:
+            cap.release()
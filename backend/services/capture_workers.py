@@ -0,0 +1,301 @@
+"""
+Capture Workers - Camera capture sharded across worker processes.
+
+With CROWDEX_CAPTURE_PROCESSES=N (default 0: capture threads in the API
+process), cameras are spread over N spawned worker processes, each running
+the capture sessions of its group of cameras. Decoding and resizing then
+use their own interpreters and cores instead of competing for the API
+process's GIL.
+
+Decoded frames come back through a per-camera SharedFrameRing
+(services/shm_ring.py); only small notices ("ring created", "frame N ready",
+"session ended") travel over the worker's event queue. A listener thread per
+worker copies each new frame out of shared memory into the camera's
+LatestFrameSlot, so the API-side pipeline (batched inference, encoding,
+fan-out) is the same in both modes. Detection stays in the API process on
+purpose: the inference scheduler batches all cameras onto shared model
+replicas, which one model per worker would undo.
+
+The processing rate set by the rate controller is written into the ring
+header, where the worker reads it before decoding each frame.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+from typing import Dict, List, Optional
+
+CAPTURE_PROCESSES = int(os.getenv("CROWDEX_CAPTURE_PROCESSES", "0"))
+
+
+# ---------------------------------------------------------------------------
+# Worker process side
+# ---------------------------------------------------------------------------
+
+class _RingSink:
+    """Capture session sink inside a worker: frames go to shared memory, events to the queue."""
+
+    def __init__(self, camera_id: str, events, max_fps: float):
+        self.camera_id = camera_id
+        self.events = events
+        self.max_fps = max_fps
+        self.ring = None
+        self.last_delivered = 0.0
+        self.grabs = 0
+
+    def connected(self):
+        self.events.put(("connected", self.camera_id))
+
+    def grabbed(self, captured_at: float):
+        self.grabs += 1
+
+    def wants_frame(self, captured_at: float) -> bool:
+        if self.ring is None:
+            fps = self.max_fps
+        else:
+            # Skip decoding while the API process hasn't copied the previous frame
+            if self.ring.read_seq != self.ring.write_seq:
+                return False
+            fps = self.ring.target_fps or self.max_fps
+        return captured_at - self.last_delivered >= 1.0 / max(0.1, fps)
+
+    def deliver(self, frame, captured_at: float, decode_ms: float):
+        from services.shm_ring import SharedFrameRing
+
+        if self.ring is None or not self.ring.fits(frame):
+            old, self.ring = self.ring, SharedFrameRing.create(frame.shape, self.max_fps)
+            self.events.put(("ring", self.camera_id, self.ring.name))
+            if old is not None:
+                old.close()
+        seq = self.ring.write(frame, captured_at)
+        self.last_delivered = captured_at
+        self.events.put(("frame", self.camera_id, seq, captured_at, decode_ms, self.grabs))
+        self.grabs = 0
+
+    def ended(self, reason: str, error: Optional[str] = None, stale_url: Optional[str] = None):
+        self.events.put(("ended", self.camera_id, reason, error, stale_url))
+
+    def close(self):
+        if self.ring is not None:
+            self.ring.close()
+
+
+def _run_session(camera_id: str, stream_url: str, options: dict, stop_event, events):
+    from services.capture_session import run_capture_session
+
+    sink = _RingSink(camera_id, events, options["max_fps"])
+    try:
+        run_capture_session(camera_id, stream_url, options.get("resize"), stop_event, sink)
+    finally:
+        events.put(("exited", camera_id))
+        # Give the API process a moment to detach before the block is unlinked
+        stop_event.wait(0.5)
+        sink.close()
+
+
+def _worker_main(index: int, commands, events):
+    """Entry point of a capture worker process."""
+    print(f"[CaptureWorker {index}] Started (pid {os.getpid()})")
+    sessions: Dict[str, threading.Event] = {}
+    while True:
+        command = commands.get()
+        action = command[0]
+        if action == "start":
+            _, camera_id, stream_url, options = command
+            if camera_id in sessions:
+                sessions.pop(camera_id).set()
+            stop_event = threading.Event()
+            sessions[camera_id] = stop_event
+            threading.Thread(
+                target=_run_session, args=(camera_id, stream_url, options, stop_event, events),
+                name=f"capture-{camera_id}", daemon=True
+            ).start()
+        elif action == "stop":
+            stop_event = sessions.pop(command[1], None)
+            if stop_event:
+                stop_event.set()
+        elif action == "exit":
+            for stop_event in sessions.values():
+                stop_event.set()
+            break
+
+
+# ---------------------------------------------------------------------------
+# API process side
+# ---------------------------------------------------------------------------
+
+class RemoteCapture:
+    """
+    API-side handle of one capture session running in a worker.
+    Quacks like the capture thread for the stream supervisor (is_alive()).
+    """
+
+    def __init__(self, camera_id: str, stream: dict, slot_getter, rate_getter):
+        self.camera_id = camera_id
+        self.stream = stream
+        self.slot_getter = slot_getter
+        self.rate_getter = rate_getter
+        self.ring = None
+        self.worker: Optional["_Worker"] = None
+        self._alive = True
+
+    def is_alive(self) -> bool:
+        return self._alive
+
+    def on_event(self, event: tuple):
+        from services.shm_ring import SharedFrameRing
+
+        kind = event[0]
+        health = self.stream["health"]
+        metrics = self.stream["metrics"]
+        if kind == "ring":
+            self._detach()
+            self.ring = SharedFrameRing.attach(event[2])
+        elif kind == "connected":
+            health.connected()
+        elif kind == "frame":
+            _, _, seq, captured_at, decode_ms, grabs = event
+            for _ in range(grabs):
+                metrics.grabs.mark(captured_at)
+            health.frame(captured_at)
+            if self.ring is None:
+                return
+            ring = self.ring
+            try:
+                # Tell the worker how fast we currently want frames
+                ring.target_fps = self.rate_getter()
+                copied = ring.read(seq)
+                slot = self.slot_getter()
+                if copied is None or slot is None:
+                    return
+                metrics.record("decode_ms", decode_ms)
+                slot.put(copied[0], copied[1])
+            finally:
+                # Dropped frames are acknowledged too, or the worker would wait for them forever
+                ring.ack(seq)
+        elif kind == "ended":
+            _, _, reason, error, stale_url = event
+            health.ended(reason, error, stale_url)
+        elif kind == "exited":
+            self.finish()
+
+    def finish(self, reason: Optional[str] = None, error: Optional[str] = None):
+        if reason:
+            self.stream["health"].ended(reason, error)
+        self._detach()
+        self._alive = False
+
+    def _detach(self):
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+
+class _Worker:
+    def __init__(self, index: int, context):
+        self.index = index
+        self.commands = context.Queue()
+        self.events = context.Queue()
+        self.process = context.Process(
+            target=_worker_main, args=(index, self.commands, self.events),
+            name=f"crowdex-capture-{index}", daemon=True
+        )
+        self.sessions: Dict[str, RemoteCapture] = {}
+        self.process.start()
+        self.listener = threading.Thread(target=self._listen, name=f"capture-events-{index}", daemon=True)
+        self.listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                event = self.events.get(timeout=1.0)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    print(f"[CaptureWorker {self.index}] Worker process died")
+                    for session in list(self.sessions.values()):
+                        session.finish("error", "Capture worker process died")
+                    self.sessions.clear()
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+            session = self.sessions.get(event[1])
+            if session is None:
+                continue
+            try:
+                session.on_event(event)
+            except Exception as e:
+                print(f"[CaptureWorker {self.index}] Error handling {event[0]} for {event[1]}: {e}")
+            if event[0] == "exited" and self.sessions.get(event[1]) is session:
+                del self.sessions[event[1]]
+
+
+class CaptureWorkerPool:
+    """Spreads capture sessions over worker processes (least-loaded worker first)."""
+
+    def __init__(self, processes: int = CAPTURE_PROCESSES):
+        self.processes = max(0, processes)
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.processes > 0
+
+    def _ensure_workers(self):
+        with self._lock:
+            # Replace workers whose process died
+            self._workers = [worker for worker in self._workers if worker.process.is_alive()]
+            if len(self._workers) < self.processes:
+                # Spawn (not fork): the API process is multi-threaded
+                context = multiprocessing.get_context("spawn")
+                used = {worker.index for worker in self._workers}
+                for index in range(self.processes):
+                    if index not in used:
+                        self._workers.append(_Worker(index, context))
+
+    def start_session(self, camera_id: str, stream_url: str, options: dict, session: RemoteCapture):
+        """Run a capture session in the least-loaded worker."""
+        self._ensure_workers()
+        self.stop_session(camera_id)
+        worker = min(self._workers, key=lambda w: len(w.sessions))
+        session.worker = worker
+        worker.sessions[camera_id] = session
+        worker.commands.put(("start", camera_id, stream_url, options))
+
+    def stop_session(self, camera_id: str):
+        for worker in self._workers:
+            session = worker.sessions.pop(camera_id, None)
+            if session is not None:
+                worker.commands.put(("stop", camera_id))
+                session.finish()
+
+    def shutdown(self):
+        with self._lock:
+            for worker in self._workers:
+                for session in list(worker.sessions.values()):
+                    session.finish()
+                worker.sessions.clear()
+                try:
+                    worker.commands.put(("exit",))
+                    worker.process.join(timeout=3)
+                except Exception:
+                    pass
+                if worker.process.is_alive():
+                    worker.process.terminate()
+            self._workers = []
+
+    def get_stats(self) -> dict:
+        return {
+            "processes": self.processes,
+            "workers": [
+                {"index": worker.index, "pid": worker.process.pid, "alive": worker.process.is_alive(),
+                 "cameras": sorted(worker.sessions)}
+                for worker in self._workers
+            ],
+        }
+
+
+# Singleton instance
+capture_pool = CaptureWorkerPool()
@@ -0,0 +1,209 @@
+"""
+Clip Recorder - Pre/post-event video clips from already-encoded frames.
+
+Every active camera and threat analysis feeds the JPEGs it produces anyway
+into a per-source ring buffer holding the last CROWDEX_CLIP_BUFFER_SECONDS,
+capped at CROWDEX_CLIP_BUFFER_MB. When an alert fires, request_clip() marks
+the window [event - CROWDEX_CLIP_PRE_SECONDS, event + CROWDEX_CLIP_POST_SECONDS];
+once frames past the end of the window have arrived (or the source stops)
+the frames are written to disk as-is - nothing is decoded or re-encoded.
+
+A clip is two files in data/clips/:
+    <clip_id>.mjpeg   concatenated JPEG frames (an MJPEG elementary stream,
+                      playable with e.g. `ffplay -f mjpeg`)
+    <clip_id>.json    manifest: source, event time, per-frame timestamps and offsets
+
+Set CROWDEX_CLIPS=0 to disable buffering for live cameras.
+
+Timestamps are whatever the source uses (wall-clock for cameras, video
+time for file analyses), as long as each source is consistent.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+CLIPS_ENABLED = os.getenv("CROWDEX_CLIPS", "1") != "0"
+CLIP_BUFFER_SECONDS = float(os.getenv("CROWDEX_CLIP_BUFFER_SECONDS", "20"))
+CLIP_BUFFER_MAX_BYTES = int(float(os.getenv("CROWDEX_CLIP_BUFFER_MB", "16")) * 1024 * 1024)
+CLIP_PRE_SECONDS = float(os.getenv("CROWDEX_CLIP_PRE_SECONDS", "8"))
+CLIP_POST_SECONDS = float(os.getenv("CROWDEX_CLIP_POST_SECONDS", "5"))
+
+CLIPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "clips")
+
+# Clip files are written off the event loop, one at a time
+_writer_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="clip-writer")
+
+
+@dataclass
+class PendingClip:
+    clip_id: str
+    event_time: float
+    start: float
+    end: float
+    metadata: Dict = field(default_factory=dict)
+
+
+class ClipBuffer:
+    """Ring buffer of (timestamp, jpeg) for one source, bounded by age and bytes (thread-safe)."""
+
+    def __init__(self, seconds: float = CLIP_BUFFER_SECONDS, max_bytes: int = CLIP_BUFFER_MAX_BYTES):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.frames: Deque[Tuple[float, bytes]] = deque()
+        self.bytes = 0
+        self.pending: List[PendingClip] = []
+        self._lock = threading.Lock()
+
+    def add(self, jpeg: bytes, timestamp: float):
+        with self._lock:
+            # A republished frame (static scene) shares the previous bytes and costs no memory
+            if not (self.frames and self.frames[-1][1] is jpeg):
+                self.bytes += len(jpeg)
+            self.frames.append((timestamp, jpeg))
+            # Keep what pending clips still need, within the memory cap
+            horizon = timestamp - self.seconds
+            if self.pending:
+                horizon = min(horizon, min(clip.start for clip in self.pending))
+            while self.frames and (self.frames[0][0] < horizon or self.bytes > self.max_bytes):
+                self._pop_oldest()
+
+    def _pop_oldest(self):
+        _, jpeg = self.frames.popleft()
+        # Only the first reference of a republished frame was counted
+        if not self.frames or self.frames[0][1] is not jpeg:
+            self.bytes -= len(jpeg)
+
+    def window(self, start: float, end: float) -> List[Tuple[float, bytes]]:
+        with self._lock:
+            return [(ts, jpeg) for ts, jpeg in self.frames if start <= ts <= end]
+
+    @property
+    def latest_time(self) -> Optional[float]:
+        return self.frames[-1][0] if self.frames else None
+
+
+class ClipRecorder:
+    """Per-source clip buffers and the clips cut from them."""
+
+    def __init__(self, clips_dir: str = CLIPS_DIR):
+        self.clips_dir = clips_dir
+        self.buffers: Dict[str, ClipBuffer] = {}
+        self._lock = threading.Lock()
+        self.clips_written = 0
+
+    def add_frame(self, source_id: str, jpeg: bytes, timestamp: Optional[float] = None):
+        """Record an encoded frame; finishes any pending clip whose window has passed."""
+        timestamp = time.time() if timestamp is None else timestamp
+        buffer = self.buffers.get(source_id)
+        if buffer is None:
+            with self._lock:
+                buffer = self.buffers.setdefault(source_id, ClipBuffer())
+        buffer.add(jpeg, timestamp)
+        if buffer.pending:
+            self._finish(source_id, buffer, lambda clip: clip.end <= timestamp)
+
+    def request_clip(
+        self,
+        source_id: str,
+        clip_id: str,
+        event_time: Optional[float] = None,
+        pre_seconds: float = CLIP_PRE_SECONDS,
+        post_seconds: float = CLIP_POST_SECONDS,
+        metadata: Optional[Dict] = None,
+    ) -> bool:
+        """
+        Save the frames around event_time (default: the latest frame) as clip `clip_id`.
+        Returns False if the source has no buffered frames.
+        """
+        buffer = self.buffers.get(source_id)
+        if buffer is None or buffer.latest_time is None:
+            return False
+        event_time = buffer.latest_time if event_time is None else event_time
+        with buffer._lock:
+            buffer.pending.append(PendingClip(
+                clip_id=clip_id,
+                event_time=event_time,
+                start=event_time - pre_seconds,
+                end=event_time + post_seconds,
+                metadata=metadata or {},
+            ))
+        return True
+
+    def close_source(self, source_id: str):
+        """Source stopped: write pending clips with the frames available and drop the buffer."""
+        with self._lock:
+            buffer = self.buffers.pop(source_id, None)
+        if buffer is not None and buffer.pending:
+            self._finish(source_id, buffer, lambda clip: True)
+
+    def _finish(self, source_id: str, buffer: ClipBuffer, ready):
+        with buffer._lock:
+            done = [clip for clip in buffer.pending if ready(clip)]
+            buffer.pending = [clip for clip in buffer.pending if not ready(clip)]
+        for clip in done:
+            frames = buffer.window(clip.start, clip.end)
+            _writer_pool.submit(self._write_clip, source_id, clip, frames)
+
+    def _write_clip(self, source_id: str, clip: PendingClip, frames: List[Tuple[float, bytes]]):
+        try:
+            os.makedirs(self.clips_dir, exist_ok=True)
+            index = []
+            offset = 0
+            with open(self._path(clip.clip_id, ".mjpeg"), "wb") as f:
+                for ts, jpeg in frames:
+                    f.write(jpeg)
+                    index.append({"t": round(ts - clip.event_time, 3), "offset": offset, "size": len(jpeg)})
+                    offset += len(jpeg)
+            manifest = {
+                "id": clip.clip_id,
+                "source": source_id,
+                "event_time": clip.event_time,
+                "start": clip.start,
+                "end": clip.end,
+                "frames": len(frames),
+                "bytes": offset,
+                "duration": round(frames[-1][0] - frames[0][0], 3) if frames else 0,
+                "created_at": time.time(),
+                "metadata": clip.metadata,
+                "index": index,
+            }
+            with open(self._path(clip.clip_id, ".json"), "w") as f:
+                json.dump(manifest, f)
+            self.clips_written += 1
+            print(f"[Clips] Saved clip {clip.clip_id} ({len(frames)} frames, {offset // 1024} KB) for {source_id}")
+        except Exception as e:
+            print(f"[Clips] Could not write clip {clip.clip_id}: {e}")
+
+    def _path(self, clip_id: str, suffix: str) -> str:
+        # Clip ids are generated server-side (uuid4); basename() guards lookups from the API
+        return os.path.join(self.clips_dir, os.path.basename(clip_id) + suffix)
+
+    def get_manifest(self, clip_id: str) -> Optional[Dict]:
+        path = self._path(clip_id, ".json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def clip_file(self, clip_id: str) -> Optional[str]:
+        path = self._path(clip_id, ".mjpeg")
+        return path if os.path.exists(path) else None
+
+    def get_stats(self) -> dict:
+        return {
+            "buffers": {
+                source_id: {"frames": len(buffer.frames), "bytes": buffer.bytes, "pending_clips": len(buffer.pending)}
+                for source_id, buffer in list(self.buffers.items())
+            },
+            "clips_written": self.clips_written,
+        }
+
+
+# Singleton instance
+clip_recorder = ClipRecorder()
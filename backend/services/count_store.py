@@ -0,0 +1,253 @@
+"""
+Count Store - Memory-mapped columnar time series of per-camera person counts.
+
+Every processed frame of a live stream (and every headless sample, see
+services/headless_analytics.py) is recorded here. Counts are kept at four
+fixed resolutions ("rollups"), each updated in place as samples arrive:
+
+    level  bucket   segment file covers   rows per segment
+    1s     1 s      1 day                 86400
+    1m     1 min    7 days                10080
+    15m    15 min   30 days               2880
+    1h     1 hour   365 days              8760
+
+Buckets are aligned to the Unix epoch (UTC). A bucket's row position is
+implied by its start time, so there is no timestamp column and no index:
+a range query maps [start, end] straight to the segment files and row
+slices it needs, and only those pages are read. Segment files are created
+sparse, so buckets without samples take no disk space.
+
+On disk: data/counts/<camera_id>/<level>/<segment>.seg, each a single
+np.memmap holding the columns back to back:
+
+    sum      float64[rows]   sum of the counts in the bucket
+    min      float32[rows]
+    max      float32[rows]
+    samples  uint32[rows]    0 = no data for this bucket
+
+Rows are updated write-through (samples last), so a bucket that is still
+filling is queryable and a restart simply keeps adding to it. Memory use
+is the mapped pages actually touched plus a few open writer segments.
+
+Stream pipelines run on the event loop, so they use record() and release(),
+which queue the write (or the close) on a single writer thread instead of
+touching the mapped pages - and possibly the disk - themselves.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+COUNTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "counts")
+
+# Largest number of buckets a query returns when it picks the resolution itself
+MAX_QUERY_POINTS = 2000
+# Writer segments kept mapped (the current segment of each level of each recording camera)
+MAX_OPEN_SEGMENTS = 256
+
+
+class Level(NamedTuple):
+    name: str
+    step: int  # bucket width in seconds
+    segment_seconds: int
+
+    @property
+    def rows(self) -> int:
+        return self.segment_seconds // self.step
+
+
+LEVELS = (
+    Level("1s", 1, 86400),
+    Level("1m", 60, 7 * 86400),
+    Level("15m", 900, 30 * 86400),
+    Level("1h", 3600, 365 * 86400),
+)
+LEVELS_BY_NAME = {level.name: level for level in LEVELS}
+
+# Column layout of a segment file: name -> dtype, in file order
+_COLUMNS = (("sum", np.float64), ("min", np.float32), ("max", np.float32), ("samples", np.uint32))
+_ROW_BYTES = sum(np.dtype(dtype).itemsize for _, dtype in _COLUMNS)
+
+# record()/release() run here, in submission order
+_writer_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="count-writer")
+
+
+class Segment:
+    """Column views over one memory-mapped segment file."""
+
+    def __init__(self, path: str, level: Level, writable: bool):
+        exists = os.path.exists(path)
+        mode = ("r+" if exists else "w+") if writable else "r"
+        self.map = np.memmap(path, dtype=np.uint8, mode=mode, shape=(level.rows * _ROW_BYTES,))
+        self.columns: Dict[str, np.ndarray] = {}
+        offset = 0
+        for name, dtype in _COLUMNS:
+            size = level.rows * np.dtype(dtype).itemsize
+            self.columns[name] = self.map[offset:offset + size].view(dtype)
+            offset += size
+
+    def add(self, row: int, value: float):
+        columns = self.columns
+        n = columns["samples"][row]
+        if n == 0:
+            columns["sum"][row] = value
+            columns["min"][row] = value
+            columns["max"][row] = value
+        else:
+            columns["sum"][row] += value
+            if value < columns["min"][row]:
+                columns["min"][row] = value
+            if value > columns["max"][row]:
+                columns["max"][row] = value
+        # Written last: a row only counts once its values are in place
+        columns["samples"][row] = n + 1
+
+    def close(self):
+        self.map.flush()
+        self.columns = {}
+        self.map = None
+
+
+class CountStore:
+    """Per-camera count rollups in memory-mapped segment files (thread-safe)."""
+
+    def __init__(self, root: str = COUNTS_DIR, max_open_segments: int = MAX_OPEN_SEGMENTS):
+        self.root = root
+        self.max_open_segments = max_open_segments
+        # (camera_id, level name, segment index) -> Segment, least recently written first
+        self._writers: "OrderedDict[Tuple[str, str, int], Segment]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.samples_written = 0
+
+    def _dir(self, camera_id: str, level: Level) -> str:
+        # Camera ids are uuid4s or fixed public ids; basename() guards lookups from the API
+        return os.path.join(self.root, os.path.basename(camera_id), level.name)
+
+    def _path(self, camera_id: str, level: Level, segment: int) -> str:
+        return os.path.join(self._dir(camera_id, level), f"{segment}.seg")
+
+    def _writer(self, camera_id: str, level: Level, segment: int) -> Segment:
+        key = (camera_id, level.name, segment)
+        writer = self._writers.get(key)
+        if writer is not None:
+            self._writers.move_to_end(key)
+            return writer
+        os.makedirs(self._dir(camera_id, level), exist_ok=True)
+        writer = self._writers[key] = Segment(self._path(camera_id, level, segment), level, writable=True)
+        while len(self._writers) > self.max_open_segments:
+            self._writers.popitem(last=False)[1].close()
+        return writer
+
+    def append(self, camera_id: str, timestamp: float, count: float):
+        """Record one sample into every rollup level."""
+        second = int(timestamp)
+        with self._lock:
+            for level in LEVELS:
+                segment, offset = divmod(second, level.segment_seconds)
+                self._writer(camera_id, level, segment).add(offset // level.step, count)
+            self.samples_written += 1
+
+    def record(self, camera_id: str, timestamp: float, count: float):
+        """append() on the writer thread (for event-loop callers; does not wait)."""
+        _writer_pool.submit(self._append_logged, camera_id, timestamp, count)
+
+    def release(self, camera_id: str):
+        """close(camera_id) on the writer thread, after the camera's queued samples."""
+        _writer_pool.submit(self._close, camera_id)
+
+    def _append_logged(self, camera_id: str, timestamp: float, count: float):
+        try:
+            self.append(camera_id, timestamp, count)
+        except Exception as e:
+            print(f"[Counts] Could not record count for {camera_id}: {e}")
+
+    @staticmethod
+    def pick_level(start: float, end: float, max_points: int = MAX_QUERY_POINTS) -> Level:
+        """Finest level that covers [start, end] in at most max_points buckets."""
+        for level in LEVELS:
+            if (end - start) / level.step <= max_points:
+                return level
+        return LEVELS[-1]
+
+    def query(
+        self,
+        camera_id: str,
+        start: float,
+        end: float,
+        resolution: Optional[str] = None,
+        max_points: int = MAX_QUERY_POINTS,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Buckets with data overlapping [start, end], oldest first.
+
+        Args:
+            resolution: "1s", "1m", "15m" or "1h"; default: the finest level with at most max_points buckets
+        Returns: {"resolution", "timestamps" (bucket starts), "mean", "min", "max", "samples"}
+        """
+        level = LEVELS_BY_NAME[resolution] if resolution else self.pick_level(start, end, max_points)
+        first = int(start) // level.step * level.step
+        last = int(end) // level.step * level.step
+
+        parts: List[Dict[str, np.ndarray]] = []
+        for segment in range(first // level.segment_seconds, last // level.segment_seconds + 1):
+            segment_start = segment * level.segment_seconds
+            lo = max(first, segment_start) - segment_start
+            hi = min(last, segment_start + level.segment_seconds - level.step) - segment_start
+            rows = slice(lo // level.step, hi // level.step + 1)
+            with self._lock:
+                writer = self._writers.get((camera_id, level.name, segment))
+                part = {name: column[rows].copy() for name, column in writer.columns.items()} if writer else None
+            if part is None:
+                # Closed segment: map it read-only and copy out just the rows in range
+                path = self._path(camera_id, level, segment)
+                if not os.path.exists(path):
+                    continue
+                reader = Segment(path, level, writable=False)
+                part = {name: np.array(column[rows]) for name, column in reader.columns.items()}
+                del reader
+            present = np.flatnonzero(part["samples"])
+            if not len(present):
+                continue
+            part = {name: column[present] for name, column in part.items()}
+            part["timestamps"] = segment_start + (rows.start + present).astype(np.int64) * level.step
+            parts.append(part)
+
+        names = ("timestamps", "sum", "min", "max", "samples")
+        if parts:
+            merged = {name: np.concatenate([part[name] for part in parts]) for name in names}
+        else:
+            merged = {name: np.empty(0) for name in names}
+        samples = merged.pop("samples")
+        total = merged.pop("sum")
+        return {
+            "resolution": level.name,
+            "timestamps": merged["timestamps"],
+            "mean": total / np.maximum(samples, 1),
+            "min": merged["min"],
+            "max": merged["max"],
+            "samples": samples,
+        }
+
+    def close(self, camera_id: Optional[str] = None):
+        """Write queued samples, then flush and unmap one camera's writer segments (or all)."""
+        _writer_pool.submit(self._close, camera_id).result()
+
+    def _close(self, camera_id: Optional[str] = None):
+        with self._lock:
+            for key in [key for key in self._writers if camera_id is None or key[0] == camera_id]:
+                self._writers.pop(key).close()
+
+    def get_stats(self) -> dict:
+        return {
+            "open_segments": len(self._writers),
+            "samples_written": self.samples_written,
+            "levels": [level.name for level in LEVELS],
+        }
+
+
+# Singleton instance
+count_store = CountStore()
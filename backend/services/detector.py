@@ -1,99 +1,287 @@
-from ultralytics import YOLO
+from dataclasses import dataclass
 import threading
 import cv2
 import numpy as np
-import os
+from services.model_backend import load_yolo, warm_up
+
+# Box colours by confidence: orange (<= 0.5), yellow (<= 0.7), green (> 0.7)
+_CONF_BINS = np.array([0.5, 0.7])
+_CONF_COLORS = np.array([(0, 165, 255), (0, 255, 255), (0, 255, 0)])
+
+# Detections kept per tile in tiled mode (dense tiles exceed the usual 100)
+TILE_MAX_DET = 300
+
+# COCO class ids detected by default (person only)
+PERSON_CLASSES = (0,)
+# NMS IoU threshold for person detection
+PERSON_IOU = 0.45
+
+
+@dataclass
+class Detections:
+    """Detections for one frame as NumPy arrays (no drawing involved)."""
+    boxes: np.ndarray        # (N, 4) float32 - x1, y1, x2, y2 in frame pixels
+    confidences: np.ndarray  # (N,) float32
+    classes: np.ndarray      # (N,) int32 - COCO class ids
+
+    @property
+    def count(self) -> int:
+        return len(self.confidences)
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls(
+            boxes=np.zeros((0, 4), dtype=np.float32),
+            confidences=np.zeros(0, dtype=np.float32),
+            classes=np.zeros(0, dtype=np.int32),
+        )
+
+    @classmethod
+    def from_result(cls, result) -> "Detections":
+        """Convert an ultralytics Result into arrays in one transfer per field."""
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return cls.empty()
+        return cls(
+            boxes=boxes.xyxy.cpu().numpy().astype(np.float32, copy=False),
+            confidences=boxes.conf.cpu().numpy().astype(np.float32, copy=False),
+            classes=boxes.cls.cpu().numpy().astype(np.int32),
+        )
+
+    def filter(self, conf_threshold: float) -> "Detections":
+        """Keep only detections at or above the confidence threshold."""
+        keep = self.confidences >= conf_threshold
+        if keep.all():
+            return self
+        return Detections(self.boxes[keep], self.confidences[keep], self.classes[keep])
+
+    def select(self, index) -> "Detections":
+        """Subset by boolean mask or index array."""
+        return Detections(self.boxes[index], self.confidences[index], self.classes[index])
+
+    def top(self, max_det: int) -> "Detections":
+        """Keep the max_det most confident detections."""
+        if self.count <= max_det:
+            return self
+        return self.select(np.argsort(-self.confidences, kind="stable")[:max_det])
+
+    def transformed(self, scale_x: float = 1.0, scale_y: float = 1.0,
+                    offset_x: float = 0.0, offset_y: float = 0.0) -> "Detections":
+        """Map boxes to another coordinate frame: (box + offset) * scale."""
+        offset = np.array([offset_x, offset_y, offset_x, offset_y], dtype=np.float32)
+        scale = np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
+        return Detections((self.boxes + offset) * scale, self.confidences, self.classes)
+
+    @classmethod
+    def concatenate(cls, parts) -> "Detections":
+        parts = [p for p in parts if p.count]
+        if not parts:
+            return cls.empty()
+        return cls(
+            boxes=np.concatenate([p.boxes for p in parts]),
+            confidences=np.concatenate([p.confidences for p in parts]),
+            classes=np.concatenate([p.classes for p in parts]),
+        )
+
+
+def tile_windows(height: int, width: int, tile_size: int = 640, overlap: float = 0.2) -> np.ndarray:
+    """
+    Overlapping tile windows covering a frame.
+    
+    Returns:
+        (T, 4) int array of x1, y1, x2, y2; edge tiles are shifted inward so
+        every tile is full size (unless the frame itself is smaller).
+    """
+    tile_size = max(32, int(tile_size))
+    overlap = min(max(float(overlap), 0.0), 0.9)
+    stride = max(1, int(tile_size * (1 - overlap)))
+    
+    def starts(length):
+        if length <= tile_size:
+            return np.array([0])
+        s = np.arange(0, length - tile_size, stride)
+        return np.append(s, length - tile_size)
+    
+    ys, xs = np.meshgrid(starts(height), starts(width), indexing="ij")
+    x1, y1 = xs.ravel(), ys.ravel()
+    return np.stack([x1, y1, np.minimum(x1 + tile_size, width), np.minimum(y1 + tile_size, height)], axis=1)
+
+
+def merge_tile_detections(detections: Detections, tiles: np.ndarray, match_threshold: float = 0.6) -> Detections:
+    """
+    Cross-tile NMS for detections gathered from overlapping tiles.
+    
+    tiles[i] is the index of the tile detection i came from. Only pairs from
+    DIFFERENT tiles are merged: boxes from the same tile already went through
+    the model's own NMS, so overlapping people (or a small box nested in a
+    larger one) found by one tile are all kept. Each box lies within its own
+    tile, so a cross-tile pair can only intersect inside the strip the two
+    tiles share.
+    
+    Matching uses intersection over the SMALLER box rather than IoU, so a
+    person cut off at a tile edge (a partial box inside the full one seen by
+    the neighbouring tile) is also merged.
+    """
+    if detections.count <= 1:
+        return detections
+    
+    boxes = detections.boxes
+    areas = np.maximum(boxes[:, 2] - boxes[:, 0], 0) * np.maximum(boxes[:, 3] - boxes[:, 1], 0)
+    order = np.argsort(-detections.confidences, kind="stable")
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        if not rest.size:
+            break
+        ix1 = np.maximum(boxes[best, 0], boxes[rest, 0])
+        iy1 = np.maximum(boxes[best, 1], boxes[rest, 1])
+        ix2 = np.minimum(boxes[best, 2], boxes[rest, 2])
+        iy2 = np.minimum(boxes[best, 3], boxes[rest, 3])
+        inter = np.maximum(ix2 - ix1, 0) * np.maximum(iy2 - iy1, 0)
+        smaller = np.minimum(areas[best], areas[rest])
+        duplicate = (tiles[rest] != tiles[best]) & (inter / np.maximum(smaller, 1e-6) >= match_threshold)
+        order = rest[~duplicate]
+    return detections.select(np.array(keep))
+
+
+def merge_tiles(per_tile, windows) -> Detections:
+    """Shift per-tile detections into frame coordinates and merge them."""
+    shifted = [
+        dets.transformed(offset_x=float(x1), offset_y=float(y1))
+        for dets, (x1, y1, _, _) in zip(per_tile, windows)
+    ]
+    tiles = np.repeat(np.arange(len(shifted)), [dets.count for dets in shifted])
+    merged = Detections.concatenate(shifted)
+    return merge_tile_detections(merged, tiles)
+
+
+def _per_frame(value, n):
+    """Expand a scalar setting to one value per frame."""
+    if isinstance(value, (int, float)):
+        return [value] * n
+    return list(value)
+
 
 class ObjectDetector:
+    """
+    Person detector singleton. Constructing it is cheap: the shared model is
+    loaded on first use, and the inference scheduler loads its own replicas.
+    """
     _instance = None
     _lock = threading.Lock()
 
+    WEIGHTS = "yolov8n.pt"
+
     def __new__(cls):
         if cls._instance is None:
             with cls._lock:
                 if cls._instance is None:
                     cls._instance = super(ObjectDetector, cls).__new__(cls)
-                    # Load a pretrained YOLOv8n model
-                    # Try multiple paths for the model file
-                    model_paths = [
-                        "yolov8n.pt",  # Current directory
-                        "../yolov8n.pt",  # Parent directory (when run from backend)
-                        os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "yolov8n.pt"),  # Project root
-                    ]
-                    
-                    model_path = "yolov8n.pt"  # Default, will auto-download if not found
-                    for path in model_paths:
-                        if os.path.exists(path):
-                            model_path = path
-                            print(f"[YOLO] Loading model from: {os.path.abspath(path)}")
-                            break
-                    else:
-                        print("[YOLO] Model not found locally, will download automatically")
-                    
-                    cls._instance.model = YOLO(model_path)
+                    cls._instance._model = None
+                    # The shared model is not thread-safe; replicas have their own
+                    cls._instance._model_lock = threading.Lock()
         return cls._instance
 
-    def process_frame(self, frame, line_thickness=1, conf_threshold=0.25):
+    @property
+    def model(self):
+        """Shared YOLOv8n model, loaded lazily on the configured backend (see services/model_backend.py)."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    model = load_yolo(self.WEIGHTS, task="detect", name="person_detector")
+                    warm_up(model, "person_detector")
+                    self._model = model
+        return self._model
+
+    def create_replica(self, index: int = 0):
+        """Load and warm up an independent copy of the model for a dedicated worker thread."""
+        name = f"person_detector/replica-{index}"
+        model = load_yolo(self.WEIGHTS, task="detect", name=name)
+        warm_up(model, name)
+        return model
+
+    def detect_batch(self, frames, conf_threshold=0.25, model=None, max_det=100, classes=PERSON_CLASSES,
+                     iou=PERSON_IOU):
         """
-        Process a single frame: detect persons, draw THIN boxes with person numbers, and return count + processed frame.
+        Run detection on several frames in one forward pass.
         
         Args:
-            frame: Input frame
-            line_thickness: Thickness of bounding box lines (default 1 for thin lines)
-            conf_threshold: Minimum confidence threshold for detection (default 0.25 for better accuracy)
+            frames: List of input frames (may differ in size)
+            conf_threshold: Minimum confidence threshold, either one value or one per frame
+            model: Replica to run on (from create_replica); defaults to the shared model
+            max_det: Max detections per frame, either one value or one per frame
+            classes: COCO class ids to detect (default: persons)
+            iou: NMS IoU threshold
+        
+        Returns:
+            List of Detections, in input order
         """
+        thresholds = _per_frame(conf_threshold, len(frames))
+        limits = _per_frame(max_det, len(frames))
+        
+        if model is None:
+            with self._model_lock:
+                results = self._predict(self.model, frames, min(thresholds), max(limits), classes, iou)
+        else:
+            results = self._predict(model, frames, min(thresholds), max(limits), classes, iou)
+        
+        return [
+            Detections.from_result(result).filter(threshold).top(limit)
+            for result, threshold, limit in zip(results, thresholds, limits)
+        ]
+
+    def _predict(self, model, frames, conf, max_det=100, classes=PERSON_CLASSES, iou=PERSON_IOU):
         # Run YOLO with optimized settings for person detection
-        results = self.model(
-            frame, 
-            classes=[0],  # class 0 is person
+        return model(
+            frames, 
+            classes=list(classes),  # class 0 is person
             verbose=False,
-            conf=conf_threshold,  # Lower threshold to catch more people
-            iou=0.45,  # IOU threshold for NMS
-            max_det=100,  # Max detections per frame
-            agnostic_nms=True,  # Class-agnostic NMS for better results
+            conf=conf,  # Per-frame thresholds are applied by the caller
+            iou=iou,  # IOU threshold for NMS
+            max_det=max_det,  # Max detections per frame
+            # Class-agnostic NMS for persons; with several classes a carried bag must survive its owner's box
+            agnostic_nms=len(classes) == 1,
         )
+
+    def annotate(self, frame, detections: Detections, line_thickness=1, copy=True):
+        """
+        Draw numbered person boxes onto the frame (a copy unless copy=False).
         
-        # Create a copy of the frame for annotation
-        annotated_frame = frame.copy()
-        
-        # Draw thin bounding boxes manually
-        boxes = results[0].boxes
-        person_count = len(boxes)
+        Ordering, colours and label geometry are computed for all boxes at
+        once with NumPy; only the final OpenCV draw calls run per box.
+        """
+        annotated_frame = frame.copy() if copy else frame
+        if detections.count == 0:
+            return annotated_frame
         
         # Sort boxes by x-coordinate (left to right) for consistent numbering
-        box_list = []
-        for box in boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-            conf = float(box.conf[0])
-            box_list.append((x1, y1, x2, y2, conf))
+        order = np.argsort(detections.boxes[:, 0], kind="stable")
+        coords = detections.boxes[order].astype(np.int32)
+        confs = detections.confidences[order]
         
-        # Sort by x1 (left to right ordering)
-        box_list.sort(key=lambda b: b[0])
+        # Color: green for high confidence, yellow for medium, orange for low
+        colors = _CONF_COLORS[np.digitize(confs, _CONF_BINS, right=True)]
         
-        for person_num, (x1, y1, x2, y2, conf) in enumerate(box_list, start=1):
-            # Color: green for high confidence, yellow for medium, orange for low
-            if conf > 0.7:
-                color = (0, 255, 0)  # Green
-            elif conf > 0.5:
-                color = (0, 255, 255)  # Yellow
-            else:
-                color = (0, 165, 255)  # Orange
-            
+        # Label boxes: width depends only on the number of digits
+        font_scale = 0.5
+        font_thickness = 1
+        labels = np.arange(1, len(order) + 1)
+        digits = np.floor(np.log10(labels)).astype(np.int32) + 1
+        label_sizes = {
+            d: cv2.getTextSize("8" * int(d), cv2.FONT_HERSHEY_SIMPLEX, font_scale, font_thickness)[0]
+            for d in np.unique(digits)
+        }
+        
+        for person_num, (x1, y1, x2, y2), color, d in zip(labels, coords.tolist(), colors.tolist(), digits.tolist()):
+            color = tuple(color)
             # Draw thin rectangle
             cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, line_thickness)
             
-            # Draw person number label (1, 2, 3, ...)
-            label = str(person_num)
-            font_scale = 0.5
-            font_thickness = 1
-            (label_w, label_h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, font_thickness)
-            
-            # Label background
+            # Label background + person number (1, 2, 3, ...)
+            label_w, label_h = label_sizes[d]
             cv2.rectangle(annotated_frame, (x1, y1 - label_h - 6), (x1 + label_w + 6, y1), color, -1)
-            # Label text (person number)
-            cv2.putText(annotated_frame, label, (x1 + 3, y1 - 3), 
+            cv2.putText(annotated_frame, str(person_num), (x1 + 3, y1 - 3), 
                        cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), font_thickness)
         
-        return annotated_frame, person_count
-
-
+        return annotated_frame
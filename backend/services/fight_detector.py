@@ -21,7 +21,7 @@ from collections import deque
 import time
 import base64
 
-from ultralytics import YOLO
+from services.pose_estimator import PoseResult, get_pose_estimator
 
 
 @dataclass
@@ -85,7 +85,8 @@ class FightDetector:
         Args:
             model_path: Path to YOLOv8-Pose model weights
         """
-        self.model = YOLO(model_path)
+        # Shared with the other pose-based detectors (one inference per frame)
+        self.pose_estimator = get_pose_estimator(model_path)
         
         # Pose history for each tracked person
         self.pose_histories: Dict[int, PoseHistory] = {}
@@ -353,27 +354,33 @@ class FightDetector:
             )
         return None
     
-    def process_frame(self, frame: np.ndarray, timestamp: float) -> Dict:
+    def process_frame(self, frame: np.ndarray, timestamp: float,
+                      pose: Optional[PoseResult] = None, canvas: Optional[np.ndarray] = None,
+                      annotate: bool = True) -> Dict:
         """
         Process a single frame for fight detection.
         
         Args:
             frame: BGR image from OpenCV
             timestamp: Current timestamp in seconds
+            pose: Precomputed pose for this frame (runs the shared estimator if None)
+            canvas: Frame to draw markers onto in place (defaults to a fresh pose plot)
+            annotate: If False, skip drawing ("frame" is None); pass "markers" to draw() later
             
         Returns:
             Dict with detection results and any alerts
         """
         self._frame_count += 1
         
-        # Run YOLOv8-Pose
-        results = self.model(frame, verbose=False)
+        # Run YOLOv8-Pose (once per frame when shared)
+        if pose is None:
+            pose = self.pose_estimator.estimate(frame)
         
         events = []
         persons_detected = 0
         
-        if results[0].keypoints is not None:
-            keypoints_data = results[0].keypoints.data.cpu().numpy()
+        if pose.keypoints is not None:
+            keypoints_data = pose.keypoints
             persons_detected = len(keypoints_data)
             
             # Process each detected person
@@ -413,13 +420,14 @@ class FightDetector:
                 events.append(scatter_event)
         
         # Annotate frame
-        annotated_frame = self._annotate_frame(frame, results, events)
+        annotated_frame = self._annotate_frame(pose, canvas, events) if annotate else None
         
         # Filter to high-confidence alerts
         alerts = [e for e in events if e.confidence >= self.CONFIDENCE_THRESHOLD]
         
         return {
             "frame": annotated_frame,
+            "markers": events,
             "persons_detected": persons_detected,
             "events": [{"type": e.event_type, "confidence": e.confidence, 
                        "persons": e.involved_persons, "location": e.location}
@@ -430,9 +438,9 @@ class FightDetector:
             "timestamp": timestamp
         }
     
-    def _annotate_frame(self, frame: np.ndarray, results, events: List[AggressionEvent]) -> np.ndarray:
-        """Draw annotations on frame."""
-        annotated = results[0].plot()
+    def _annotate_frame(self, pose: Optional[PoseResult], canvas: Optional[np.ndarray], events: List[AggressionEvent]) -> np.ndarray:
+        """Draw annotations onto the canvas, or onto a copy of the pose plot."""
+        annotated = pose.plot() if canvas is None else canvas
         
         # Draw event indicators
         for event in events:
@@ -463,6 +471,10 @@ class FightDetector:
         
         return annotated
     
+    def draw(self, canvas: np.ndarray, markers: List[AggressionEvent]) -> np.ndarray:
+        """Draw the "markers" (events) of a process_frame() result onto canvas in place."""
+        return self._annotate_frame(None, canvas, markers)
+    
     def get_screenshot(self, frame: np.ndarray) -> str:
         """Encode frame as base64 JPEG."""
         _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
@@ -475,14 +487,3 @@ class FightDetector:
         self.current_events.clear()
         self.next_person_id = 0
         self._frame_count = 0
-
-
-# Singleton instance
-_detector_instance = None
-
-def get_fight_detector() -> FightDetector:
-    """Get or create singleton detector instance."""
-    global _detector_instance
-    if _detector_instance is None:
-        _detector_instance = FightDetector()
-    return _detector_instance
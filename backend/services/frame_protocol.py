@@ -0,0 +1,97 @@
+"""
+Frame Protocol - Compact binary framing for processed stream frames.
+
+The legacy WebSocket protocol sends every frame as two messages (JPEG bytes,
+then a JSON object with the count), which doubles the per-frame framing and
+lets the two drift apart when a client lags. With ?protocol=binary each frame
+is one binary message instead:
+
+    offset  size  type        field
+    0       4     bytes       magic "CRWD"
+    4       1     uint8       protocol version (1)
+    5       1     uint8       flags (bit 0: box array present)
+    6       2     uint16      box count (N)
+    8       4     uint32      sequence number
+    12      4     uint32      person count
+    16      8     float64     publish timestamp (Unix seconds)
+    24      8     float64     capture timestamp (Unix seconds, 0 if unknown)
+    32      20*N  float32[5]  boxes: x1, y1, x2, y2 (0-1, relative to the frame), confidence
+    32+20N  ...   bytes       JPEG payload
+
+All fields are little-endian. A browser parses it with one DataView:
+    const view = new DataView(buf);
+    const count = view.getUint32(12, true), boxes = view.getUint16(6, true);
+    const jpeg = new Blob([buf.slice(32 + 20 * boxes)], {type: "image/jpeg"});
+"""
+
+import struct
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+MAGIC = b"CRWD"
+VERSION = 1
+FLAG_BOXES = 0x01
+
+HEADER = struct.Struct("<4sBBHIIdd")
+BOX_DTYPE = np.dtype("<f4")
+BOX_FIELDS = 5  # x1, y1, x2, y2, confidence
+MAX_BOXES = 0xFFFF
+
+
+class DecodedFrame(NamedTuple):
+    seq: int
+    count: int
+    timestamp: float
+    captured_at: Optional[float]
+    boxes: Optional[np.ndarray]  # (N, 5) float32, or None if the sender left them out
+    jpeg: bytes
+
+
+def pack_frame(
+    seq: int,
+    count: int,
+    timestamp: float,
+    jpeg: bytes,
+    captured_at: Optional[float] = None,
+    boxes: Optional[np.ndarray] = None,
+) -> bytes:
+    """Build one binary frame message; boxes is an (N, 5) array of normalised boxes + confidence."""
+    flags = 0
+    box_bytes = b""
+    box_count = 0
+    if boxes is not None:
+        flags |= FLAG_BOXES
+        boxes = np.ascontiguousarray(boxes[:MAX_BOXES], dtype=BOX_DTYPE)
+        box_count = len(boxes)
+        box_bytes = boxes.tobytes()
+    header = HEADER.pack(
+        MAGIC, VERSION, flags, box_count,
+        seq & 0xFFFFFFFF, max(0, int(count)), timestamp, captured_at or 0.0,
+    )
+    return b"".join((header, box_bytes, jpeg))
+
+
+def unpack_frame(data: bytes) -> DecodedFrame:
+    """Parse a message built by pack_frame (for Python clients and tooling)."""
+    if len(data) < HEADER.size:
+        raise ValueError("Frame shorter than header")
+    magic, version, flags, box_count, seq, count, timestamp, captured_at = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Bad frame magic")
+    if version != VERSION:
+        raise ValueError(f"Unsupported frame protocol version {version}")
+    offset = HEADER.size
+    boxes = None
+    if flags & FLAG_BOXES:
+        size = box_count * BOX_FIELDS * BOX_DTYPE.itemsize
+        boxes = np.frombuffer(data, dtype=BOX_DTYPE, count=box_count * BOX_FIELDS, offset=offset).reshape(-1, BOX_FIELDS)
+        offset += size
+    return DecodedFrame(
+        seq=seq,
+        count=count,
+        timestamp=timestamp,
+        captured_at=captured_at or None,
+        boxes=boxes,
+        jpeg=bytes(data[offset:]),
+    )
@@ -0,0 +1,90 @@
+"""
+Frame Slot - Latest-frame handoff from a capture thread to the asyncio event loop.
+
+A capture thread put()s decoded frames; the camera's pipeline task awaits
+get(). The slot holds only the newest frame (older ones are overwritten,
+never queued), and the waiter is woken through call_soon_threadsafe, so the
+event loop never blocks on a queue and a stalled camera costs nothing.
+Each frame carries the time it was captured, for latency reporting.
+"""
+
+import asyncio
+import threading
+import time
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+
+class CapturedFrame(NamedTuple):
+    frame: np.ndarray
+    captured_at: float  # time.time() when the frame was grabbed from the source
+
+
+class LatestFrameSlot:
+    """Single-slot, latest-wins frame buffer (put from any thread, get on the loop)."""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self._loop = loop or asyncio.get_event_loop()
+        self._lock = threading.Lock()
+        self._frame: Optional[CapturedFrame] = None
+        self._event = asyncio.Event()
+        self.closed = False
+        self.frames_put = 0
+        self.frames_dropped = 0
+
+    @property
+    def has_pending(self) -> bool:
+        """True while the last frame put() has not been taken yet."""
+        return self._frame is not None
+
+    def put(self, frame: np.ndarray, captured_at: Optional[float] = None):
+        """Publish a frame from a capture thread, replacing any frame not yet taken."""
+        with self._lock:
+            if self.closed:
+                return
+            if self._frame is not None:
+                self.frames_dropped += 1
+            self._frame = CapturedFrame(frame, time.time() if captured_at is None else captured_at)
+            self.frames_put += 1
+        self._notify()
+
+    def close(self):
+        """Release the waiting consumer; subsequent get() calls return None."""
+        with self._lock:
+            self.closed = True
+            self._frame = None
+        self._notify()
+
+    def _notify(self):
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # Event loop already closed (shutdown)
+            pass
+
+    def take(self) -> Optional[CapturedFrame]:
+        """Take the pending frame without waiting (None if there is none)."""
+        with self._lock:
+            frame, self._frame = self._frame, None
+            return frame
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[CapturedFrame]:
+        """
+        Wait for the next frame.
+
+        Returns None on timeout or when the slot is closed.
+        """
+        frame = self.take()
+        if frame is not None or self.closed:
+            return frame
+        self._event.clear()
+        # A put() may have landed between take() and clear()
+        frame = self.take()
+        if frame is not None:
+            return frame
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self.take()
@@ -0,0 +1,89 @@
+"""
+Headless Analytics - Continuous low-rate counting for selected saved cameras.
+
+A saved camera with "headless": true is kept running 24/7 whether or not
+anyone is watching. While it has no viewers its pipeline only counts:
+frames are taken at the camera's "headless_fps" (default
+CROWDEX_HEADLESS_FPS), detection runs without annotation and nothing is
+encoded or published. Every count goes to the count store. When a viewer
+attaches the stream switches to the normal rate and annotated output, and
+drops back once the last viewer leaves.
+
+The runner holds one consumer reference on each headless stream (so the
+idle timeout never stops it) and checks the saved cameras every
+HEADLESS_CHECK_SECONDS: it starts newly enabled cameras, restarts streams
+that stopped (e.g. gave up after repeated failures) and releases cameras
+whose headless flag was turned off.
+
+Configuration (environment variables):
+    CROWDEX_HEADLESS         Set to 0 to disable headless analytics (default 1)
+    CROWDEX_HEADLESS_FPS     Default processing rate without viewers (default 1)
+"""
+
+import asyncio
+import os
+from typing import Optional, Set
+
+HEADLESS_ENABLED = os.getenv("CROWDEX_HEADLESS", "1") != "0"
+HEADLESS_FPS = float(os.getenv("CROWDEX_HEADLESS_FPS", "1"))
+HEADLESS_CHECK_SECONDS = 30.0
+
+
+class HeadlessAnalytics:
+    """Keeps headless cameras of an RTSPCameraService running (runs on the event loop)."""
+
+    def __init__(self, service, enabled: bool = HEADLESS_ENABLED):
+        self.service = service
+        self.enabled = enabled
+        self.attached: Set[str] = set()  # cameras we hold a consumer reference on
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the runner on the current event loop (no-op if disabled or already running)."""
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        print("[Headless] Runner started")
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                print(f"[Headless] Error syncing cameras: {e}")
+            await asyncio.sleep(HEADLESS_CHECK_SECONDS)
+
+    async def sync(self):
+        """Bring running streams in line with the saved cameras' headless flags."""
+        wanted = {cam["id"]: cam for cam in self.service.get_saved_cameras() if cam.get("headless")}
+
+        for camera_id in list(self.attached):
+            stream = self.service.active_streams.get(camera_id)
+            if camera_id in wanted and stream is not None and stream.get("headless"):
+                # Pick up rate changes made since the stream started
+                stream["info"]["headless_fps"] = wanted[camera_id].get("headless_fps")
+                continue
+            # Turned off, deleted, or the stream stopped (a restarted stream is attached again below)
+            self.attached.discard(camera_id)
+            if stream is not None and stream.get("headless"):
+                stream["headless"] = False
+                self.service.remove_consumer(camera_id)
+                print(f"[Headless] Released {camera_id}")
+
+        for camera_id in wanted:
+            if camera_id in self.attached:
+                continue
+            if camera_id not in self.service.active_streams and not await self.service.start_stream(camera_id):
+                print(f"[Headless] Could not start {camera_id}; retrying in {HEADLESS_CHECK_SECONDS:.0f}s")
+                continue
+            stream = self.service.active_streams.get(camera_id)
+            if stream is None:
+                continue
+            stream["headless"] = True
+            self.service.add_consumer(camera_id)
+            self.attached.add(camera_id)
+            # Headless cameras are processed without viewers, so the pipeline must run now
+            self.service._ensure_pipeline(camera_id)
+            print(f"[Headless] Counting {camera_id} at {self.service.headless_fps(camera_id):g} fps")
+
+    def get_stats(self) -> dict:
+        return {"enabled": self.enabled, "default_fps": HEADLESS_FPS, "cameras": sorted(self.attached)}
@@ -0,0 +1,311 @@
+"""
+Inference Scheduler - Batched person detection shared by all streams and uploads.
+
+Callers (RTSP pipelines, the webcam service, upload jobs) submit frames and get
+a Future back that resolves to (annotated_frame, detections); the annotated
+frame is None unless the caller asked for it.
+
+Work is served by a pool of model replicas, one worker thread each. An idle
+worker collects pending frames - up to BATCH_MAX_SIZE, waiting at most
+BATCH_MAX_WAIT_MS after the first one arrives - and runs them through its own
+replica as a single batch. Each worker bounds its torch intra-op threads so
+replicas share the cores instead of oversubscribing them.
+
+Dense-crowd cameras can use submit_tiled(), which splits a full-resolution
+frame into overlapping tiles that are scheduled like ordinary frames.
+Other detectors on the same weights (abandoned objects) pass their own COCO
+classes and NMS settings to submit(); a batch runs one forward pass per
+distinct (classes, iou) pair.
+
+Configuration (environment variables):
+    CROWDEX_BATCH_MAX_SIZE       Maximum frames per forward pass (default 8)
+    CROWDEX_BATCH_MAX_WAIT_MS    Maximum time to wait for a batch to fill (default 15)
+    CROWDEX_INFERENCE_REPLICAS   Number of model replicas (default: 1 per 8 cores)
+    CROWDEX_THREADS_PER_REPLICA  Torch threads per replica (default: cores / replicas)
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from services.detector import (
+    ObjectDetector, Detections, PERSON_CLASSES, PERSON_IOU, TILE_MAX_DET, tile_windows, merge_tiles
+)
+
+BATCH_MAX_SIZE = int(os.getenv("CROWDEX_BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("CROWDEX_BATCH_MAX_WAIT_MS", "15"))
+
+_CPU_COUNT = os.cpu_count() or 1
+INFERENCE_REPLICAS = int(os.getenv("CROWDEX_INFERENCE_REPLICAS", str(max(1, _CPU_COUNT // 8))))
+THREADS_PER_REPLICA = int(os.getenv(
+    "CROWDEX_THREADS_PER_REPLICA", str(max(1, _CPU_COUNT // max(1, INFERENCE_REPLICAS)))
+))
+
+
+@dataclass
+class InferenceRequest:
+    """A single frame waiting for detection."""
+    frame: np.ndarray
+    conf_threshold: float
+    annotate: bool
+    max_det: int
+    future: Future
+    classes: Tuple[int, ...] = PERSON_CLASSES
+    iou: float = PERSON_IOU
+
+
+class InferenceScheduler:
+    """Collects frames from all callers and runs them in batches on a pool of model replicas."""
+
+    def __init__(
+        self,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_MAX_WAIT_MS,
+        replicas: int = INFERENCE_REPLICAS,
+        threads_per_replica: int = THREADS_PER_REPLICA,
+    ):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.replicas = max(1, replicas)
+        self.threads_per_replica = max(1, threads_per_replica)
+        self._queue: "queue.Queue[InferenceRequest]" = queue.Queue()
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        # Collecting a batch is serialised so one idle worker fills it at a time
+        self._collect_lock = threading.Lock()
+
+        # Replicas able to serve: their own model loaded, or the shared model as fallback
+        self._ready = set()
+        self._fallback = set()
+
+        # Stats
+        self.batches_run = 0
+        self.frames_processed = 0
+        self.busy_workers = 0
+
+    def submit(
+        self,
+        frame: np.ndarray,
+        conf_threshold: float = 0.25,
+        annotate: bool = False,
+        classes: Tuple[int, ...] = PERSON_CLASSES,
+        max_det: int = 100,
+        iou: float = PERSON_IOU,
+    ) -> Future:
+        """
+        Queue a frame for detection.
+        The Future resolves to (annotated_frame, detections); annotated_frame
+        is None unless annotate=True, so count-only callers skip the copy and drawing.
+        classes, max_det, iou: COCO class ids to detect (default: persons), detection limit, NMS IoU threshold
+        """
+        return self._enqueue(frame, conf_threshold, annotate, max_det=max_det, classes=tuple(classes), iou=iou)
+
+    async def process(
+        self, frame: np.ndarray, conf_threshold: float = 0.25, annotate: bool = False
+    ) -> Tuple[Optional[np.ndarray], Detections]:
+        """Awaitable wrapper around submit() for asyncio callers."""
+        return await asyncio.wrap_future(self.submit(frame, conf_threshold, annotate))
+
+    def submit_tiled(
+        self,
+        frame: np.ndarray,
+        tile_size: int = 640,
+        overlap: float = 0.2,
+        conf_threshold: float = 0.25,
+        annotate: bool = False,
+        output_size: Optional[Tuple[int, int]] = None,
+    ) -> Future:
+        """
+        Queue a full-resolution frame for tiled detection (dense crowds).
+        
+        Each tile is queued as its own request, so tiles batch together and
+        spread across replicas like any other frames; the last tile to finish
+        merges them with cross-tile NMS. With output_size=(width, height) the
+        boxes (and the annotated frame) are mapped to that display size.
+        """
+        height, width = frame.shape[:2]
+        windows = tile_windows(height, width, tile_size, overlap)
+        tile_futures = [
+            self._enqueue(frame[y1:y2, x1:x2], conf_threshold, False, max_det=TILE_MAX_DET)
+            for x1, y1, x2, y2 in windows
+        ]
+        result = Future()
+        remaining = [len(tile_futures)]
+        remaining_lock = threading.Lock()
+        
+        def on_tile_done(_):
+            with remaining_lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            if not result.set_running_or_notify_cancel():
+                return
+            try:
+                detections = merge_tiles([f.result()[1] for f in tile_futures], windows)
+                display = frame
+                if output_size and output_size != (width, height):
+                    detections = detections.transformed(output_size[0] / width, output_size[1] / height)
+                    if annotate:
+                        display = cv2.resize(frame, output_size)
+                annotated = ObjectDetector().annotate(display, detections, copy=display is frame) if annotate else None
+                result.set_result((annotated, detections))
+            except Exception as e:
+                result.set_exception(e)
+        
+        for future in tile_futures:
+            future.add_done_callback(on_tile_done)
+        return result
+
+    async def process_tiled(self, frame: np.ndarray, **kwargs) -> Tuple[Optional[np.ndarray], Detections]:
+        """Awaitable wrapper around submit_tiled() for asyncio callers."""
+        return await asyncio.wrap_future(self.submit_tiled(frame, **kwargs))
+
+    def _enqueue(self, frame, conf_threshold, annotate, max_det, classes=PERSON_CLASSES, iou=PERSON_IOU) -> Future:
+        self._ensure_worker()
+        future = Future()
+        self._queue.put(InferenceRequest(
+            frame=frame, conf_threshold=conf_threshold, annotate=annotate, max_det=max_det, future=future,
+            classes=classes, iou=iou
+        ))
+        return future
+
+    def pending(self) -> int:
+        """Number of frames waiting for a batch slot."""
+        return self._queue.qsize()
+
+    def get_stats(self) -> dict:
+        return {
+            "batches_run": self.batches_run,
+            "frames_processed": self.frames_processed,
+            "avg_batch_size": round(self.frames_processed / self.batches_run, 2) if self.batches_run else 0,
+            "pending": self.pending(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "replicas": self.replicas,
+            "busy_replicas": self.busy_workers,
+            "threads_per_replica": self.threads_per_replica,
+            "ready_replicas": sorted(self._ready),
+            "fallback_replicas": sorted(self._fallback),
+        }
+
+    def start(self):
+        """Start the replica workers now (loading + warming their models in the background)."""
+        self._ensure_worker()
+
+    def is_ready(self) -> bool:
+        """True once at least one replica can serve (its own model, or the shared one after a load failure)."""
+        return bool(self._ready)
+
+    def _ensure_worker(self):
+        if self._workers:
+            return
+        with self._lock:
+            if not self._workers:
+                for index in range(self.replicas):
+                    worker = threading.Thread(
+                        target=self._run, args=(index,), name=f"inference-replica-{index}", daemon=True
+                    )
+                    worker.start()
+                    self._workers.append(worker)
+
+    def _collect_batch(self) -> List[InferenceRequest]:
+        """Block for the first request, then gather more until full or the wait expires."""
+        with self._collect_lock:
+            return self._collect_batch_locked()
+
+    def _collect_batch_locked(self) -> List[InferenceRequest]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Still take anything that is already queued
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _limit_threads(self):
+        """Bound torch intra-op threads for the calling worker thread."""
+        try:
+            import torch
+            torch.set_num_threads(self.threads_per_replica)
+        except Exception as e:
+            print(f"[Scheduler] Could not set torch thread budget: {e}")
+
+    def _run(self, index: int):
+        self._limit_threads()
+        detector = ObjectDetector()
+        model = None
+        try:
+            model = detector.create_replica(index)
+            ready = True
+        except Exception as e:
+            # Keep serving from the shared model so callers are never left waiting
+            print(f"[Scheduler] Replica {index} failed to load ({e}), using shared model")
+            self._fallback.add(index)
+            try:
+                detector.model  # load it now so readiness reflects whether it works
+                ready = True
+            except Exception as e:
+                print(f"[Scheduler] Shared model failed to load too ({e}); replica {index} cannot serve")
+                ready = False
+        if ready:
+            with self._lock:
+                self._ready.add(index)
+        print(f"[Scheduler] Replica {index} started ({self.threads_per_replica} threads, "
+              f"max batch {self.max_batch_size}, max wait {self.max_wait * 1000:.0f}ms)")
+        while True:
+            batch = self._collect_batch()
+            # Skip requests whose callers have already given up
+            batch = [req for req in batch if req.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            with self._lock:
+                self.busy_workers += 1
+            try:
+                # One forward pass per detection setting (nearly always just persons)
+                groups = {}
+                for req in batch:
+                    groups.setdefault((req.classes, req.iou), []).append(req)
+                for (classes, iou), group in groups.items():
+                    self._run_group(detector, model, classes, iou, group)
+            finally:
+                with self._lock:
+                    self.busy_workers -= 1
+                    self.batches_run += 1
+                    self.frames_processed += len(batch)
+
+    def _run_group(self, detector: ObjectDetector, model, classes, iou, group: List[InferenceRequest]):
+        try:
+            outputs = detector.detect_batch(
+                [req.frame for req in group],
+                conf_threshold=[req.conf_threshold for req in group],
+                model=model,
+                max_det=[req.max_det for req in group],
+                classes=classes,
+                iou=iou,
+            )
+            for req, detections in zip(group, outputs):
+                annotated = detector.annotate(req.frame, detections) if req.annotate else None
+                req.future.set_result((annotated, detections))
+        except Exception as e:
+            print(f"[Scheduler] Batch inference error: {e}")
+            for req in group:
+                if not req.future.done():
+                    req.future.set_exception(e)
+
+
+# Singleton instance
+inference_scheduler = InferenceScheduler()
@@ -0,0 +1,170 @@
+"""
+Model Backend - Loads YOLO weights through a configurable CPU inference runtime.
+
+Backends (CROWDEX_INFERENCE_BACKEND):
+    pytorch   Run the .pt weights with PyTorch (default)
+    onnx      Export once to ONNX and run with ONNX Runtime (pip install onnx onnxruntime)
+    openvino  Export once to OpenVINO IR and run with OpenVINO (pip install openvino)
+
+Exported models are cached in CROWDEX_MODEL_CACHE (default backend/models/),
+keyed by weights name and input size, so the export is only paid on first use.
+Ultralytics serves every format behind the same YOLO interface, so detectors
+get identical Results objects whichever backend is active. If an export or
+load fails, the PyTorch weights are used instead.
+
+Every load and warm-up is recorded by name in a status registry, which the
+/api/ready endpoint reports. ultralytics itself is imported on first load so
+importing services stays cheap.
+"""
+
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+BACKENDS = ("pytorch", "onnx", "openvino")
+
+INFERENCE_BACKEND = os.getenv("CROWDEX_INFERENCE_BACKEND", "pytorch").lower()
+INFERENCE_IMGSZ = int(os.getenv("CROWDEX_INFERENCE_IMGSZ", "640"))
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_CACHE_DIR = os.getenv("CROWDEX_MODEL_CACHE", os.path.join(_BACKEND_DIR, "models"))
+
+# Serialises exports so concurrent loaders don't export the same model twice
+_export_lock = threading.Lock()
+
+# name -> {"state", "backend", "load_ms", "warmup_ms", "error"}
+_model_status: Dict[str, dict] = {}
+_status_lock = threading.Lock()
+
+
+def set_model_status(name: str, **fields):
+    """Record load state fields for a model (also used by non-YOLO models)."""
+    with _status_lock:
+        entry = _model_status.setdefault(name, {
+            "state": "not_loaded", "backend": None, "load_ms": None, "warmup_ms": None, "error": None
+        })
+        entry.update(fields)
+
+
+def get_model_status() -> Dict[str, dict]:
+    """Snapshot of load state and warm-up latency for every model seen so far."""
+    with _status_lock:
+        return {name: dict(entry) for name, entry in _model_status.items()}
+
+
+def is_ready(name: str) -> bool:
+    with _status_lock:
+        return _model_status.get(name, {}).get("state") == "ready"
+
+
+def resolve_weights(weights: str) -> str:
+    """
+    Find a weights file locally, falling back to the bare name
+    (which makes ultralytics download it automatically).
+    """
+    candidates = [
+        weights,  # Current directory
+        os.path.join("..", weights),  # Parent directory (when run from backend)
+        os.path.join(os.path.dirname(_BACKEND_DIR), weights),  # Project root
+        os.path.join(MODEL_CACHE_DIR, weights),  # Model cache
+    ]
+    for path in candidates:
+        if os.path.exists(path):
+            print(f"[YOLO] Loading model from: {os.path.abspath(path)}")
+            return path
+    print(f"[YOLO] {weights} not found locally, will download automatically")
+    return weights
+
+
+def _export_path(weights: str, backend: str) -> str:
+    """Cache location of an exported model."""
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    if backend == "onnx":
+        return os.path.join(MODEL_CACHE_DIR, f"{stem}_{INFERENCE_IMGSZ}.onnx")
+    # Ultralytics recognises OpenVINO models by the "_openvino_model" suffix
+    return os.path.join(MODEL_CACHE_DIR, f"{stem}_{INFERENCE_IMGSZ}_openvino_model")
+
+
+def _export(weights: str, backend: str) -> str:
+    """Export .pt weights to the given backend and move the result into the cache."""
+    target = _export_path(weights, backend)
+    with _export_lock:
+        if os.path.exists(target):
+            return target
+
+        print(f"[YOLO] Exporting {weights} to {backend} (one-time)...")
+        os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+        from ultralytics import YOLO
+
+        # dynamic=True keeps the batch axis free for the inference scheduler
+        exported = YOLO(resolve_weights(weights)).export(
+            format=backend,
+            imgsz=INFERENCE_IMGSZ,
+            dynamic=True,
+            half=False,
+        )
+        shutil.move(str(exported), target)
+        print(f"[YOLO] Cached {backend} model at {target}")
+        return target
+
+
+def load_yolo(
+    weights: str, task: Optional[str] = None, backend: Optional[str] = None, name: Optional[str] = None
+):
+    """
+    Load a YOLO model on the configured backend.
+
+    Args:
+        weights: PyTorch weights name or path, e.g. "yolov8n.pt"
+        task: Model task ("detect", "pose"); required for exported formats
+        backend: Override CROWDEX_INFERENCE_BACKEND for this model
+        name: Key under which load state is reported (defaults to weights)
+    """
+    from ultralytics import YOLO
+
+    name = name or weights
+    backend = (backend or INFERENCE_BACKEND).lower()
+    if backend not in BACKENDS:
+        print(f"[YOLO] Unknown backend '{backend}', using pytorch")
+        backend = "pytorch"
+
+    set_model_status(name, state="loading", backend=backend, error=None)
+    started = time.perf_counter()
+    try:
+        model = None
+        if backend != "pytorch":
+            try:
+                model = YOLO(_export(weights, backend), task=task)
+                print(f"[YOLO] {weights} running on {backend}")
+            except Exception as e:
+                print(f"[YOLO] {backend} backend unavailable for {weights} ({e}), falling back to pytorch")
+                backend = "pytorch"
+        if model is None:
+            model = YOLO(resolve_weights(weights), task=task)
+    except Exception as e:
+        set_model_status(name, state="error", error=str(e))
+        raise
+
+    set_model_status(name, state="loaded", backend=backend, load_ms=round((time.perf_counter() - started) * 1000, 1))
+    return model
+
+
+def warm_up(model, name: str, imgsz: int = INFERENCE_IMGSZ):
+    """
+    Run one dummy forward pass to prime kernels and allocations, then mark the model ready.
+    A failed warm-up still leaves the model usable; the error is reported in its status.
+    """
+    started = time.perf_counter()
+    try:
+        model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), verbose=False)
+    except Exception as e:
+        print(f"[YOLO] Warm-up failed for {name}: {e}")
+        set_model_status(name, state="ready", error=f"warm-up failed: {e}")
+        return
+    warmup_ms = round((time.perf_counter() - started) * 1000, 1)
+    set_model_status(name, state="ready", warmup_ms=warmup_ms)
+    print(f"[YOLO] {name} warmed up in {warmup_ms}ms")
@@ -0,0 +1,121 @@
+"""
+Motion Gate - Skips person detection on frames where nothing changed.
+
+Each frame is shrunk to a small grayscale thumbnail, blurred to suppress
+sensor noise and compared with the thumbnail of the last frame that was
+actually run through the detector. If fewer than MOTION_THRESHOLD of the
+pixels changed by more than MOTION_PIXEL_DELTA, the caller reuses the last
+detection result instead of running inference. Comparing against the last
+*inferred* frame (not the previous one) means slow changes still add up.
+
+A result is never reused for longer than MOTION_MAX_AGE_SECONDS, so counts
+keep refreshing even in a perfectly static scene.
+
+Configuration (environment variables):
+    CROWDEX_MOTION_GATE          Set to 0 to disable gating (default 1)
+    CROWDEX_MOTION_THRESHOLD     Fraction of changed pixels that counts as motion (default 0.002)
+    CROWDEX_MOTION_PIXEL_DELTA   Grey-level change for a pixel to count as changed (default 20)
+    CROWDEX_MOTION_MAX_AGE       Maximum age of a reused result in seconds (default 10)
+"""
+
+import os
+import time
+from typing import Any, Optional
+
+import cv2
+import numpy as np
+
+MOTION_GATE_ENABLED = os.getenv("CROWDEX_MOTION_GATE", "1") != "0"
+MOTION_THRESHOLD = float(os.getenv("CROWDEX_MOTION_THRESHOLD", "0.002"))
+MOTION_PIXEL_DELTA = int(os.getenv("CROWDEX_MOTION_PIXEL_DELTA", "20"))
+MOTION_MAX_AGE_SECONDS = float(os.getenv("CROWDEX_MOTION_MAX_AGE", "10"))
+
+# Thumbnail size used for differencing (width, height)
+THUMBNAIL_SIZE = (96, 72)
+
+
+class MotionGate:
+    """
+    Per-source frame-differencing gate. Not thread-safe; use one per stream.
+
+    Usage:
+        if gate.should_infer(frame):
+            result = run_detection(frame)
+            gate.update(result)
+        else:
+            result = gate.last_result
+    """
+
+    def __init__(
+        self,
+        threshold: float = MOTION_THRESHOLD,
+        pixel_delta: int = MOTION_PIXEL_DELTA,
+        max_age: float = MOTION_MAX_AGE_SECONDS,
+        enabled: bool = MOTION_GATE_ENABLED,
+    ):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.max_age = max_age
+        self.enabled = enabled
+        self.last_result: Any = None
+        self.last_motion = 1.0
+        self.inferences = 0
+        self.skipped = 0
+        self._reference: Optional[np.ndarray] = None
+        self._candidate: Optional[np.ndarray] = None
+        self._result_time: Optional[float] = None
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def should_infer(self, frame: np.ndarray, now: Optional[float] = None) -> bool:
+        """
+        Decide whether this frame needs detection.
+
+        Args:
+            frame: BGR or grayscale frame
+            now: Clock for result age (defaults to time.monotonic(); video
+                 files pass their own timestamp)
+        """
+        now = time.monotonic() if now is None else now
+        self._candidate = self._thumbnail(frame) if self.enabled else None
+        if not self.enabled or self._reference is None or self._result_time is None:
+            return True
+        if now - self._result_time >= self.max_age:
+            return True
+
+        changed = cv2.absdiff(self._candidate, self._reference) > self.pixel_delta
+        self.last_motion = float(np.count_nonzero(changed)) / changed.size
+        if self.last_motion >= self.threshold:
+            return True
+
+        self.skipped += 1
+        return False
+
+    def update(self, result: Any, now: Optional[float] = None):
+        """Store the detection result for the frame last passed to should_infer()."""
+        self.last_result = result
+        self._result_time = time.monotonic() if now is None else now
+        self._reference = self._candidate
+        self.inferences += 1
+
+    def age(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds since last_result was computed (None before the first result)."""
+        if self._result_time is None:
+            return None
+        return (time.monotonic() if now is None else now) - self._result_time
+
+    def get_stats(self) -> dict:
+        age = self.age()
+        total = self.inferences + self.skipped
+        return {
+            "enabled": self.enabled,
+            "inferences": self.inferences,
+            "skipped": self.skipped,
+            "skip_ratio": round(self.skipped / total, 3) if total else 0,
+            "last_motion": round(self.last_motion, 4),
+            "result_age": round(age, 2) if age is not None else None,
+        }
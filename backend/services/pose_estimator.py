@@ -0,0 +1,73 @@
+"""
+Pose Estimator - One YOLOv8-Pose pass per frame shared by the pose-based detectors.
+
+FightDetector and AccidentDetector both need person keypoints. Instead of each
+loading yolov8n-pose.pt and running its own inference, they take a PoseResult
+from this estimator, so combined threat analysis loads one pose model and
+runs it once per frame. The skeleton overlay is also drawn once
+(PoseResult.plot) and each detector adds its own markers on top.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import numpy as np
+
+from services.model_backend import load_yolo
+
+
+@dataclass
+class PoseResult:
+    """Keypoints for one frame plus the raw ultralytics Result for drawing."""
+    keypoints: Optional[np.ndarray]  # (N, 17, 3) - x, y, confidence; None if the model gave no keypoints
+    result: object = None
+    _plot: Optional[np.ndarray] = field(default=None, repr=False)
+
+    @property
+    def count(self) -> int:
+        return 0 if self.keypoints is None else len(self.keypoints)
+
+    def plot(self) -> np.ndarray:
+        """Frame with boxes and skeletons drawn; rendered once and copied per caller."""
+        if self._plot is None:
+            self._plot = self.result.plot()
+        return self._plot.copy()
+
+
+class PoseEstimator:
+    """Lazily loaded pose model, safe to call from several threads."""
+
+    def __init__(self, model_path: str = "yolov8n-pose.pt"):
+        self.model_path = model_path
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = load_yolo(self.model_path, task="pose", name="pose_estimator")
+                    print(f"[PoseEstimator] Loaded {self.model_path}")
+        return self._model
+
+    def estimate(self, frame: np.ndarray) -> PoseResult:
+        """Run one pose inference on a BGR frame."""
+        model = self.model
+        with self._lock:
+            result = model(frame, verbose=False)[0]
+        keypoints = None if result.keypoints is None else result.keypoints.data.cpu().numpy()
+        return PoseResult(keypoints=keypoints, result=result)
+
+
+# One estimator per weights file
+_estimators: Dict[str, PoseEstimator] = {}
+_estimators_lock = threading.Lock()
+
+def get_pose_estimator(model_path: str = "yolov8n-pose.pt") -> PoseEstimator:
+    """Get or create the shared estimator for a pose model."""
+    with _estimators_lock:
+        if model_path not in _estimators:
+            _estimators[model_path] = PoseEstimator(model_path)
+        return _estimators[model_path]
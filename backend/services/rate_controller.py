@@ -0,0 +1,212 @@
+"""
+Rate Controller - Adaptive per-camera processing rate (AIMD).
+
+Every active RTSP stream processes frames at a rate between its min_fps and
+max_fps. A single control loop samples node load every CONTROL_TICK seconds
+and adjusts all rates every CROWDEX_RATE_INTERVAL seconds:
+
+- Saturated (process CPU above CROWDEX_RATE_CPU_HIGH, or on average more than
+  one full batch per replica waiting in the inference scheduler): every
+  camera's rate is multiplied by RATE_DECREASE.
+- Headroom (CPU below CROWDEX_RATE_CPU_LOW and no inference backlog): every
+  camera's rate grows by RATE_INCREASE fps.
+- Otherwise rates are held.
+
+Additive increase / multiplicative decrease converges on equal shares: cuts
+take more from fast streams, recoveries give every stream the same step. A
+camera added while the node is throttled starts at the current fair share
+instead of its maximum, so new streams neither stall nor starve the others.
+
+CPU is the CPU time of this process plus its capture worker processes
+(services/capture_workers.py) over wall time across all cores. Worker CPU
+is read from /proc/<pid>/stat, so it is only counted on Linux; elsewhere
+decoding done in worker processes is not part of the signal (the inference
+backlog still is).
+
+Configuration (environment variables):
+    CROWDEX_RATE_CONTROL     Set to 0 to always run cameras at max_fps (default 1)
+    CROWDEX_RATE_INTERVAL    Seconds between adjustments (default 2)
+    CROWDEX_RATE_CPU_HIGH    CPU fraction treated as saturated (default 0.85)
+    CROWDEX_RATE_CPU_LOW     CPU fraction below which rates may grow (default 0.65)
+    CROWDEX_MIN_FPS          Default per-camera minimum rate (default 2)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from services.capture_workers import capture_pool
+from services.inference_scheduler import inference_scheduler
+
+RATE_CONTROL_ENABLED = os.getenv("CROWDEX_RATE_CONTROL", "1") != "0"
+RATE_INTERVAL_SECONDS = float(os.getenv("CROWDEX_RATE_INTERVAL", "2"))
+CPU_HIGH = float(os.getenv("CROWDEX_RATE_CPU_HIGH", "0.85"))
+CPU_LOW = float(os.getenv("CROWDEX_RATE_CPU_LOW", "0.65"))
+DEFAULT_MIN_FPS = float(os.getenv("CROWDEX_MIN_FPS", "2"))
+
+RATE_DECREASE = 0.75  # multiplicative cut when saturated
+RATE_INCREASE = 1.0  # fps added per interval when there is headroom
+CONTROL_TICK = 0.5  # load sampling period (seconds)
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _process_cpu_seconds(pid: int) -> Optional[float]:
+    """User + system CPU seconds of another process from /proc (None if unavailable)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Fields after the parenthesised command name; utime and stime are fields 14 and 15
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+@dataclass
+class CameraRate:
+    min_fps: float
+    max_fps: float
+    fps: float
+
+
+class RateController:
+    """Shares the node's processing capacity between active streams."""
+
+    def __init__(self, enabled: bool = RATE_CONTROL_ENABLED, interval: float = RATE_INTERVAL_SECONDS):
+        self.enabled = enabled
+        self.interval = max(CONTROL_TICK, interval)
+        self._cameras: Dict[str, CameraRate] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._cpu_mark = (time.monotonic(), time.process_time())
+        self._worker_cpu: Dict[int, float] = {}  # capture worker pid -> CPU seconds at the last sample
+        self._backlog_samples = []
+
+        # Last measurements, for stats
+        self.cpu = 0.0
+        self.backlog = 0.0
+        self.state = "idle"
+        self.decreases = 0
+        self.increases = 0
+
+    def register(self, camera_id: str, min_fps: float, max_fps: float):
+        """Add a camera, starting at its fair share when the node is throttled."""
+        max_fps = max(0.1, max_fps)
+        min_fps = max(0.1, min(min_fps, max_fps))
+        with self._lock:
+            fps = max_fps
+            throttled = [rate.fps for rate in self._cameras.values() if rate.fps < rate.max_fps]
+            if self.enabled and throttled:
+                fps = max(min_fps, min(max_fps, sum(throttled) / len(throttled)))
+            self._cameras[camera_id] = CameraRate(min_fps=min_fps, max_fps=max_fps, fps=fps)
+
+    def unregister(self, camera_id: str):
+        with self._lock:
+            self._cameras.pop(camera_id, None)
+
+    def rate(self, camera_id: str, default: float) -> float:
+        """Current processing rate for a camera (default if it is not registered)."""
+        rate = self._cameras.get(camera_id)
+        return rate.fps if rate else default
+
+    def start(self):
+        """Run the control loop on the current event loop (no-op if already running)."""
+        if not self.enabled or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run())
+
+    def _sample_cpu(self) -> float:
+        """CPU use of this process and its capture workers since the last sample, as a fraction of all cores."""
+        now, cpu_time = time.monotonic(), time.process_time()
+        last_now, last_cpu = self._cpu_mark
+        self._cpu_mark = (now, cpu_time)
+        used = cpu_time - last_cpu + self._sample_worker_cpu()
+        elapsed = now - last_now
+        if elapsed <= 0:
+            return self.cpu
+        return min(1.0, used / (elapsed * (os.cpu_count() or 1)))
+
+    def _sample_worker_cpu(self) -> float:
+        """CPU seconds the live capture worker processes used since the last sample."""
+        used = 0.0
+        current = {}
+        for worker in capture_pool.get_stats()["workers"]:
+            pid = worker["pid"]
+            seconds = _process_cpu_seconds(pid) if pid and worker["alive"] else None
+            if seconds is None:
+                continue
+            # A worker seen for the first time counts from its start
+            used += max(0.0, seconds - self._worker_cpu.get(pid, 0.0))
+            current[pid] = seconds
+        self._worker_cpu = current
+        return used
+
+    def _backlog(self) -> float:
+        """Frames waiting for inference, in full batches per replica."""
+        capacity = inference_scheduler.max_batch_size * inference_scheduler.replicas
+        return inference_scheduler.pending() / capacity
+
+    async def _run(self):
+        print("[RateControl] Control loop started")
+        self._sample_cpu()
+        ticks_per_interval = max(1, round(self.interval / CONTROL_TICK))
+        tick = 0
+        while self._cameras:
+            await asyncio.sleep(CONTROL_TICK)
+            self._backlog_samples.append(self._backlog())
+            tick += 1
+            if tick % ticks_per_interval == 0:
+                self.cpu = self._sample_cpu()
+                self.backlog = sum(self._backlog_samples) / len(self._backlog_samples)
+                self._backlog_samples = []
+                self._adjust()
+        self.state = "idle"
+        print("[RateControl] Control loop stopped (no active streams)")
+
+    def _adjust(self):
+        if self.cpu >= CPU_HIGH or self.backlog >= 1.0:
+            self.state = "saturated"
+            with self._lock:
+                changed = False
+                for rate in self._cameras.values():
+                    new_fps = max(rate.min_fps, rate.fps * RATE_DECREASE)
+                    changed |= new_fps != rate.fps
+                    rate.fps = new_fps
+            if changed:
+                self.decreases += 1
+                print(f"[RateControl] Saturated (cpu {self.cpu:.0%}, backlog {self.backlog:.2f}) - lowering rates")
+        elif self.cpu < CPU_LOW and self.backlog == 0:
+            self.state = "headroom"
+            with self._lock:
+                changed = False
+                for rate in self._cameras.values():
+                    new_fps = min(rate.max_fps, rate.fps + RATE_INCREASE)
+                    changed |= new_fps != rate.fps
+                    rate.fps = new_fps
+            if changed:
+                self.increases += 1
+        else:
+            self.state = "steady"
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            cameras = {
+                camera_id: {"fps": round(rate.fps, 2), "min_fps": rate.min_fps, "max_fps": rate.max_fps}
+                for camera_id, rate in self._cameras.items()
+            }
+        return {
+            "enabled": self.enabled,
+            "state": self.state,
+            "cpu": round(self.cpu, 3),
+            "backlog": round(self.backlog, 3),
+            "decreases": self.decreases,
+            "increases": self.increases,
+            "cameras": cameras,
+        }
+
+
+# Singleton instance
+rate_controller = RateController()
@@ -8,17 +8,104 @@ import asyncio
 import threading
 import time
 from services.detector import ObjectDetector
-from typing import Optional, Dict, Any, Generator
-import queue
+from services.stream_hub import stream_hub, DEFAULT_VARIANT
+from services.frame_slot import LatestFrameSlot
+from services.stream_resolver import stream_resolver, is_youtube_url
+from services.camera_registry import camera_registry
+from services.inference_scheduler import inference_scheduler
+from services.motion_gate import MotionGate
+from services.stream_metrics import StreamMetrics
+from services.rate_controller import rate_controller, DEFAULT_MIN_FPS
+from services.stream_supervisor import StreamSupervisor, StreamHealth
+from services.clip_recorder import clip_recorder, CLIPS_ENABLED
+from services.capture_session import run_capture_session
+from services.capture_workers import capture_pool, RemoteCapture
+from services.headless_analytics import HeadlessAnalytics, HEADLESS_FPS
+from services.count_store import count_store
+from services.density_counter import density_counter, choose_engine, ENGINES, DEFAULT_DENSITY_THRESHOLD
+from typing import Optional, Dict, Any, Generator, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import os
-import json
 import uuid
+import numpy as np
 
 # List of REAL publicly available camera streams for crowd detection
 # User requested removal of all public cameras to focus on Custom URL feature
 PUBLIC_CAMERAS = []
 
-SAVED_CAMERAS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "saved_cameras.json")
+# Display/inference resolution for standard cameras
+FRAME_SIZE = (640, 480)
+
+# Maximum frames per second handed to the pipeline (per-camera "max_fps" overrides this);
+# the rate controller lowers it towards "min_fps" when the node is saturated
+CAPTURE_TARGET_FPS = float(os.getenv("CROWDEX_CAPTURE_FPS", "15"))
+
+# Tiled mode defaults (per-camera "tile_size" / "tile_overlap" override these)
+DEFAULT_TILE_SIZE = 640
+DEFAULT_TILE_OVERLAP = 0.2
+
+# Resizing, motion checks and JPEG encoding run here instead of on the event loop
+ENCODE_WORKERS = int(os.getenv("CROWDEX_ENCODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+_frame_pool = ThreadPoolExecutor(max_workers=ENCODE_WORKERS, thread_name_prefix="rtsp-frame")
+
+# Encoded output variants: name -> ((width, height), JPEG quality).
+# Each is encoded at most once per frame, and only while someone subscribes to it.
+STREAM_VARIANTS = {
+    "full": (FRAME_SIZE, 70),  # wall displays, dashboards
+    "half": ((320, 240), 50),  # mobile / constrained links
+    "thumb": ((160, 120), 40),  # grid previews
+}
+
+def _encode_jpeg(frame, quality: int) -> bytes:
+    ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
+
+def _encode_variants(frame, variants) -> Dict[str, bytes]:
+    """Encode the requested variants of a frame; smaller sizes are resized from the previous one"""
+    encoded = {}
+    source = frame
+    for name in sorted(variants, key=lambda v: -STREAM_VARIANTS[v][0][0]):
+        size, quality = STREAM_VARIANTS[name]
+        if (source.shape[1], source.shape[0]) != size:
+            source = cv2.resize(source, size, interpolation=cv2.INTER_AREA)
+        encoded[name] = _encode_jpeg(source, quality)
+    return encoded
+
+
+class _SlotSink:
+    """Capture session sink for in-process capture threads: frames go straight into the stream's slot"""
+    
+    def __init__(self, service: "RTSPCameraService", camera_id: str, max_fps: float,
+                 metrics: StreamMetrics, health: StreamHealth):
+        self.service = service
+        self.camera_id = camera_id
+        self.max_fps = max_fps
+        self.metrics = metrics
+        self.health = health
+        self.last_retrieved = 0.0
+    
+    def connected(self):
+        self.health.connected()
+    
+    def grabbed(self, captured_at: float):
+        self.metrics.grabs.mark(captured_at)
+        self.health.frame(captured_at)
+    
+    def wants_frame(self, captured_at: float) -> bool:
+        slot = self.service.frame_slots.get(self.camera_id)
+        fps = self.service.target_fps(self.camera_id)
+        return slot is not None and not slot.has_pending and captured_at - self.last_retrieved >= 1.0 / fps
+    
+    def deliver(self, frame, captured_at: float, decode_ms: float):
+        self.last_retrieved = captured_at
+        self.metrics.record("decode_ms", decode_ms)
+        slot = self.service.frame_slots.get(self.camera_id)
+        if slot is not None:
+            slot.put(frame, captured_at)
+    
+    def ended(self, reason: str, error: Optional[str] = None, stale_url: Optional[str] = None):
+        self.health.ended(reason, error, stale_url=stale_url)
+
 
 class RTSPCameraService:
     """Service for connecting to RTSP/HLS camera streams and processing with YOLO"""
@@ -26,35 +113,19 @@ class RTSPCameraService:
     def __init__(self):
         self.detector = ObjectDetector()
         self.active_streams: Dict[str, Dict[str, Any]] = {}
-        self.frame_queue: Dict[str, queue.Queue] = {}
+        self.frame_slots: Dict[str, LatestFrameSlot] = {}
         self.stop_events: Dict[str, threading.Event] = {}
-        self._ensure_data_file()
+        self.pipelines: Dict[str, asyncio.Task] = {}
+        self.ended_streams: Dict[str, Dict] = {}  # final health of stopped streams
+        self.supervisor = StreamSupervisor(self)
+        self.headless = HeadlessAnalytics(self)
         
-    def _ensure_data_file(self):
-        """Ensure the saved cameras file exists"""
-        try:
-            if not os.path.exists(os.path.dirname(SAVED_CAMERAS_FILE)):
-                os.makedirs(os.path.dirname(SAVED_CAMERAS_FILE))
-            if not os.path.exists(SAVED_CAMERAS_FILE):
-                with open(SAVED_CAMERAS_FILE, 'w') as f:
-                    json.dump([], f)
-        except Exception as e:
-            print(f"Error initializing data file: {e}")
-
     def get_saved_cameras(self) -> list:
         """Get list of user-saved cameras"""
-        try:
-            if os.path.exists(SAVED_CAMERAS_FILE):
-                with open(SAVED_CAMERAS_FILE, 'r') as f:
-                    return json.load(f)
-            return []
-        except Exception as e:
-            print(f"Error loading saved cameras: {e}")
-            return []
+        return camera_registry.list()
 
     def save_camera(self, camera_data: dict) -> dict:
         """Save a new camera"""
-        cameras = self.get_saved_cameras()
         new_cam = {
             "id": str(uuid.uuid4()),
             "name": camera_data.get("name", "Unnamed Camera"),
@@ -62,37 +133,31 @@ class RTSPCameraService:
             "location": camera_data.get("location", "Custom"),
             "type": "custom",
             "description": camera_data.get("description", ""),
+            # Tiled full-resolution inference for dense crowds (see InferenceScheduler.submit_tiled)
+            "tiled": bool(camera_data.get("tiled", False)),
+            "tile_size": int(camera_data.get("tile_size") or DEFAULT_TILE_SIZE),
+            "tile_overlap": float(camera_data.get("tile_overlap") or DEFAULT_TILE_OVERLAP),
+            # Counting engine for very dense scenes (see services/density_counter.py)
+            "counting_engine": camera_data.get("counting_engine") if camera_data.get("counting_engine") in ENGINES else "detection",
+            "density_threshold": int(camera_data.get("density_threshold") or DEFAULT_DENSITY_THRESHOLD),
+            "density_calibration": float(camera_data.get("density_calibration") or 1.0),
+            # Processing rate bounds for the adaptive rate controller
+            "min_fps": float(camera_data.get("min_fps") or DEFAULT_MIN_FPS),
+            "max_fps": float(camera_data.get("max_fps") or CAPTURE_TARGET_FPS),
+            # Count continuously at headless_fps even without viewers (see services/headless_analytics.py)
+            "headless": bool(camera_data.get("headless", False)),
+            "headless_fps": float(camera_data.get("headless_fps") or HEADLESS_FPS),
             "created_at": time.time()
         }
-        cameras.append(new_cam)
-        with open(SAVED_CAMERAS_FILE, 'w') as f:
-            json.dump(cameras, f, indent=2)
-        return new_cam
+        return camera_registry.add(new_cam)
 
     def delete_camera(self, camera_id: str) -> bool:
         """Delete a saved camera"""
-        cameras = self.get_saved_cameras()
-        initial_len = len(cameras)
-        cameras = [c for c in cameras if c['id'] != camera_id]
-        if len(cameras) != initial_len:
-            with open(SAVED_CAMERAS_FILE, 'w') as f:
-                json.dump(cameras, f, indent=2)
-            return True
-        return False
+        return camera_registry.delete(camera_id)
 
     def update_camera(self, camera_id: str, updates: dict) -> bool:
-        """Update a saved camera"""
-        cameras = self.get_saved_cameras()
-        found = False
-        for cam in cameras:
-            if cam['id'] == camera_id:
-                cam.update(updates)
-                found = True
-                break
-        if found:
-            with open(SAVED_CAMERAS_FILE, 'w') as f:
-                json.dump(cameras, f, indent=2)
-        return True
+        """Update a saved camera (False if it does not exist)"""
+        return camera_registry.update(camera_id, updates) is not None
         
     def get_available_cameras(self) -> list:
         """Return list of available public cameras + saved cameras"""
@@ -101,68 +166,23 @@ class RTSPCameraService:
         all_cameras = PUBLIC_CAMERAS + saved
         return all_cameras
     
-    def _get_youtube_stream_url(self, youtube_url: str) -> Optional[str]:
+    def get_camera(self, camera_id: str) -> Optional[dict]:
+        """Look up a public or saved camera by id"""
+        for cam in PUBLIC_CAMERAS:
+            if cam["id"] == camera_id:
+                return cam
+        return camera_registry.get(camera_id)
+    
+    def get_uptime(self, camera_id: str) -> Optional[float]:
+        """Seconds the camera's stream has been running (None if inactive)"""
+        stream = self.active_streams.get(camera_id)
+        return time.time() - stream["started_at"] if stream else None
+    
+    def _resolve_stream_url(self, camera_info: dict, stale_url: Optional[str] = None) -> Optional[str]:
         """
-        Extract direct stream URL from YouTube live stream
-        Uses yt-dlp - tries multiple format options for compatibility
+        Resolve the actual stream URL from camera info (blocking; for capture threads).
+        YouTube URLs go through the shared resolver cache; stale_url is a URL that stopped working.
         """
-        import subprocess
-        import os
-        
-        # Get the path to yt-dlp in the venv
-        venv_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        yt_dlp_paths = [
-            os.path.join(venv_path, 'venv', 'Scripts', 'yt-dlp.exe'),  # Windows venv
-            os.path.join(venv_path, 'venv', 'bin', 'yt-dlp'),  # Linux venv
-            'yt-dlp',  # System PATH
-            'yt-dlp.exe',  # Windows PATH
-        ]
-        
-        yt_dlp_cmd = None
-        for path in yt_dlp_paths:
-            if os.path.exists(path) or path in ['yt-dlp', 'yt-dlp.exe']:
-                yt_dlp_cmd = path
-                break
-        
-        if not yt_dlp_cmd:
-            print("[RTSP] yt-dlp not found")
-            return None
-        
-        # Try multiple format options for compatibility
-        format_options = [
-            'best[height<=480]',  # Best quality up to 480p
-            'best[height<=720]',  # Best quality up to 720p
-            'worst',  # Worst quality (fastest)
-            'best',  # Best available
-        ]
-        
-        for fmt in format_options:
-            try:
-                print(f"[RTSP] Trying yt-dlp with format: {fmt}")
-                result = subprocess.run(
-                    [yt_dlp_cmd, '-g', '-f', fmt, '--no-warnings', youtube_url],
-                    capture_output=True,
-                    text=True,
-                    timeout=45
-                )
-                if result.returncode == 0 and result.stdout.strip():
-                    url = result.stdout.strip().split('\n')[0]  # Get first URL if multiple
-                    print(f"[RTSP] Got stream URL: {url[:80]}...")
-                    return url
-                else:
-                    if result.stderr:
-                        print(f"[RTSP] yt-dlp stderr: {result.stderr[:200]}")
-            except subprocess.TimeoutExpired:
-                print(f"[RTSP] yt-dlp timed out with format {fmt}")
-            except Exception as e:
-                print(f"[RTSP] yt-dlp error with format {fmt}: {e}")
-        
-        print(f"[RTSP] Could not get YouTube stream URL for: {youtube_url}")
-        return None
-
-    
-    def _resolve_stream_url(self, camera_info: dict) -> str:
-        """Resolve the actual stream URL from camera info"""
         url = camera_info["url"]
         
         # Handle numeric webcam index
@@ -170,8 +190,8 @@ class RTSPCameraService:
             return f"webcam:{url}"
         
         # Handle YouTube URLs
-        if "youtube.com" in url or "youtu.be" in url:
-            resolved = self._get_youtube_stream_url(url)
+        if is_youtube_url(url):
+            resolved = stream_resolver.resolve_threadsafe(url, stale_url=stale_url)
             if resolved:
                 return resolved
             # Return None if YouTube extraction fails - no demo fallback
@@ -180,111 +200,56 @@ class RTSPCameraService:
         
         return url
     
-    def _capture_thread(self, camera_id: str, camera_info: dict, stop_event: threading.Event):
-        """Background thread to capture frames from stream"""
+    def _capture_thread(
+        self, camera_id: str, camera_info: dict, stop_event: threading.Event,
+        metrics: StreamMetrics, health: StreamHealth
+    ):
+        """
+        One capture session: connect, then grab until the source fails or the stream stops.
+        Failures are recorded in `health`; the stream supervisor restarts the session with backoff.
+        """
         print(f"[RTSP] Starting capture thread for {camera_id}")
         
-        # Initial resolution
-        stream_url = self._resolve_stream_url(camera_info)
+        stream_url = self._resolve_stream_url(camera_info, stale_url=health.stale_url)
         if stream_url is None:
-             print(f"[RTSP] Stream URL is None for {camera_id} - stream unavailable")
-             return
-
-        cap = None
-        retry_count = 0
-        max_retries = 20  # increased retries for robustness
-        
-        stream_source = None
-        
-        while not stop_event.is_set() and retry_count < max_retries:
-            # Resolve stream source if needed (e.g. on first run or re-connect)
-            if stream_source is None:
-                if stream_url.startswith("webcam:"):
-                    stream_source = int(stream_url.split(":")[1])
-                else:
-                    stream_source = stream_url
-
-            try:
-                if cap is None or not cap.isOpened():
-
-        
-                    source_display = f"webcam {stream_source}" if isinstance(stream_source, int) else str(stream_source)[:60]
-                    print(f"[RTSP] Connecting to stream: {source_display}...")
-
-                    # Use appropriate capture method based on source type
-                    if isinstance(stream_source, int):
-                        cap = cv2.VideoCapture(stream_source)
-                    else:
-                        # Set environment for HLS streams
-                        import os
-                        os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = 'rtsp_transport;tcp|analyzeduration;10000000|probesize;10000000'
-                        
-                        cap = cv2.VideoCapture(stream_source, cv2.CAP_FFMPEG)
-                        
-                        # Configure for streaming
-                        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Minimize buffer for live streaming
-                        cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 15000)  # 15 second timeout
-                        cap.set(cv2.CAP_PROP_READ_TIMEOUT_MSEC, 10000)  # 10 second read timeout
-                    
-                    if not cap.isOpened():
-                        print(f"[RTSP] Failed to open stream, retry {retry_count + 1}/{max_retries}")
-                        retry_count += 1
-                        time.sleep(3)
-                        continue
-                    
-                    print(f"[RTSP] Connected to stream successfully!")
-                    retry_count = 0
-
-                
-                ret, frame = cap.read()
-                if not ret:
-                    print(f"[RTSP] Stream ended or lost frame, attempting reconnect/loop...")
-                    cap.release()
-                    cap = None
-                    
-                    # Force re-resolution of URL for YouTube/VODs to enable looping or handling expiration
-                    if not str(stream_source).isdigit():
-                        stream_source = None
-                        
-                        # Re-resolve immediately
-                        new_url = self._resolve_stream_url(camera_info)
-                        if new_url:
-                            stream_url = new_url
-                        
-                    retry_count += 1
-                    time.sleep(1)
-                    continue
-                
-                # Resize for performance
-                frame = cv2.resize(frame, (640, 480))
-                
-                # Put frame in queue (drop old frames if queue is full)
-                if camera_id in self.frame_queue:
-                    try:
-                        # Clear old frames
-                        while not self.frame_queue[camera_id].empty():
-                            try:
-                                self.frame_queue[camera_id].get_nowait()
-                            except queue.Empty:
-                                break
-                        self.frame_queue[camera_id].put(frame, timeout=0.1)
-                    except queue.Full:
-                        pass
-                
-                # Small delay to control frame rate
-                time.sleep(0.05)  # ~20 fps max
-                
-            except Exception as e:
-                print(f"[RTSP] Error in capture thread: {e}")
-                if cap:
-                    cap.release()
-                    cap = None
-                retry_count += 1
-                time.sleep(2)
+            print(f"[RTSP] Stream URL is None for {camera_id} - stream unavailable")
+            health.ended("error", "Stream URL unavailable")
+            return
         
-        if cap:
-            cap.release()
-        print(f"[RTSP] Capture thread ended for {camera_id}")
+        resize = None if self._needs_full_resolution(camera_info) else FRAME_SIZE
+        sink = _SlotSink(self, camera_id, self._fps_bounds(camera_info)[1], metrics, health)
+        try:
+            run_capture_session(camera_id, stream_url, resize, stop_event, sink)
+        finally:
+            print(f"[RTSP] Capture thread ended for {camera_id}")
+    
+    @staticmethod
+    def _fps_bounds(camera_info: dict) -> Tuple[float, float]:
+        """(min_fps, max_fps) processing rate bounds for this camera"""
+        max_fps = max(0.1, float(camera_info.get("max_fps") or CAPTURE_TARGET_FPS))
+        min_fps = min(max_fps, max(0.1, float(camera_info.get("min_fps") or DEFAULT_MIN_FPS)))
+        return min_fps, max_fps
+    
+    def headless_fps(self, camera_id: str) -> float:
+        """Processing rate of a headless camera while nobody is watching"""
+        stream = self.active_streams.get(camera_id)
+        fps = stream["info"].get("headless_fps") if stream else None
+        return max(0.1, float(fps or HEADLESS_FPS))
+    
+    def target_fps(self, camera_id: str) -> float:
+        """Current processing rate: the rate controller's, capped at headless_fps while a headless camera has no viewers"""
+        stream = self.active_streams.get(camera_id)
+        if stream is None:
+            return CAPTURE_TARGET_FPS
+        fps = rate_controller.rate(camera_id, self._fps_bounds(stream["info"])[1])
+        if stream.get("headless") and stream_hub.subscriber_count(camera_id) == 0:
+            fps = min(fps, self.headless_fps(camera_id))
+        return fps
+    
+    @staticmethod
+    def _needs_full_resolution(camera_info: dict) -> bool:
+        """Tiled detection and density counting work on the full-resolution frame"""
+        return bool(camera_info.get("tiled")) or camera_info.get("counting_engine") in ("density", "auto")
     
     def _generate_demo_frames(self, camera_id: str, stop_event: threading.Event):
         """Generate demo frames with synthetic crowd data"""
@@ -317,16 +282,9 @@ class RTSPCameraService:
                     cv2.putText(frame, str(i+1), (x+5, y-5), 
                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
                 
-                if camera_id in self.frame_queue:
-                    try:
-                        while not self.frame_queue[camera_id].empty():
-                            try:
-                                self.frame_queue[camera_id].get_nowait()
-                            except queue.Empty:
-                                break
-                        self.frame_queue[camera_id].put(frame, timeout=0.1)
-                    except queue.Full:
-                        pass
+                slot = self.frame_slots.get(camera_id)
+                if slot:
+                    slot.put(frame)
                 
                 frame_count += 1
                 time.sleep(0.1)  # 10 fps for demo
@@ -335,7 +293,7 @@ class RTSPCameraService:
                 print(f"[Demo] Error: {e}")
                 time.sleep(1)
     
-    def start_stream(self, camera_id: str, custom_url: Optional[str] = None) -> bool:
+    async def start_stream(self, camera_id: str, custom_url: Optional[str] = None) -> bool:
         """Start capturing from a camera stream"""
         if camera_id in self.active_streams:
             print(f"[RTSP] Stream {camera_id} already active")
@@ -352,59 +310,145 @@ class RTSPCameraService:
                 "type": "custom"
             }
         else:
-
             # Check all available cameras (public + saved)
-            all_cams = self.get_available_cameras()
-            for cam in all_cams:
-                if cam["id"] == camera_id:
-                    camera_info = cam
-                    break
+            camera_info = self.get_camera(camera_id)
         
         if not camera_info:
             print(f"[RTSP] Camera {camera_id} not found")
             return False
         
-        # Resolve the stream URL
-        stream_url = self._resolve_stream_url(camera_info)
+        # Resolve the stream URL (YouTube runs yt-dlp asynchronously; the capture thread then hits the cache)
+        youtube = is_youtube_url(camera_info["url"])
+        if youtube:
+            stream_url = await stream_resolver.resolve(camera_info["url"])
+        else:
+            stream_url = self._resolve_stream_url(camera_info)
         
         if stream_url is None:
             print(f"[RTSP] Failed to resolve stream URL for {camera_id}")
             return False
         
-        # Create queue and stop event
-        self.frame_queue[camera_id] = queue.Queue(maxsize=5)
-        self.stop_events[camera_id] = threading.Event()
+        # Another request may have started the stream while we were resolving
+        if camera_id in self.active_streams:
+            return True
+        if youtube:
+            # Keep the URL refreshed before expiry while the stream runs
+            stream_resolver.retain(camera_info["url"])
         
-        # Start capture thread
-        thread = threading.Thread(
-            target=self._capture_thread,
-            args=(camera_id, camera_info, self.stop_events[camera_id]),
-            daemon=True
-        )
-        thread.start()
+        # Share the node's capacity with the other streams (fair-share start when throttled)
+        rate_controller.register(camera_id, *self._fps_bounds(camera_info))
+        rate_controller.start()
+        
+        # Create frame slot and stop event
+        self.frame_slots[camera_id] = LatestFrameSlot(asyncio.get_running_loop())
+        self.stop_events[camera_id] = threading.Event()
         
+        now = time.time()
         self.active_streams[camera_id] = {
             "info": camera_info,
-            "thread": thread,
-            "started_at": time.time()
+            "thread": None,
+            "started_at": now,
+            "last_consumed": now,  # idle timeout counts from here
+            "consumers": 0,
+            "motion_gate": MotionGate(),
+            "metrics": StreamMetrics(),
+            "health": StreamHealth(since=now),
+            "headless": False  # set by the headless runner while it keeps the stream running
         }
+        self.ended_streams.pop(camera_id, None)
+        
+        # Start capture thread; the supervisor restarts it if it fails and stops the stream when idle
+        self._start_capture(camera_id)
+        self.supervisor.start()
         
         return True
     
-    def stop_stream(self, camera_id: str):
-        """Stop a camera stream"""
+    def _start_capture(self, camera_id: str):
+        """Launch a capture session (a thread, or a capture worker process) for an active stream"""
+        stream = self.active_streams[camera_id]
+        if capture_pool.enabled:
+            stream["thread"] = RemoteCapture(
+                camera_id, stream,
+                slot_getter=lambda: self.frame_slots.get(camera_id),
+                rate_getter=lambda: self.target_fps(camera_id)
+            )
+            # URL resolution may block (yt-dlp), so it runs off the caller's thread
+            threading.Thread(
+                target=self._start_remote_capture, args=(camera_id, stream, stream["thread"]),
+                name=f"rtsp-resolve-{camera_id}", daemon=True
+            ).start()
+            return
+        stream["thread"] = threading.Thread(
+            target=self._capture_thread,
+            args=(camera_id, stream["info"], self.stop_events[camera_id], stream["metrics"], stream["health"]),
+            name=f"rtsp-capture-{camera_id}",
+            daemon=True
+        )
+        stream["thread"].start()
+    
+    def _start_remote_capture(self, camera_id: str, stream: dict, session: RemoteCapture):
+        """Resolve the stream URL and hand the session to a capture worker process"""
+        camera_info = stream["info"]
+        stream_url = self._resolve_stream_url(camera_info, stale_url=stream["health"].stale_url)
+        if stream_url is None:
+            print(f"[RTSP] Stream URL is None for {camera_id} - stream unavailable")
+            session.finish("error", "Stream URL unavailable")
+            return
+        if self.active_streams.get(camera_id) is not stream:
+            session.finish()
+            return
+        options = {
+            "max_fps": self._fps_bounds(camera_info)[1],
+            "resize": None if self._needs_full_resolution(camera_info) else FRAME_SIZE,
+        }
+        capture_pool.start_session(camera_id, stream_url, options, session)
+    
+    def add_consumer(self, camera_id: str):
+        """Register a non-viewer consumer (keeps the stream from being stopped as idle)"""
+        if camera_id in self.active_streams:
+            self.active_streams[camera_id]["consumers"] += 1
+    
+    def remove_consumer(self, camera_id: str):
+        stream = self.active_streams.get(camera_id)
+        if stream and stream["consumers"] > 0:
+            stream["consumers"] -= 1
+            stream["last_consumed"] = time.time()
+    
+    def consumer_count(self, camera_id: str) -> int:
+        """Viewers plus other consumers of a stream"""
+        stream = self.active_streams.get(camera_id)
+        return stream_hub.subscriber_count(camera_id) + (stream["consumers"] if stream else 0)
+    
+    def stop_stream(self, camera_id: str, reason: str = "stopped"):
+        """Stop a camera stream (reason: "stopped", or "idle"/"failed" from the supervisor)"""
         if camera_id in self.stop_events:
             self.stop_events[camera_id].set()
+        if capture_pool.enabled:
+            capture_pool.stop_session(camera_id)
         
         if camera_id in self.active_streams:
-            del self.active_streams[camera_id]
+            stream = self.active_streams.pop(camera_id)
+            if is_youtube_url(stream["info"]["url"]):
+                stream_resolver.release(stream["info"]["url"])
+            # Keep the final health so status requests can say why the stream ended
+            stream["health"].set_state(reason)
+            self.ended_streams[camera_id] = {**stream["health"].to_dict(), "ended_at": time.time()}
+        rate_controller.unregister(camera_id)
+        
+        if camera_id in self.frame_slots:
+            self.frame_slots.pop(camera_id).close()
         
-        if camera_id in self.frame_queue:
-            del self.frame_queue[camera_id]
+        # Write out clips still waiting for post-event frames
+        clip_recorder.close_source(camera_id)
+        count_store.release(camera_id)
         
         if camera_id in self.stop_events:
             del self.stop_events[camera_id]
         
+        # Disconnect viewers; the pipeline task exits once the stream is gone
+        stream_hub.close(camera_id)
+        self.pipelines.pop(camera_id, None)
+        
         print(f"[RTSP] Stopped stream {camera_id}")
     
     def stop_all_streams(self):
@@ -412,42 +456,195 @@ class RTSPCameraService:
         for camera_id in list(self.active_streams.keys()):
             self.stop_stream(camera_id)
     
-    async def generate_processed_frames(self, camera_id: str):
+    def _ensure_pipeline(self, camera_id: str):
+        """Start the shared processing loop for a camera if it is not running"""
+        task = self.pipelines.get(camera_id)
+        if task is None or task.done():
+            self.pipelines[camera_id] = asyncio.create_task(self._run_pipeline(camera_id))
+    
+    async def _run_pipeline(self, camera_id: str):
         """
-        Generator that yields processed frames with YOLO detection
-        Yields: (frame_bytes, person_count, detections)
+        Single inference + encoding loop per camera.
+        Publishes each processed frame to the stream hub, which fans it out
+        to every subscriber. Exits when the stream stops or nobody is watching,
+        except for headless cameras: without viewers they keep counting, with
+        no annotation, encoding or publishing, and record counts to the count store.
         """
-        if camera_id not in self.frame_queue:
-            print(f"[RTSP] No frame queue for {camera_id}")
+        frame_slot = self.frame_slots.get(camera_id)
+        stream = self.active_streams.get(camera_id)
+        if frame_slot is None or stream is None:
             return
-        
-        frame_queue = self.frame_queue[camera_id]
-        
-        while camera_id in self.active_streams:
+        camera_info = stream["info"]
+        motion_gate = stream["motion_gate"]
+        metrics = stream["metrics"]
+        loop = asyncio.get_running_loop()
+        
+        print(f"[RTSP] Pipeline started for {camera_id}")
+        while self.active_streams.get(camera_id) is stream:
+            channel = stream_hub.get(camera_id)
+            viewers = channel is not None and not channel.closed and channel.subscribers > 0
+            if not viewers and not stream.get("headless"):
+                break
             try:
-                # Get frame from queue
-                try:
-                    frame = frame_queue.get(timeout=0.5)
-                except queue.Empty:
-                    await asyncio.sleep(0.1)
+                # Wait for the capture thread's next frame without blocking the loop
+                captured = await frame_slot.get(timeout=0.5)
+                if captured is None:
                     continue
+                frame = captured.frame
                 
-                # Process with YOLO
-                annotated_frame, count = self.detector.process_frame(frame)
-                
-                # Encode to JPEG
-                ret, buffer = cv2.imencode('.jpg', annotated_frame, 
-                                          [cv2.IMWRITE_JPEG_QUALITY, 70])
-                frame_bytes = buffer.tobytes()
-                
-                yield frame_bytes, count
+                # Only the variants somebody is subscribed to are encoded; headless counting encodes nothing
+                wanted = set()
+                if viewers:
+                    wanted = channel.wanted_variants() or {DEFAULT_VARIANT}
+                    if CLIPS_ENABLED:
+                        # The clip buffer records the full variant
+                        wanted.add(DEFAULT_VARIANT)
+                # A viewer joining a headless stream needs an annotated frame to show
+                unannotated = viewers and (motion_gate.last_result is None or motion_gate.last_result[0] is None)
+                if await loop.run_in_executor(_frame_pool, motion_gate.should_infer, frame) or unannotated:
+                    started = time.perf_counter()
+                    annotated_frame, count, boxes = await self._process_frame(
+                        camera_id, camera_info, frame, annotate=viewers
+                    )
+                    encode_start = time.perf_counter()
+                    metrics.record("inference_ms", (encode_start - started) * 1000)
+                    
+                    # Encode each wanted variant once, shared by all of its subscribers
+                    encoded = {}
+                    if wanted:
+                        encoded = await loop.run_in_executor(_frame_pool, _encode_variants, annotated_frame, wanted)
+                        metrics.record("encode_ms", (time.perf_counter() - encode_start) * 1000)
+                    motion_gate.update((annotated_frame, count, boxes, encoded))
                 
-                # Control output rate
-                await asyncio.sleep(0.05)
+                # Static scene: republish the last result instead of running inference and encoding
+                annotated_frame, count, boxes, encoded = motion_gate.last_result
+                # Count history for every stream (rolled up at 1s/1m/15m/1h, see services/count_store.py)
+                count_store.record(camera_id, captured.captured_at, count)
+                if viewers:
+                    missing = wanted - encoded.keys()
+                    if missing:
+                        # A subscriber joined with a new variant since the last inference
+                        encoded.update(await loop.run_in_executor(_frame_pool, _encode_variants, annotated_frame, missing))
+                    channel.publish({name: encoded[name] for name in wanted}, count, captured.captured_at, boxes)
+                    if CLIPS_ENABLED:
+                        clip_recorder.add_frame(camera_id, encoded[DEFAULT_VARIANT], captured.captured_at)
+                metrics.frames_out.mark()
+                self._record_latency(camera_id, captured.captured_at)
                 
             except Exception as e:
                 print(f"[RTSP] Error processing frame: {e}")
                 await asyncio.sleep(0.5)
+        
+        if self.pipelines.get(camera_id) is asyncio.current_task():
+            del self.pipelines[camera_id]
+        print(f"[RTSP] Pipeline stopped for {camera_id}")
+    
+    def _record_latency(self, camera_id: str, captured_at: float):
+        """Track capture-to-display latency (smoothed) for the stream status"""
+        stream = self.active_streams.get(camera_id)
+        if stream is None:
+            return
+        latency_ms = (time.time() - captured_at) * 1000
+        stream["metrics"].record("latency_ms", latency_ms)
+        previous = stream.get("latency_ms")
+        stream["latency_ms"] = latency_ms if previous is None else previous * 0.9 + latency_ms * 0.1
+    
+    async def _process_frame(self, camera_id: str, camera_info: dict, frame, annotate: bool = True):
+        """
+        Run the camera's counting engine on one frame.
+        Returns: (annotated display-size frame or None if not annotate, person_count, boxes)
+        boxes is an (N, 5) array of x1, y1, x2, y2 (0-1) and confidence, or None for the density model
+        """
+        stream = self.active_streams[camera_id]
+        threshold = int(camera_info.get("density_threshold") or DEFAULT_DENSITY_THRESHOLD)
+        engine = choose_engine(
+            camera_info.get("counting_engine") or "detection",
+            stream.get("engine", "detection"),
+            stream.get("last_count", 0),
+            threshold,
+        )
+        if engine != stream.get("engine", "detection"):
+            print(f"[RTSP] {camera_id} switched to {engine} counting at {stream.get('last_count', 0):.0f} people")
+        stream["engine"] = engine
+        loop = asyncio.get_running_loop()
+        detections = None
+        
+        if engine == "density" and density_counter.has_model:
+            # Fixed-cost density model, independent of crowd size
+            annotated_frame, count = await loop.run_in_executor(
+                _frame_pool, density_counter.count_with_model, frame, annotate, FRAME_SIZE
+            )
+        elif engine == "density" or camera_info.get("tiled"):
+            # Tiled detection (batched with other cameras by the scheduler)
+            annotated_frame, detections = await inference_scheduler.process_tiled(
+                frame,
+                tile_size=int(camera_info.get("tile_size") or DEFAULT_TILE_SIZE),
+                overlap=float(camera_info.get("tile_overlap") or DEFAULT_TILE_OVERLAP),
+                annotate=annotate and engine == "detection",
+                output_size=FRAME_SIZE,
+            )
+            count = detections.count
+            if engine == "density":
+                # Calibrated heatmap from the tiled detections
+                display = await loop.run_in_executor(_frame_pool, cv2.resize, frame, FRAME_SIZE)
+                annotated_frame, count = await loop.run_in_executor(
+                    _frame_pool, density_counter.count_from_detections, display, detections,
+                    float(camera_info.get("density_calibration") or 1.0), annotate
+                )
+        else:
+            if (frame.shape[1], frame.shape[0]) != FRAME_SIZE:
+                frame = await loop.run_in_executor(_frame_pool, cv2.resize, frame, FRAME_SIZE)
+            # Process with YOLO (batched with other cameras by the scheduler)
+            annotated_frame, detections = await inference_scheduler.process(frame, annotate=annotate)
+            count = detections.count
+        
+        stream["last_count"] = count
+        boxes = None
+        if detections is not None:
+            # Detections are in FRAME_SIZE coordinates; normalise so they fit any variant
+            boxes = np.empty((detections.count, 5), dtype=np.float32)
+            boxes[:, :4] = detections.boxes / np.array(FRAME_SIZE * 2, dtype=np.float32)
+            boxes[:, 4] = detections.confidences
+        return annotated_frame, int(round(count)), boxes
+    
+    async def generate_packets(self, camera_id: str, variant: str = DEFAULT_VARIANT):
+        """
+        Generator that yields processed frame packets (JPEG per variant, count, boxes, timestamps).
+        All subscribers of a camera share one pipeline via the stream hub.
+        variant: one of STREAM_VARIANTS (resolution / JPEG quality); every packet yielded contains it
+        """
+        if camera_id not in self.frame_slots:
+            print(f"[RTSP] No frame slot for {camera_id}")
+            return
+        
+        channel = stream_hub.subscribe(camera_id, variant)
+        self._ensure_pipeline(camera_id)
+        last_seq = 0
+        
+        try:
+            while camera_id in self.active_streams and not channel.closed:
+                packet = await channel.wait_next(last_seq, timeout=1.0)
+                if packet is None:
+                    continue
+                last_seq = packet.seq
+                if variant not in packet.variants:
+                    # Published before the pipeline saw this subscription
+                    continue
+                yield packet
+        finally:
+            stream_hub.unsubscribe(channel, variant)
+    
+    async def generate_processed_frames(self, camera_id: str, variant: str = DEFAULT_VARIANT):
+        """
+        Generator that yields processed frames with YOLO detection.
+        Yields: (frame_bytes, person_count)
+        """
+        packets = self.generate_packets(camera_id, variant)
+        try:
+            async for packet in packets:
+                yield packet.variants[variant], packet.count
+        finally:
+            await packets.aclose()
     
     def get_stream_status(self, camera_id: str) -> Optional[Dict]:
         """Get status of a stream"""
@@ -455,13 +652,43 @@ class RTSPCameraService:
             return None
         
         stream = self.active_streams[camera_id]
+        channel = stream_hub.get(camera_id)
         return {
             "id": camera_id,
             "name": stream["info"]["name"],
             "location": stream["info"]["location"],
             "active": True,
-            "uptime": time.time() - stream["started_at"]
+            "uptime": time.time() - stream["started_at"],
+            "health": stream["health"].to_dict(),
+            "subscribers": stream_hub.subscriber_count(camera_id),
+            "variants": sorted(channel.wanted_variants()) if channel and not channel.closed else [],
+            "motion": stream["motion_gate"].get_stats(),
+            "target_fps": round(self.target_fps(camera_id), 2),
+            "headless": bool(stream.get("headless")),
+            "fps_bounds": self._fps_bounds(stream["info"]),
+            "latency_ms": round(stream["latency_ms"], 1) if stream.get("latency_ms") is not None else None
         }
+    
+    def get_metrics(self) -> Dict[str, Dict]:
+        """Rolling performance metrics for every active stream, keyed by camera id"""
+        metrics = {}
+        for camera_id, stream in list(self.active_streams.items()):
+            slot = self.frame_slots.get(camera_id)
+            motion = stream["motion_gate"].get_stats()
+            metrics[camera_id] = {
+                "name": stream["info"]["name"],
+                "uptime": round(time.time() - stream["started_at"], 1),
+                "engine": stream.get("engine", "detection"),
+                "health": stream["health"].state,
+                "target_fps": round(self.target_fps(camera_id), 2),
+                "headless": bool(stream.get("headless")),
+                "subscribers": stream_hub.subscriber_count(camera_id),
+                "frames_dropped": slot.frames_dropped if slot else 0,
+                "inferences_skipped": motion["skipped"],
+                "motion": motion,
+                **stream["metrics"].snapshot(),
+            }
+        return metrics
 
 
 # Singleton instance
@@ -0,0 +1,154 @@
+"""
+Shared Frame Ring - Latest-frame ring buffer in multiprocessing.shared_memory.
+
+A capture worker process writes decoded frames into a ring of SLOTS fixed-size
+slots; the API process copies the newest one out. Frames never go through
+pickling or a pipe - only a small "frame ready" notice does.
+
+Layout (one shared memory block):
+    header   int64 write_seq, int64 read_seq, float64 target_fps, int64 height, width, channels
+    slots    per slot: int64 seq, float64 captured_at
+    data     SLOTS x (height * width * channels) bytes
+
+The writer marks a slot's seq as -1 while filling it and stores the real
+sequence number afterwards; a reader that finds the seq changed after its
+copy knows the slot was overwritten mid-read and drops that frame.
+
+The reader acknowledges every frame it was told about with ack(), whether
+it copied the frame or dropped it; the writer waits for that before
+decoding the next one.
+
+Only the creating process tracks the block: attach() opens it without
+registering it with the attaching process's resource tracker, so the
+reader can never unlink (or warn about) the writer's segment at exit.
+"""
+
+import sys
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+SLOTS = 3
+
+_HEADER_FIELDS = 6
+_HEADER_BYTES = _HEADER_FIELDS * 8
+
+_attach_lock = threading.Lock()
+
+
+def _open_untracked(name: str) -> shared_memory.SharedMemory:
+    """Open an existing block without registering it with this process's resource tracker."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Before 3.13 opening always registers, and unregistering afterwards would also drop the
+    # creator's registration when the tracker is shared (spawned workers inherit it)
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedFrameRing:
+    """Single-writer / single-reader frame ring over a named shared memory block."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, shape: Tuple[int, int, int], owner: bool):
+        self.shm = shm
+        self.shape = shape
+        self.owner = owner
+        self.frame_bytes = int(np.prod(shape))
+        buf = shm.buf
+        self._ints = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=buf)
+        self._floats = np.ndarray((_HEADER_FIELDS,), dtype=np.float64, buffer=buf)
+        self._slot_seq = np.ndarray((SLOTS,), dtype=np.int64, buffer=buf, offset=_HEADER_BYTES)
+        self._slot_time = np.ndarray((SLOTS,), dtype=np.float64, buffer=buf, offset=_HEADER_BYTES + SLOTS * 8)
+        data_offset = _HEADER_BYTES + SLOTS * 16
+        self._data = np.ndarray((SLOTS,) + tuple(shape), dtype=np.uint8, buffer=buf, offset=data_offset)
+
+    @classmethod
+    def create(cls, shape: Tuple[int, int, int], target_fps: float = 0.0) -> "SharedFrameRing":
+        size = _HEADER_BYTES + SLOTS * 16 + SLOTS * int(np.prod(shape))
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        ring = cls(shm, shape, owner=True)
+        ring._ints[0] = 0  # write_seq
+        ring._ints[1] = 0  # read_seq
+        ring._floats[2] = target_fps
+        ring._ints[3:6] = shape
+        ring._slot_seq[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedFrameRing":
+        shm = _open_untracked(name)
+        shape = tuple(int(v) for v in np.ndarray((3,), dtype=np.int64, buffer=shm.buf, offset=24))
+        return cls(shm, shape, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def write_seq(self) -> int:
+        return int(self._ints[0])
+
+    @property
+    def read_seq(self) -> int:
+        return int(self._ints[1])
+
+    @property
+    def target_fps(self) -> float:
+        """Processing rate the reader currently wants (set by the API process)."""
+        return float(self._floats[2])
+
+    @target_fps.setter
+    def target_fps(self, fps: float):
+        self._floats[2] = fps
+
+    def fits(self, frame: np.ndarray) -> bool:
+        return frame.shape == self.shape and frame.dtype == np.uint8
+
+    def write(self, frame: np.ndarray, captured_at: float) -> int:
+        """Store a frame in the next slot; returns its sequence number."""
+        seq = self.write_seq + 1
+        index = seq % SLOTS
+        self._slot_seq[index] = -1
+        self._data[index] = frame
+        self._slot_time[index] = captured_at
+        self._slot_seq[index] = seq
+        self._ints[0] = seq
+        return seq
+
+    def ack(self, seq: int):
+        """Mark frame `seq` (and everything before it) as handled, copied or not."""
+        self._ints[1] = max(self.read_seq, seq)
+
+    def read(self, seq: Optional[int] = None) -> Optional[Tuple[np.ndarray, float, int]]:
+        """
+        Copy out frame `seq` (default: the newest). Returns (frame, captured_at, seq),
+        or None if it was already overwritten. Does not ack() the frame.
+        """
+        seq = self.write_seq if seq is None else seq
+        if seq <= 0:
+            return None
+        index = seq % SLOTS
+        if self._slot_seq[index] != seq:
+            return None
+        frame = self._data[index].copy()
+        captured_at = float(self._slot_time[index])
+        if self._slot_seq[index] != seq:
+            return None  # overwritten while copying
+        return frame, captured_at, seq
+
+    def close(self):
+        # Views into the buffer must be released before the mapping can close
+        self._ints = self._floats = self._slot_seq = self._slot_time = self._data = None
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except Exception:
+            pass
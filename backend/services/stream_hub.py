@@ -0,0 +1,135 @@
+"""
+Stream Hub - Fan-out of processed camera frames to many subscribers.
+
+Each active camera runs a single processing loop (inference + JPEG encoding)
+that publishes its output here. Every WebSocket viewer of that camera waits on
+the same published packet, so CPU cost grows with cameras, not viewers.
+Slow subscribers simply skip to the newest packet instead of queueing.
+
+Subscribers pick an encoded variant of the stream (e.g. "full", "half",
+"thumb"); the channel tracks how many want each one so the processing loop
+only encodes the variants somebody is watching, once per frame.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Set
+
+import numpy as np
+
+DEFAULT_VARIANT = "full"
+
+
+@dataclass
+class FramePacket:
+    """A processed frame shared by all subscribers of a camera."""
+    seq: int
+    variants: Dict[str, bytes]  # Encoded JPEG per variant name
+    count: int
+    timestamp: float
+    captured_at: Optional[float] = None  # When the source frame was grabbed
+    boxes: Optional[np.ndarray] = None  # (N, 5) normalised x1, y1, x2, y2, confidence
+
+    @property
+    def frame_bytes(self) -> Optional[bytes]:
+        return self.variants.get(DEFAULT_VARIANT)
+
+
+class CameraChannel:
+    """Latest-packet broadcast channel for a single camera (event-loop only)."""
+
+    def __init__(self, camera_id: str):
+        self.camera_id = camera_id
+        self.latest: Optional[FramePacket] = None
+        self.subscribers = 0
+        self.variant_subscribers: Dict[str, int] = {}
+        self.closed = False
+        self._event = asyncio.Event()
+
+    def wanted_variants(self) -> Set[str]:
+        """Variants with at least one subscriber."""
+        return {variant for variant, count in self.variant_subscribers.items() if count > 0}
+
+    def publish(
+        self,
+        variants: Dict[str, bytes],
+        count: int,
+        captured_at: Optional[float] = None,
+        boxes: Optional[np.ndarray] = None,
+    ) -> FramePacket:
+        """Store a new packet and wake every waiting subscriber."""
+        seq = self.latest.seq + 1 if self.latest else 1
+        self.latest = FramePacket(
+            seq=seq, variants=variants, count=count, timestamp=time.time(), captured_at=captured_at, boxes=boxes
+        )
+        self._wake()
+        return self.latest
+
+    def close(self):
+        """Mark the channel closed and release all waiters."""
+        self.closed = True
+        self._wake()
+
+    def _wake(self):
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    async def wait_next(self, last_seq: int, timeout: Optional[float] = None) -> Optional[FramePacket]:
+        """
+        Wait for a packet newer than last_seq.
+
+        Returns None on timeout or when the channel is closed.
+        """
+        if self.latest and self.latest.seq > last_seq:
+            return self.latest
+        if self.closed:
+            return None
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if self.latest and self.latest.seq > last_seq:
+            return self.latest
+        return None
+
+
+class StreamHub:
+    """Registry of per-camera broadcast channels."""
+
+    def __init__(self):
+        self.channels: Dict[str, CameraChannel] = {}
+
+    def get(self, camera_id: str) -> Optional[CameraChannel]:
+        return self.channels.get(camera_id)
+
+    def subscribe(self, camera_id: str, variant: str = DEFAULT_VARIANT) -> CameraChannel:
+        """Register a subscriber for one variant, creating the channel if needed."""
+        channel = self.channels.get(camera_id)
+        if channel is None or channel.closed:
+            channel = CameraChannel(camera_id)
+            self.channels[camera_id] = channel
+        channel.subscribers += 1
+        channel.variant_subscribers[variant] = channel.variant_subscribers.get(variant, 0) + 1
+        print(f"[Hub] Subscriber joined {camera_id}/{variant} ({channel.subscribers} active)")
+        return channel
+
+    def unsubscribe(self, channel: CameraChannel, variant: str = DEFAULT_VARIANT):
+        """Release a subscriber previously returned by subscribe()."""
+        channel.subscribers = max(0, channel.subscribers - 1)
+        channel.variant_subscribers[variant] = max(0, channel.variant_subscribers.get(variant, 0) - 1)
+        print(f"[Hub] Subscriber left {channel.camera_id}/{variant} ({channel.subscribers} active)")
+
+    def subscriber_count(self, camera_id: str) -> int:
+        channel = self.channels.get(camera_id)
+        return channel.subscribers if channel and not channel.closed else 0
+
+    def close(self, camera_id: str):
+        """Close a camera's channel, disconnecting its subscribers."""
+        channel = self.channels.pop(camera_id, None)
+        if channel:
+            channel.close()
+
+
+# Singleton instance
+stream_hub = StreamHub()
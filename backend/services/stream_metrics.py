@@ -0,0 +1,170 @@
+"""
+Stream Metrics - Per-camera performance counters for the RTSP pipeline.
+
+Every active stream owns a StreamMetrics. The capture thread records grabs,
+decodes and reconnects; the pipeline task records inference, encode and
+end-to-end latency. Timings live in fixed-size rolling windows (the last
+CROWDEX_METRICS_WINDOW samples), so percentiles reflect recent behaviour
+and memory stays constant however long a stream runs.
+
+RTSPCameraService.get_metrics() combines these with slot drops, motion gate
+and subscriber counts; render_prometheus() turns that into the Prometheus
+text exposition format for /api/rtsp/metrics?format=prometheus.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+METRICS_WINDOW = int(os.getenv("CROWDEX_METRICS_WINDOW", "300"))
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Timed stages (milliseconds)
+STAGES = ("decode_ms", "inference_ms", "encode_ms", "latency_ms")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    index = max(0, math.ceil(q * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class RollingWindow:
+    """The last `size` samples of one measurement plus lifetime count/sum (thread-safe)."""
+
+    def __init__(self, size: int = METRICS_WINDOW):
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.total_count = 0
+        self.total_sum = 0.0
+
+    def add(self, value: float):
+        with self._lock:
+            self._values.append(value)
+            self.total_count += 1
+            self.total_sum += value
+
+    def summary(self) -> dict:
+        with self._lock:
+            values = sorted(self._values)
+            total_count, total_sum = self.total_count, self.total_sum
+        summary = {"window": len(values), "count": total_count, "sum": round(total_sum, 3)}
+        if not values:
+            summary.update({"mean": None, "max": None, **{f"p{int(q * 100)}": None for q in QUANTILES}})
+            return summary
+        summary["mean"] = round(sum(values) / len(values), 3)
+        summary["max"] = round(values[-1], 3)
+        for q in QUANTILES:
+            summary[f"p{int(q * 100)}"] = round(percentile(values, q), 3)
+        return summary
+
+
+class RateWindow:
+    """Events per second over the last `size` events (thread-safe)."""
+
+    def __init__(self, size: int = METRICS_WINDOW):
+        self._times = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def mark(self, now: Optional[float] = None):
+        with self._lock:
+            self._times.append(time.time() if now is None else now)
+            self.total += 1
+
+    def rate(self, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        with self._lock:
+            if len(self._times) < 2:
+                return 0.0
+            first, last = self._times[0], self._times[-1]
+            count = len(self._times)
+        # A stalled source should read as slowing down, not frozen at its last rate
+        span = max(last - first, now - first) if now - last > 1.0 else last - first
+        return (count - 1) / span if span > 0 else 0.0
+
+
+class StreamMetrics:
+    """Rolling performance counters for one camera stream."""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.started_at = time.time()
+        self.grabs = RateWindow(window)  # frames read from the source
+        self.frames_out = RateWindow(window)  # frames published to viewers
+        self.stages: Dict[str, RollingWindow] = {stage: RollingWindow(window) for stage in STAGES}
+        self.reconnects = 0
+
+    def record(self, stage: str, milliseconds: float):
+        self.stages[stage].add(milliseconds)
+
+    def record_reconnect(self):
+        self.reconnects += 1
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        return {
+            "capture_fps": round(self.grabs.rate(now), 2),
+            "output_fps": round(self.frames_out.rate(now), 2),
+            "frames_grabbed": self.grabs.total,
+            "frames_published": self.frames_out.total,
+            "reconnects": self.reconnects,
+            **{stage: window.summary() for stage, window in self.stages.items()},
+        }
+
+
+# Prometheus exposition: (snapshot key, metric name, type, help)
+_GAUGES = [
+    ("capture_fps", "crowdex_stream_capture_fps", "gauge", "Frames per second read from the camera source"),
+    ("output_fps", "crowdex_stream_output_fps", "gauge", "Processed frames per second published to viewers"),
+    ("frames_grabbed", "crowdex_stream_frames_grabbed_total", "counter", "Frames read from the camera source"),
+    ("frames_published", "crowdex_stream_frames_published_total", "counter", "Processed frames published to viewers"),
+    ("frames_dropped", "crowdex_stream_frames_dropped_total", "counter", "Captured frames replaced before the pipeline took them"),
+    ("reconnects", "crowdex_stream_reconnects_total", "counter", "Times the capture thread had to reconnect"),
+    ("subscribers", "crowdex_stream_subscribers", "gauge", "Connected viewers"),
+    ("inferences_skipped", "crowdex_stream_inferences_skipped_total", "counter", "Frames reusing the last result because nothing moved"),
+    ("uptime", "crowdex_stream_uptime_seconds", "gauge", "Seconds since the stream started"),
+]
+_STAGE_HELP = {
+    "decode_ms": "Frame retrieve and resize time in the capture thread",
+    "inference_ms": "Counting engine time per processed frame",
+    "encode_ms": "JPEG encoding time per processed frame",
+    "latency_ms": "Capture-to-publish latency",
+}
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_value(value) -> str:
+    return "NaN" if value is None else repr(float(value))
+
+
+def render_prometheus(streams: Dict[str, dict]) -> str:
+    """Render get_metrics() output ({camera_id: metrics}) as Prometheus text format."""
+    lines = []
+    for key, name, metric_type, help_text in _GAUGES:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for camera_id, metrics in streams.items():
+            if metrics.get(key) is not None:
+                lines.append(f'{name}{{camera="{_escape_label(camera_id)}"}} {_format_value(metrics[key])}')
+
+    for stage in STAGES:
+        name = f"crowdex_stream_{stage[:-3]}_milliseconds"
+        lines.append(f"# HELP {name} {_STAGE_HELP[stage]} (last {METRICS_WINDOW} samples)")
+        lines.append(f"# TYPE {name} summary")
+        for camera_id, metrics in streams.items():
+            summary = metrics.get(stage)
+            if not summary:
+                continue
+            label = f'camera="{_escape_label(camera_id)}"'
+            for q in QUANTILES:
+                lines.append(f'{name}{{{label},quantile="{q}"}} {_format_value(summary[f"p{int(q * 100)}"])}')
+            lines.append(f"{name}_sum{{{label}}} {_format_value(summary['sum'])}")
+            lines.append(f"{name}_count{{{label}}} {summary['count']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,314 @@
+"""
+Stream Resolver - Cached, asynchronous YouTube stream URL resolution.
+
+Resolving a YouTube page to a playable stream URL means running yt-dlp,
+which can take tens of seconds. This service runs it as an asyncio
+subprocess (never blocking the event loop) and shares the result:
+
+- Resolved URLs are cached until shortly before they expire (googlevideo
+  URLs carry an "expire" timestamp; others get CROWDEX_RESOLVE_TTL).
+- Concurrent requests for the same page share one yt-dlp run.
+- At most CROWDEX_RESOLVE_CONCURRENCY yt-dlp processes run at a time.
+- URLs that are still in use (retained by a running stream, or requested
+  since they were resolved) are re-resolved in the background
+  CROWDEX_RESOLVE_REFRESH_MARGIN seconds before they expire.
+
+Capture threads use resolve_threadsafe(), which hands the work to the app's
+event loop (bound at startup with bind()). Without a bound loop it runs yt-dlp
+synchronously in the calling thread and caches the result, but schedules no
+background refresh (there is no loop to run it on).
+"""
+
+import asyncio
+import os
+import re
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+RESOLVE_CONCURRENCY = int(os.getenv("CROWDEX_RESOLVE_CONCURRENCY", "2"))
+RESOLVE_TIMEOUT_SECONDS = float(os.getenv("CROWDEX_RESOLVE_TIMEOUT", "45"))
+RESOLVE_TTL_SECONDS = float(os.getenv("CROWDEX_RESOLVE_TTL", "3600"))
+REFRESH_MARGIN_SECONDS = float(os.getenv("CROWDEX_RESOLVE_REFRESH_MARGIN", "300"))
+
+# Cached URLs are not handed out in their last seconds (a capture may take a while to open)
+EXPIRY_SLACK_SECONDS = 30
+
+# Tried in order until one resolves
+FORMAT_OPTIONS = [
+    'best[height<=480]',  # Best quality up to 480p
+    'best[height<=720]',  # Best quality up to 720p
+    'worst',  # Worst quality (fastest)
+    'best',  # Best available
+]
+
+# googlevideo URLs: "...&expire=1700000000&..." or ".../expire/1700000000/..." (HLS manifests)
+_EXPIRE_PATTERN = re.compile(r"[?&/]expire[=/](\d{9,})")
+
+
+def is_youtube_url(url: str) -> bool:
+    return "youtube.com" in url or "youtu.be" in url
+
+
+def parse_expiry(stream_url: str) -> Optional[float]:
+    """Expiry timestamp embedded in a resolved stream URL, if any."""
+    match = _EXPIRE_PATTERN.search(stream_url)
+    return float(match.group(1)) if match else None
+
+
+def find_yt_dlp() -> Optional[str]:
+    """Locate yt-dlp in the backend venv, falling back to PATH."""
+    import shutil
+
+    venv_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for path in (
+        os.path.join(venv_path, 'venv', 'Scripts', 'yt-dlp.exe'),  # Windows venv
+        os.path.join(venv_path, 'venv', 'bin', 'yt-dlp'),  # Linux venv
+    ):
+        if os.path.exists(path):
+            return path
+    return shutil.which('yt-dlp') or shutil.which('yt-dlp.exe')
+
+
+@dataclass
+class ResolvedUrl:
+    url: str
+    resolved_at: float
+    expires_at: float
+    last_used: float
+
+    def valid(self, now: float) -> bool:
+        return self.expires_at - EXPIRY_SLACK_SECONDS > now
+
+
+class StreamResolver:
+    """Shares yt-dlp resolutions across cameras, analyses and reconnects (event-loop only)."""
+
+    def __init__(self, concurrency: int = RESOLVE_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+        self._cache: Dict[str, ResolvedUrl] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshes: Dict[str, asyncio.Task] = {}
+        self._users: Dict[str, int] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Bounds the synchronous fallback of resolve_threadsafe()
+        self._sync_semaphore = threading.Semaphore(self.concurrency)
+
+        # Stats
+        self.cache_hits = 0
+        self.runs = 0
+        self.failures = 0
+
+    async def resolve(self, page_url: str, stale_url: Optional[str] = None) -> Optional[str]:
+        """
+        Resolve a YouTube page URL to a direct stream URL.
+
+        Args:
+            page_url: youtube.com / youtu.be URL
+            stale_url: A stream URL that stopped working; a cached entry equal
+                       to it is re-resolved, a newer (refreshed) one is returned
+        """
+        self._bind_loop()
+        now = time.time()
+        entry = self._cache.get(page_url)
+        if entry and entry.valid(now) and entry.url != stale_url:
+            entry.last_used = now
+            self.cache_hits += 1
+            return entry.url
+
+        future = self._inflight.get(page_url)
+        if future is None:
+            future = asyncio.ensure_future(self._resolve_uncached(page_url))
+            self._inflight[page_url] = future
+            future.add_done_callback(lambda _: self._inflight.pop(page_url, None))
+        # Shielded so one caller giving up doesn't cancel the run for the others
+        return await asyncio.shield(future)
+
+    def resolve_threadsafe(self, page_url: str, stale_url: Optional[str] = None) -> Optional[str]:
+        """
+        Blocking resolve() for worker threads; runs on the bound event loop.
+        Without one, yt-dlp runs synchronously here and no refresh is scheduled.
+        """
+        entry = self._cache.get(page_url)
+        if entry and entry.valid(time.time()) and entry.url != stale_url:
+            entry.last_used = time.time()
+            self.cache_hits += 1
+            return entry.url
+        loop = self._loop
+        if loop is None or loop.is_closed() or not loop.is_running():
+            return self._resolve_sync(page_url)
+        future = asyncio.run_coroutine_threadsafe(self.resolve(page_url, stale_url), loop)
+        return future.result(timeout=RESOLVE_TIMEOUT_SECONDS * len(FORMAT_OPTIONS) + 5)
+
+    def bind(self):
+        """Bind the resolver to the running (app) event loop; call at startup."""
+        self._bind_loop()
+
+    def cached(self, page_url: str) -> Optional[str]:
+        """Cached stream URL if still valid, without resolving."""
+        entry = self._cache.get(page_url)
+        return entry.url if entry and entry.valid(time.time()) else None
+
+    def retain(self, page_url: str):
+        """Mark a page URL as in use by a running stream (keeps it refreshed)."""
+        self._users[page_url] = self._users.get(page_url, 0) + 1
+
+    def release(self, page_url: str):
+        remaining = self._users.get(page_url, 0) - 1
+        if remaining > 0:
+            self._users[page_url] = remaining
+        else:
+            self._users.pop(page_url, None)
+
+    def invalidate(self, page_url: str):
+        self._cache.pop(page_url, None)
+        task = self._refreshes.pop(page_url, None)
+        if task:
+            task.cancel()
+
+    def get_stats(self) -> dict:
+        now = time.time()
+        return {
+            "cached": len(self._cache),
+            "retained": dict(self._users),
+            "inflight": len(self._inflight),
+            "cache_hits": self.cache_hits,
+            "yt_dlp_runs": self.runs,
+            "failures": self.failures,
+            "entries": {
+                page: {"expires_in": round(entry.expires_at - now), "age": round(now - entry.resolved_at)}
+                for page, entry in self._cache.items()
+            },
+        }
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def _resolve_uncached(self, page_url: str) -> Optional[str]:
+        stream_url = await self._run_yt_dlp(page_url)
+        if stream_url is None:
+            self.failures += 1
+            return None
+        self._schedule_refresh(page_url, self._store(page_url, stream_url))
+        return stream_url
+
+    def _resolve_sync(self, page_url: str) -> Optional[str]:
+        with self._sync_semaphore:
+            self.runs += 1
+            stream_url = self._run_yt_dlp_sync(page_url)
+        if stream_url is None:
+            self.failures += 1
+            return None
+        self._store(page_url, stream_url)
+        return stream_url
+
+    def _store(self, page_url: str, stream_url: str) -> float:
+        """Cache a resolved URL; returns its expiry time."""
+        now = time.time()
+        expires_at = parse_expiry(stream_url) or now + RESOLVE_TTL_SECONDS
+        previous = self._cache.get(page_url)
+        self._cache[page_url] = ResolvedUrl(
+            url=stream_url,
+            resolved_at=now,
+            expires_at=expires_at,
+            last_used=previous.last_used if previous else now,
+        )
+        return expires_at
+
+    def _schedule_refresh(self, page_url: str, expires_at: float):
+        task = self._refreshes.pop(page_url, None)
+        if task and not task.done():
+            task.cancel()
+        delay = expires_at - REFRESH_MARGIN_SECONDS - time.time()
+        if delay > 0:
+            self._refreshes[page_url] = asyncio.ensure_future(self._refresh_later(page_url, delay))
+
+    async def _refresh_later(self, page_url: str, delay: float):
+        """Re-resolve before expiry, but only if the URL is still in use."""
+        await asyncio.sleep(delay)
+        entry = self._cache.get(page_url)
+        if entry is None:
+            return
+        if not self._users.get(page_url) and entry.last_used <= entry.resolved_at:
+            print(f"[Resolver] Letting unused URL expire: {page_url}")
+            return
+        print(f"[Resolver] Refreshing stream URL before expiry: {page_url}")
+        await self.resolve(page_url, stale_url=entry.url)
+
+    async def _run_yt_dlp(self, page_url: str) -> Optional[str]:
+        yt_dlp_cmd = find_yt_dlp()
+        if not yt_dlp_cmd:
+            print("[Resolver] yt-dlp not found")
+            return None
+
+        async with self._semaphore:
+            self.runs += 1
+            for fmt in FORMAT_OPTIONS:
+                print(f"[Resolver] Trying yt-dlp with format: {fmt}")
+                try:
+                    proc = await asyncio.create_subprocess_exec(
+                        yt_dlp_cmd, '-g', '-f', fmt, '--no-warnings', page_url,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE,
+                    )
+                except Exception as e:
+                    print(f"[Resolver] Could not start yt-dlp: {e}")
+                    return None
+                try:
+                    stdout, stderr = await asyncio.wait_for(proc.communicate(), RESOLVE_TIMEOUT_SECONDS)
+                except asyncio.TimeoutError:
+                    proc.kill()
+                    await proc.wait()
+                    print(f"[Resolver] yt-dlp timed out with format {fmt}")
+                    continue
+                output = stdout.decode(errors="replace").strip()
+                if proc.returncode == 0 and output:
+                    url = output.split('\n')[0]  # Get first URL if multiple
+                    print(f"[Resolver] Got stream URL: {url[:80]}...")
+                    return url
+                if stderr:
+                    print(f"[Resolver] yt-dlp stderr: {stderr.decode(errors='replace')[:200]}")
+
+        print(f"[Resolver] Could not get YouTube stream URL for: {page_url}")
+        return None
+
+    def _run_yt_dlp_sync(self, page_url: str) -> Optional[str]:
+        """_run_yt_dlp() for callers without an event loop (blocks the calling thread)."""
+        yt_dlp_cmd = find_yt_dlp()
+        if not yt_dlp_cmd:
+            print("[Resolver] yt-dlp not found")
+            return None
+
+        for fmt in FORMAT_OPTIONS:
+            print(f"[Resolver] Trying yt-dlp with format: {fmt} (no event loop bound)")
+            try:
+                proc = subprocess.run(
+                    [yt_dlp_cmd, '-g', '-f', fmt, '--no-warnings', page_url],
+                    capture_output=True, timeout=RESOLVE_TIMEOUT_SECONDS,
+                )
+            except subprocess.TimeoutExpired:
+                print(f"[Resolver] yt-dlp timed out with format {fmt}")
+                continue
+            except Exception as e:
+                print(f"[Resolver] Could not start yt-dlp: {e}")
+                return None
+            output = proc.stdout.decode(errors="replace").strip()
+            if proc.returncode == 0 and output:
+                url = output.split('\n')[0]  # Get first URL if multiple
+                print(f"[Resolver] Got stream URL: {url[:80]}...")
+                return url
+            if proc.stderr:
+                print(f"[Resolver] yt-dlp stderr: {proc.stderr.decode(errors='replace')[:200]}")
+
+        print(f"[Resolver] Could not get YouTube stream URL for: {page_url}")
+        return None
+
+
+# Singleton instance
+stream_resolver = StreamResolver()
@@ -0,0 +1,184 @@
+"""
+Stream Supervisor - Restarts failed capture threads and stops abandoned streams.
+
+A capture thread runs one session: connect, grab until the source fails,
+then exit, recording why in the stream's StreamHealth. A single supervisor
+task checks every active stream once per SUPERVISOR_TICK seconds:
+
+- A dead capture thread is restarted after a jittered exponential backoff
+  (CROWDEX_STREAM_BACKOFF_BASE doubling up to CROWDEX_STREAM_BACKOFF_MAX).
+  Finite media that simply reached its end restarts immediately (looping).
+  After CROWDEX_STREAM_MAX_FAILURES consecutive failures the stream is
+  stopped and reported as "failed" instead of lingering in active_streams.
+- A stream with no subscribers and no other consumers for
+  CROWDEX_STREAM_IDLE_TIMEOUT seconds is stopped, so nobody pays to decode
+  a camera that nobody is watching.
+
+Health states:
+    starting      capture thread launched, not connected yet
+    healthy       frames are arriving
+    stalled       connected, but no frame for STALL_SECONDS
+    reconnecting  capture failed; waiting out the backoff before restarting
+    failed        gave up after too many consecutive failures (stream stopped)
+    idle          stopped because nobody consumed it (stream stopped)
+    stopped       stopped on request
+
+Configuration (environment variables):
+    CROWDEX_STREAM_IDLE_TIMEOUT    Seconds without consumers before auto-stop (default 60, 0 disables)
+    CROWDEX_STREAM_BACKOFF_BASE    First restart delay in seconds (default 1)
+    CROWDEX_STREAM_BACKOFF_MAX     Maximum restart delay in seconds (default 60)
+    CROWDEX_STREAM_MAX_FAILURES    Consecutive failures before giving up (default 10, 0 retries forever)
+"""
+
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+IDLE_TIMEOUT_SECONDS = float(os.getenv("CROWDEX_STREAM_IDLE_TIMEOUT", "60"))
+BACKOFF_BASE_SECONDS = float(os.getenv("CROWDEX_STREAM_BACKOFF_BASE", "1"))
+BACKOFF_MAX_SECONDS = float(os.getenv("CROWDEX_STREAM_BACKOFF_MAX", "60"))
+MAX_CONSECUTIVE_FAILURES = int(os.getenv("CROWDEX_STREAM_MAX_FAILURES", "10"))
+
+SUPERVISOR_TICK = 1.0
+STALL_SECONDS = 10.0
+# A session that stayed up this long counts as a success (the failure streak restarts)
+STABLE_SECONDS = 30.0
+
+
+def backoff_delay(failures: int, base: float = BACKOFF_BASE_SECONDS, cap: float = BACKOFF_MAX_SECONDS) -> float:
+    """
+    Delay before restart number `failures` (1-based): exponential with
+    "equal jitter", so restarts of cameras that failed together spread out.
+    """
+    delay = min(cap, base * (2 ** max(0, failures - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+@dataclass
+class StreamHealth:
+    """Supervision state of one stream; capture threads report into it."""
+    state: str = "starting"
+    since: float = 0.0
+    connected_at: Optional[float] = None
+    last_frame_at: Optional[float] = None
+    exit_reason: Optional[str] = None  # "eof" or "error" once the capture thread has returned
+    last_error: Optional[str] = None
+    stale_url: Optional[str] = None  # Stream URL that stopped working (re-resolved on restart)
+    restarts: int = 0
+    failures: int = 0  # consecutive
+    next_restart_at: Optional[float] = None
+
+    def set_state(self, state: str):
+        if state != self.state:
+            self.state = state
+            self.since = time.time()
+
+    # Called from the capture thread
+
+    def connected(self):
+        self.connected_at = time.time()
+        self.exit_reason = None
+        self.stale_url = None
+
+    def frame(self, captured_at: float):
+        self.last_frame_at = captured_at
+        if self.state != "healthy":
+            self.set_state("healthy")
+
+    def ended(self, reason: str, error: Optional[str] = None, stale_url: Optional[str] = None):
+        self.exit_reason = reason
+        if error:
+            self.last_error = error
+        self.stale_url = stale_url
+
+    def to_dict(self) -> dict:
+        now = time.time()
+        return {
+            "state": self.state,
+            "for": round(now - self.since, 1),
+            "restarts": self.restarts,
+            "consecutive_failures": self.failures,
+            "last_error": self.last_error,
+            "last_frame_age": round(now - self.last_frame_at, 1) if self.last_frame_at else None,
+            "restart_in": round(max(0.0, self.next_restart_at - now), 1) if self.next_restart_at else None,
+        }
+
+
+class StreamSupervisor:
+    """Watches RTSPCameraService's active streams (runs on the event loop)."""
+
+    def __init__(
+        self,
+        service,
+        idle_timeout: float = IDLE_TIMEOUT_SECONDS,
+        max_failures: int = MAX_CONSECUTIVE_FAILURES,
+    ):
+        self.service = service
+        self.idle_timeout = idle_timeout
+        self.max_failures = max_failures
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Run the supervisor on the current event loop (no-op if already running)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self.service.active_streams:
+            await asyncio.sleep(SUPERVISOR_TICK)
+            for camera_id in list(self.service.active_streams):
+                try:
+                    self.check(camera_id)
+                except Exception as e:
+                    print(f"[Supervisor] Error checking {camera_id}: {e}")
+
+    def check(self, camera_id: str, now: Optional[float] = None):
+        """Apply the idle and restart policies to one stream."""
+        stream = self.service.active_streams.get(camera_id)
+        if stream is None:
+            return
+        now = time.time() if now is None else now
+        health: StreamHealth = stream["health"]
+
+        if self.service.consumer_count(camera_id) > 0:
+            stream["last_consumed"] = now
+        elif self.idle_timeout > 0 and now - stream["last_consumed"] >= self.idle_timeout:
+            print(f"[Supervisor] {camera_id} idle for {self.idle_timeout:.0f}s - stopping capture")
+            self.service.stop_stream(camera_id, reason="idle")
+            return
+
+        if stream["thread"].is_alive():
+            if health.state == "healthy" and health.last_frame_at and now - health.last_frame_at > STALL_SECONDS:
+                health.set_state("stalled")
+            return
+
+        if health.next_restart_at is None:
+            self._schedule_restart(camera_id, health, now)
+        elif now >= health.next_restart_at:
+            health.next_restart_at = None
+            health.restarts += 1
+            stream["metrics"].record_reconnect()
+            print(f"[Supervisor] Restarting capture for {camera_id} (restart {health.restarts})")
+            self.service._start_capture(camera_id)
+
+    def _schedule_restart(self, camera_id: str, health: StreamHealth, now: float):
+        if health.exit_reason == "eof":
+            # Finite media reached its end: loop it right away
+            health.failures = 0
+            delay = 0.0
+        else:
+            stable = health.connected_at is not None and (health.last_frame_at or 0) - health.connected_at >= STABLE_SECONDS
+            health.failures = 1 if stable else health.failures + 1
+            if self.max_failures and health.failures > self.max_failures:
+                print(f"[Supervisor] {camera_id} failed {self.max_failures} times in a row - giving up")
+                health.set_state("failed")
+                self.service.stop_stream(camera_id, reason="failed")
+                return
+            delay = backoff_delay(health.failures)
+            print(f"[Supervisor] Capture for {camera_id} failed ({health.last_error}); retrying in {delay:.1f}s")
+        health.connected_at = None
+        health.next_restart_at = now + delay
+        health.set_state("reconnecting")
@@ -3,7 +3,14 @@ import os
 import asyncio
 import uuid
 import base64
+import time
+from collections import deque
 from services.detector import ObjectDetector
+from services.inference_scheduler import inference_scheduler
+from services.motion_gate import MotionGate
+
+# The progress WebSocket polls every 0.5s, so annotating more often is wasted work
+PREVIEW_INTERVAL_SECONDS = 0.5
 
 class VideoProcessor:
     def __init__(self, upload_dir="uploads"):
@@ -37,7 +44,8 @@ class VideoProcessor:
             "total_frames": 0,
             "filename": os.path.basename(file_path),
             "preview_frame": None,  # Base64 encoded frame for live preview
-            "frame_skip": frame_skip  # Store for display
+            "frame_skip": frame_skip,  # Store for display
+            "inferences_skipped": 0  # Sampled frames reused from a previous result (no motion)
         }
         
         cap = cv2.VideoCapture(file_path)
@@ -54,6 +62,12 @@ class VideoProcessor:
         self.active_processings[file_id]["duration"] = total_frames / fps if fps > 0 else 0
         
         frame_idx = 0
+        # Frames submitted to the inference scheduler but not yet recorded.
+        # Keeping a full batch in flight lets a single upload fill a batch.
+        pending = deque()
+        last_preview = 0.0
+        # Static stretches reuse the previous frame's result (measured in video time)
+        motion_gate = MotionGate()
         try:
             while cap.isOpened():
                 ret, frame = cap.read()
@@ -64,34 +78,28 @@ class VideoProcessor:
                 if frame_idx % frame_skip == 0:
                     # Resize to SMALL size for faster detection (320x240 instead of 640x480)
                     frame_resized = cv2.resize(frame, (320, 240))
-                    annotated_frame, count = self.detector.process_frame(frame_resized)
-                    
-                    # Encode frame as base64 JPEG for live preview
-                    _, buffer = cv2.imencode('.jpg', annotated_frame, [cv2.IMWRITE_JPEG_QUALITY, 60])
-                    frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                    
-                    self.active_processings[file_id]["current_count"] = count
-                    self.active_processings[file_id]["counts"].append(count)
-                    self.active_processings[file_id]["frames_processed"] += 1
-                    self.active_processings[file_id]["preview_frame"] = frame_base64
-                    progress = int((frame_idx / max(total_frames, 1)) * 100)
-                    self.active_processings[file_id]["progress"] = min(progress, 99)
                     
-                    # Track which second this frame belongs to
-                    video_second = int(frame_idx / fps) if fps > 0 else 0
-                    if "counts_per_second" not in self.active_processings[file_id]:
-                        self.active_processings[file_id]["counts_per_second"] = {}
+                    video_time = frame_idx / fps
+                    if motion_gate.should_infer(frame_resized, now=video_time):
+                        # Only preview frames need drawing; the timeline needs counts only
+                        annotate = time.monotonic() - last_preview >= PREVIEW_INTERVAL_SECONDS
+                        if annotate:
+                            last_preview = time.monotonic()
+                        future = inference_scheduler.submit(frame_resized, annotate=annotate)
+                        motion_gate.update(future, now=video_time)
+                        pending.append((frame_idx, future, True))
+                    else:
+                        pending.append((frame_idx, motion_gate.last_result, False))
+                        self.active_processings[file_id]["inferences_skipped"] = motion_gate.skipped
                     
-                    sec_key = str(video_second)
-                    if sec_key not in self.active_processings[file_id]["counts_per_second"]:
-                        self.active_processings[file_id]["counts_per_second"][sec_key] = []
-                    self.active_processings[file_id]["counts_per_second"][sec_key].append(count)
-                    
-                    # Minimal sleep to yield control
-                    await asyncio.sleep(0.001)
+                    if len(pending) >= inference_scheduler.max_batch_size:
+                        await self._record_result(file_id, *pending.popleft(), total_frames, fps)
                 
                 frame_idx += 1
             
+            while pending:
+                await self._record_result(file_id, *pending.popleft(), total_frames, fps)
+            
             # Calculate final stats
             counts = self.active_processings[file_id]["counts"]
             if counts:
@@ -142,6 +150,35 @@ class VideoProcessor:
         finally:
             cap.release()
             
+    async def _record_result(self, file_id, frame_idx, future, fresh, total_frames, fps):
+        """
+        Wait for one frame's detection and record it in the processing status.
+        fresh is False when the motion gate reused an earlier frame's future.
+        """
+        annotated_frame, detections = await asyncio.wrap_future(future)
+        count = detections.count
+        
+        if fresh and annotated_frame is not None:
+            # Encode frame as base64 JPEG for live preview
+            _, buffer = cv2.imencode('.jpg', annotated_frame, [cv2.IMWRITE_JPEG_QUALITY, 60])
+            self.active_processings[file_id]["preview_frame"] = base64.b64encode(buffer).decode('utf-8')
+        
+        self.active_processings[file_id]["current_count"] = count
+        self.active_processings[file_id]["counts"].append(count)
+        self.active_processings[file_id]["frames_processed"] += 1
+        progress = int((frame_idx / max(total_frames, 1)) * 100)
+        self.active_processings[file_id]["progress"] = min(progress, 99)
+        
+        # Track which second this frame belongs to
+        video_second = int(frame_idx / fps) if fps > 0 else 0
+        if "counts_per_second" not in self.active_processings[file_id]:
+            self.active_processings[file_id]["counts_per_second"] = {}
+        
+        sec_key = str(video_second)
+        if sec_key not in self.active_processings[file_id]["counts_per_second"]:
+            self.active_processings[file_id]["counts_per_second"][sec_key] = []
+        self.active_processings[file_id]["counts_per_second"][sec_key].append(count)
+            
     def get_status(self, file_id):
         # 1. Check active memory
         status = self.active_processings.get(file_id)
@@ -0,0 +1,58 @@
+from concurrent.futures import Future
+
+import numpy as np
+
+from services.abandoned_object_detector import AbandonedObjectDetector
+from services.detector import Detections
+from services.inference_scheduler import inference_scheduler
+
+
+def scheduled(detections):
+    future = Future()
+    future.set_result((None, detections))
+    return future
+
+
+def test_detects_through_scheduler_and_returns_markers(monkeypatch):
+    submitted = []
+
+    def submit(frame, conf_threshold=0.25, annotate=False, classes=(0,), max_det=100, iou=0.45):
+        submitted.append((conf_threshold, list(classes), max_det, iou))
+        return scheduled(Detections(
+            boxes=np.array([[10, 10, 40, 90], [50, 60, 70, 90]], dtype=np.float32),
+            confidences=np.array([0.9, 0.8], dtype=np.float32),
+            classes=np.array([0, 28], dtype=np.int32),
+        ))
+    monkeypatch.setattr(inference_scheduler, "submit", submit)
+
+    detector = AbandonedObjectDetector()
+    assert detector.model is None
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    result = detector.process_frame(frame, 0.0, annotate=False)
+
+    # Same settings as the former direct YOLO call (ultralytics defaults), not the person detector's
+    assert submitted == [(AbandonedObjectDetector.CONFIDENCE_THRESHOLD,
+                          [0] + list(AbandonedObjectDetector.OBJECT_CLASSES), 300, 0.7)]
+    assert result["frame"] is None
+    assert result["persons_detected"] == 1 and result["objects_detected"] == 1
+    persons, objects = result["markers"]
+    assert [bbox for _, bbox in persons] == [(10, 10, 40, 90)]
+    assert [(bbox, state) for _, bbox, state in objects] == [((50, 60, 70, 90), "tracked")]
+
+    # Drawing uses the returned markers, not whatever the detector processed last
+    detector.process_frame(frame, 1.0, annotate=False)
+    canvas = frame.copy()
+    detector.draw(canvas, ([], []))
+    assert not canvas.any()
+    detector.draw(canvas, result["markers"])
+    assert canvas.any()
+
+
+def test_stalled_scheduler_yields_empty_frame(monkeypatch):
+    pending = Future()
+    monkeypatch.setattr(inference_scheduler, "submit", lambda frame, **kwargs: pending)
+    monkeypatch.setattr(AbandonedObjectDetector, "DETECT_TIMEOUT_SECONDS", 0.05)
+
+    result = AbandonedObjectDetector().process_frame(np.zeros((10, 10, 3), dtype=np.uint8), 0.0, annotate=False)
+    assert result["persons_detected"] == 0 and result["objects_detected"] == 0
+    assert pending.cancelled()
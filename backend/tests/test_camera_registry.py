@@ -0,0 +1,76 @@
+import json
+import os
+import threading
+
+import pytest
+
+from services import camera_registry as registry_module
+from services.camera_registry import CameraRegistry, _file_lock
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "data" / "saved_cameras.json")
+
+
+def read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_changes_are_written_through_in_order(path):
+    registry = CameraRegistry(path)
+    assert registry.list() == []
+    registry.add({"id": "a", "name": "A"})
+    registry.add({"id": "b", "name": "B"})
+    updated = registry.update("a", {"name": "A2", "id": "ignored"})
+    assert updated == {"id": "a", "name": "A2"}
+    assert registry.update("missing", {"name": "x"}) is None
+    assert read(path) == [{"id": "a", "name": "A2"}, {"id": "b", "name": "B"}]
+
+    assert registry.delete("b") and not registry.delete("b")
+    assert read(path) == [{"id": "a", "name": "A2"}]
+    # A new registry loads what the first one wrote
+    assert CameraRegistry(path).get("a") == {"id": "a", "name": "A2"}
+
+
+def test_update_replaces_instead_of_mutating(path):
+    registry = CameraRegistry(path)
+    original = registry.add({"id": "a", "name": "A"})
+    registry.update("a", {"name": "A2"})
+    assert original == {"id": "a", "name": "A"}
+
+
+def test_failed_write_keeps_previous_file(path, monkeypatch):
+    registry = CameraRegistry(path)
+    registry.add({"id": "a", "name": "A"})
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(registry_module.json, "dump", fail)
+    with pytest.raises(OSError):
+        registry.add({"id": "b", "name": "B"})
+
+    assert read(path) == [{"id": "a", "name": "A"}]
+    leftovers = [name for name in os.listdir(os.path.dirname(path)) if name.endswith(".tmp")]
+    assert leftovers == []
+
+
+def test_write_waits_for_file_lock(path):
+    registry = CameraRegistry(path)
+    registry.add({"id": "a"})
+    done = threading.Event()
+
+    def writer():
+        registry.add({"id": "b"})
+        done.set()
+
+    with _file_lock(path):
+        thread = threading.Thread(target=writer)
+        thread.start()
+        # Another holder of the lock (e.g. a second backend process) blocks the write
+        assert not done.wait(0.3)
+        assert read(path) == [{"id": "a"}]
+    thread.join(5)
+    assert done.is_set()
+    assert read(path) == [{"id": "a"}, {"id": "b"}]
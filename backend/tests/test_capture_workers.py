@@ -0,0 +1,101 @@
+import queue
+
+import numpy as np
+import pytest
+
+from services import shm_ring
+from services.capture_workers import RemoteCapture, _RingSink
+from services.shm_ring import SharedFrameRing
+from services.stream_metrics import StreamMetrics
+from services.stream_supervisor import StreamHealth
+
+
+class FakeSlot:
+    def __init__(self):
+        self.frames = []
+
+    def put(self, frame, captured_at=None):
+        self.frames.append((frame, captured_at))
+
+
+def frame(value):
+    return np.full((4, 6, 3), value, dtype=np.uint8)
+
+
+@pytest.fixture
+def pipe():
+    """A worker-side sink and an API-side RemoteCapture joined by an in-process event queue."""
+    events = queue.Queue()
+    sink = _RingSink("cam", events, max_fps=1000)
+    slot = FakeSlot()
+    slots = {"slot": slot}
+    stream = {"health": StreamHealth(), "metrics": StreamMetrics()}
+    remote = RemoteCapture("cam", stream, lambda: slots["slot"], lambda: 5.0)
+
+    def deliver(value, captured_at):
+        sink.deliver(frame(value), captured_at, decode_ms=1.0)
+        while not events.empty():
+            remote.on_event(events.get())
+
+    yield sink, remote, slots, deliver
+    remote.finish()
+    sink.close()
+
+
+def test_frames_reach_the_slot_and_are_acknowledged(pipe):
+    sink, remote, slots, deliver = pipe
+    deliver(1, 1.0)
+    assert len(slots["slot"].frames) == 1
+    assert slots["slot"].frames[0][1] == 1.0
+    assert remote.ring.read_seq == remote.ring.write_seq == 1
+    assert sink.ring.target_fps == 5.0
+    assert sink.wants_frame(2.0)
+
+
+def test_dropped_frame_does_not_stall_capture(pipe):
+    sink, remote, slots, deliver = pipe
+    deliver(1, 1.0)
+    # No slot (e.g. the stream is being torn down): the frame is dropped...
+    slots["slot"] = None
+    deliver(2, 2.0)
+    # ...but acknowledged, so the worker keeps decoding
+    assert sink.wants_frame(3.0)
+    slots["slot"] = FakeSlot()
+    deliver(3, 3.0)
+    assert [captured_at for _, captured_at in slots["slot"].frames] == [3.0]
+
+
+def test_overwritten_frame_is_dropped_and_acknowledged(pipe):
+    sink, remote, slots, deliver = pipe
+    deliver(1, 1.0)
+    # The worker laps the ring before the API process reads the notice for seq 2
+    for value in range(2, 2 + shm_ring.SLOTS + 1):
+        sink.ring.write(frame(value), float(value))
+    remote.on_event(("frame", "cam", 2, 2.0, 1.0, 1))
+    assert len(slots["slot"].frames) == 1
+    remote.on_event(("frame", "cam", sink.ring.write_seq, 5.0, 1.0, 1))
+    assert remote.ring.read_seq == sink.ring.write_seq
+    assert sink.wants_frame(10.0)
+
+
+def test_ack_never_moves_backwards():
+    ring = SharedFrameRing.create((2, 2, 3))
+    try:
+        ring.ack(5)
+        ring.ack(3)
+        assert ring.read_seq == 5
+    finally:
+        ring.close()
+
+
+def test_attach_does_not_register_with_resource_tracker(monkeypatch):
+    ring = SharedFrameRing.create((2, 2, 3))
+    registered = []
+    monkeypatch.setattr(shm_ring.resource_tracker, "register", lambda name, rtype: registered.append(name))
+    try:
+        attached = SharedFrameRing.attach(ring.name)
+        assert attached.shape == (2, 2, 3)
+        assert registered == []
+        attached.close()
+    finally:
+        ring.close()
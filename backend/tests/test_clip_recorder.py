@@ -0,0 +1,91 @@
+from services import clip_recorder as clip_module
+from services.clip_recorder import ClipBuffer, ClipRecorder
+
+
+def jpeg(i, size=10):
+    return bytes([i % 256]) * size
+
+
+def wait_for_writes():
+    # The writer pool has a single thread, so this runs after every queued write
+    clip_module._writer_pool.submit(lambda: None).result(timeout=5)
+
+
+def test_buffer_drops_frames_older_than_its_window():
+    buffer = ClipBuffer(seconds=5, max_bytes=10 ** 6)
+    for t in range(10):
+        buffer.add(jpeg(t), float(t))
+    assert [ts for ts, _ in buffer.frames] == [4.0, 5.0, 6.0, 7.0, 8.0, 9.0]
+    assert buffer.bytes == 60
+    assert buffer.latest_time == 9.0
+
+
+def test_buffer_respects_byte_cap():
+    buffer = ClipBuffer(seconds=100, max_bytes=35)
+    for t in range(10):
+        buffer.add(jpeg(t), float(t))
+    assert [ts for ts, _ in buffer.frames] == [7.0, 8.0, 9.0]
+    assert buffer.bytes == 30
+
+
+def test_republished_frame_is_counted_once():
+    buffer = ClipBuffer(seconds=2, max_bytes=10 ** 6)
+    same = jpeg(1)
+    for t in range(3):
+        buffer.add(same, float(t))
+    assert len(buffer.frames) == 3 and buffer.bytes == 10
+    for t in range(3, 6):
+        buffer.add(jpeg(t), float(t))
+    assert [ts for ts, _ in buffer.frames] == [3.0, 4.0, 5.0]
+    assert buffer.bytes == 30
+
+
+def test_window_is_inclusive():
+    buffer = ClipBuffer(seconds=100, max_bytes=10 ** 6)
+    for t in range(10):
+        buffer.add(jpeg(t), float(t))
+    assert [ts for ts, _ in buffer.window(2.0, 4.0)] == [2.0, 3.0, 4.0]
+
+
+def test_clip_covers_pre_and_post_window(tmp_path):
+    recorder = ClipRecorder(clips_dir=str(tmp_path))
+    assert not recorder.request_clip("cam", "none")  # nothing buffered yet
+    for t in range(20):
+        recorder.add_frame("cam", jpeg(t), float(t))
+    assert recorder.request_clip("cam", "clip1", event_time=19.0, pre_seconds=3, post_seconds=2,
+                                 metadata={"type": "fight"})
+    recorder.add_frame("cam", jpeg(20), 20.0)
+    wait_for_writes()
+    assert recorder.get_manifest("clip1") is None  # window not over yet
+    recorder.add_frame("cam", jpeg(21), 21.0)
+    wait_for_writes()
+
+    manifest = recorder.get_manifest("clip1")
+    assert manifest["frames"] == 6  # 16..21
+    assert [entry["t"] for entry in manifest["index"]] == [-3.0, -2.0, -1.0, 0.0, 1.0, 2.0]
+    assert manifest["metadata"] == {"type": "fight"}
+    with open(recorder.clip_file("clip1"), "rb") as f:
+        assert f.read() == b"".join(jpeg(t) for t in range(16, 22))
+    assert recorder.get_stats()["buffers"]["cam"]["pending_clips"] == 0
+
+
+def test_pending_clip_keeps_frames_past_buffer_window(tmp_path):
+    recorder = ClipRecorder(clips_dir=str(tmp_path))
+    recorder.buffers["cam"] = ClipBuffer(seconds=2, max_bytes=10 ** 6)
+    recorder.add_frame("cam", jpeg(0), 0.0)
+    recorder.request_clip("cam", "long", event_time=0.0, pre_seconds=0, post_seconds=5)
+    for t in range(1, 6):
+        recorder.add_frame("cam", jpeg(t), float(t))
+    wait_for_writes()
+    assert recorder.get_manifest("long")["frames"] == 6
+
+
+def test_closing_source_writes_pending_clip(tmp_path):
+    recorder = ClipRecorder(clips_dir=str(tmp_path))
+    for t in range(5):
+        recorder.add_frame("cam", jpeg(t), float(t))
+    recorder.request_clip("cam", "cut", pre_seconds=2, post_seconds=10)
+    recorder.close_source("cam")
+    wait_for_writes()
+    assert recorder.get_manifest("cut")["frames"] == 3  # 2..4, the source ended early
+    assert "cam" not in recorder.buffers
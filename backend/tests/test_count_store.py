@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+import pytest
+
+from services.count_store import LEVELS_BY_NAME, CountStore
+
+# On an hour boundary, so T0 starts a bucket at every level
+T0 = 1_700_000_000 // 3600 * 3600
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CountStore(root=str(tmp_path))
+    yield store
+    store.close()
+
+
+def test_samples_roll_up_into_every_level(store):
+    for second, count in enumerate([3, 5, 4, 8]):
+        store.append("cam", T0 + second + 0.4, count)
+    store.append("cam", T0 + 60, 10)
+
+    fine = store.query("cam", T0, T0 + 60, resolution="1s")
+    assert fine["resolution"] == "1s"
+    assert fine["timestamps"].tolist() == [T0, T0 + 1, T0 + 2, T0 + 3, T0 + 60]
+    assert fine["mean"].tolist() == [3, 5, 4, 8, 10]
+
+    minutes = store.query("cam", T0, T0 + 60, resolution="1m")
+    assert minutes["timestamps"].tolist() == [T0, T0 + 60]
+    assert minutes["samples"].tolist() == [4, 1]
+    assert minutes["mean"].tolist() == [5.0, 10.0]
+    assert minutes["min"].tolist() == [3, 10]
+    assert minutes["max"].tolist() == [8, 10]
+
+    hours = store.query("cam", T0, T0 + 60, resolution="1h")
+    assert hours["timestamps"].tolist() == [T0]
+    assert hours["samples"].tolist() == [5]
+    assert hours["mean"][0] == pytest.approx(6.0)
+
+
+def test_query_picks_finest_level_within_point_budget(store):
+    assert store.query("cam", T0, T0 + 600)["resolution"] == "1s"
+    assert store.query("cam", T0, T0 + 6 * 3600)["resolution"] == "1m"
+    assert store.query("cam", T0, T0 + 7 * 86400)["resolution"] == "15m"
+    assert store.query("cam", T0, T0 + 365 * 86400)["resolution"] == "1h"
+    assert store.query("cam", T0, T0 + 100, max_points=10)["resolution"] == "1m"
+
+
+def test_query_range_and_empty_results(store):
+    for second in range(10):
+        store.append("cam", T0 + second, second)
+    series = store.query("cam", T0 + 3, T0 + 5, resolution="1s")
+    assert series["timestamps"].tolist() == [T0 + 3, T0 + 4, T0 + 5]
+    assert store.query("cam", T0 + 100, T0 + 200, resolution="1s")["timestamps"].size == 0
+    assert store.query("other", T0, T0 + 10)["mean"].size == 0
+
+
+def test_query_spans_segment_files(store):
+    day = LEVELS_BY_NAME["1s"].segment_seconds
+    boundary = (T0 // day + 1) * day
+    store.append("cam", boundary - 1, 1)
+    store.append("cam", boundary, 2)
+    series = store.query("cam", boundary - 1, boundary, resolution="1s")
+    assert series["timestamps"].tolist() == [boundary - 1, boundary]
+    assert series["mean"].tolist() == [1, 2]
+    assert len(os.listdir(os.path.join(store.root, "cam", "1s"))) == 2
+
+
+def test_closed_segments_are_read_back_from_disk(store, tmp_path):
+    store.append("cam", T0, 7)
+    store.close("cam")
+    assert store.get_stats()["open_segments"] == 0
+    reopened = CountStore(root=str(tmp_path))
+    assert reopened.query("cam", T0, T0, resolution="1s")["mean"].tolist() == [7]
+    # A restart keeps adding to the same bucket
+    reopened.append("cam", T0, 9)
+    assert reopened.query("cam", T0, T0, resolution="1s")["samples"].tolist() == [2]
+    reopened.close()
+
+
+def test_writer_segments_are_bounded(tmp_path):
+    store = CountStore(root=str(tmp_path), max_open_segments=4)
+    for camera in ("a", "b", "c"):
+        store.append(camera, T0, 1)
+    assert store.get_stats()["open_segments"] == 4
+    assert store.query("a", T0, T0, resolution="1s")["mean"].tolist() == [1]
+    store.close()
+
+
+def test_record_and_release_run_off_the_caller(store):
+    for second in range(3):
+        store.record("cam", T0 + second, second + 1)
+    store.release("cam")
+    store.close()  # waits for the queued writes
+    series = store.query("cam", T0, T0 + 2, resolution="1s")
+    assert np.array_equal(series["mean"], [1, 2, 3])
+    assert store.samples_written == 3
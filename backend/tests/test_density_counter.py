@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from services.density_counter import DensityCounter, choose_engine
+from services.detector import Detections
+
+
+def people(*centres):
+    boxes = np.array([[x - 5, y - 10, x + 5, y + 10] for x, y in centres], dtype=np.float32).reshape(-1, 4)
+    return Detections(boxes, np.ones(len(boxes), dtype=np.float32), np.zeros(len(boxes), dtype=np.int32))
+
+
+def test_fixed_engines_ignore_the_count():
+    assert choose_engine("density", "detection", 0, 150) == "density"
+    assert choose_engine("detection", "density", 10 ** 6, 150) == "detection"
+
+
+def test_auto_switches_with_hysteresis():
+    assert choose_engine("auto", "detection", 149, 150) == "detection"
+    assert choose_engine("auto", "detection", 150, 150) == "density"
+    # Stays on density until the count drops below 80% of the threshold
+    assert choose_engine("auto", "density", 121, 150) == "density"
+    assert choose_engine("auto", "density", 119, 150) == "detection"
+
+
+def test_heatmap_integrates_to_count_times_calibration():
+    counter = DensityCounter(model_path="")
+    detections = people((20, 30), (22, 32), (100, 60), (159, 119))
+    density_map = counter.heatmap(detections, (120, 160, 3), calibration=1.5)
+    assert density_map.shape == (15, 20)
+    assert float(density_map.sum()) == pytest.approx(6.0, rel=1e-4)
+
+
+def test_empty_scene_counts_zero_and_renders():
+    counter = DensityCounter(model_path="")
+    frame = np.zeros((64, 64, 3), dtype=np.uint8)
+    annotated, count = counter.count_from_detections(frame, Detections.empty(), annotate=True)
+    assert count == 0
+    assert annotated.shape == frame.shape and not np.shares_memory(annotated, frame)
+
+
+def test_model_path_requires_a_model():
+    counter = DensityCounter(model_path="")
+    assert not counter.has_model
+    with pytest.raises(RuntimeError):
+        counter.estimate(np.zeros((8, 8, 3), dtype=np.uint8))
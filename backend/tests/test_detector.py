@@ -0,0 +1,38 @@
+import numpy as np
+
+from services.detector import Detections, ObjectDetector
+
+
+def make(boxes, confidences):
+    return Detections(
+        boxes=np.array(boxes, dtype=np.float32).reshape(-1, 4),
+        confidences=np.array(confidences, dtype=np.float32),
+        classes=np.zeros(len(confidences), dtype=np.int32),
+    )
+
+
+def test_filter_and_top():
+    dets = make([[0, 0, 10, 10], [5, 5, 20, 20], [1, 1, 2, 2]], [0.9, 0.2, 0.5])
+    assert np.allclose(dets.filter(0.25).confidences, [0.9, 0.5])
+    assert dets.filter(0.1) is dets
+    top = dets.top(2)
+    assert np.allclose(top.confidences, [0.9, 0.5])
+    assert top.boxes[1].tolist() == [1, 1, 2, 2]
+
+
+def test_transformed_and_concatenate():
+    dets = make([[0, 0, 10, 20]], [0.8])
+    moved = dets.transformed(scale_x=0.5, scale_y=2, offset_x=10, offset_y=5)
+    assert moved.boxes[0].tolist() == [5, 10, 10, 50]
+    merged = Detections.concatenate([dets, Detections.empty(), moved])
+    assert merged.count == 2
+    assert Detections.concatenate([Detections.empty()]).count == 0
+
+
+def test_annotate_copies_unless_asked():
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    dets = make([[10, 30, 40, 90]], [0.9])
+    annotated = ObjectDetector().annotate(frame, dets)
+    assert annotated is not frame
+    assert frame.sum() == 0 and annotated.sum() > 0
+    assert ObjectDetector().annotate(frame, dets, copy=False) is frame
@@ -0,0 +1,59 @@
+import struct
+
+import numpy as np
+import pytest
+
+from services.frame_protocol import HEADER, MAGIC, pack_frame, unpack_frame
+
+JPEG = b"\xff\xd8jpeg-bytes\xff\xd9"
+
+
+def test_round_trip_with_boxes():
+    boxes = np.array([[0.1, 0.2, 0.3, 0.4, 0.9], [0.5, 0.5, 0.75, 1.0, 0.6]], dtype=np.float64)
+    data = pack_frame(7, 2, 1700000000.25, JPEG, captured_at=1699999999.5, boxes=boxes)
+    assert len(data) == HEADER.size + 2 * 20 + len(JPEG)
+
+    frame = unpack_frame(data)
+    assert (frame.seq, frame.count) == (7, 2)
+    assert frame.timestamp == 1700000000.25
+    assert frame.captured_at == 1699999999.5
+    assert frame.boxes.dtype == np.float32 and frame.boxes.shape == (2, 5)
+    assert np.allclose(frame.boxes, boxes)
+    assert frame.jpeg == JPEG
+
+
+def test_round_trip_without_boxes():
+    frame = unpack_frame(pack_frame(1, 0, 5.0, JPEG))
+    assert frame.boxes is None
+    assert frame.captured_at is None
+    assert frame.jpeg == JPEG
+
+
+def test_empty_box_array_is_distinct_from_no_boxes():
+    frame = unpack_frame(pack_frame(1, 0, 5.0, JPEG, boxes=np.zeros((0, 5))))
+    assert frame.boxes is not None and frame.boxes.shape == (0, 5)
+
+
+def test_header_layout_matches_documented_offsets():
+    data = pack_frame(2 ** 32 + 3, 12, 1.5, JPEG, captured_at=0.5, boxes=np.ones((1, 5)))
+    assert data[:4] == MAGIC
+    assert data[4] == 1 and data[5] == 1
+    assert struct.unpack_from("<H", data, 6)[0] == 1
+    assert struct.unpack_from("<I", data, 8)[0] == 3  # sequence wraps at 32 bits
+    assert struct.unpack_from("<I", data, 12)[0] == 12
+    assert struct.unpack_from("<dd", data, 16) == (1.5, 0.5)
+    assert data[32 + 20:] == JPEG
+
+
+def test_negative_count_is_clamped():
+    assert unpack_frame(pack_frame(1, -4, 0.0, JPEG)).count == 0
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"CRWD", "shorter"),
+    (b"XXXX" + pack_frame(1, 0, 0.0, JPEG)[4:], "magic"),
+    (pack_frame(1, 0, 0.0, JPEG)[:4] + b"\x02" + pack_frame(1, 0, 0.0, JPEG)[5:], "version"),
+])
+def test_rejects_malformed_messages(data, message):
+    with pytest.raises(ValueError, match=message):
+        unpack_frame(data)
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from services.frame_slot import LatestFrameSlot
+
+
+def frame(value):
+    return np.full((2, 2, 3), value, dtype=np.uint8)
+
+
+def test_latest_frame_overwrites_untaken_one():
+    async def scenario():
+        slot = LatestFrameSlot()
+        slot.put(frame(1), 1.0)
+        slot.put(frame(2), 2.0)
+        captured = await slot.get(timeout=1)
+        assert captured.captured_at == 2.0 and captured.frame[0, 0, 0] == 2
+        assert slot.frames_put == 2 and slot.frames_dropped == 1
+        assert not slot.has_pending
+
+    asyncio.run(scenario())
+
+
+def test_put_from_thread_wakes_waiter():
+    async def scenario():
+        slot = LatestFrameSlot(asyncio.get_running_loop())
+        waiter = asyncio.ensure_future(slot.get(timeout=5))
+        await asyncio.sleep(0)
+        thread = threading.Thread(target=slot.put, args=(frame(7), 7.0))
+        thread.start()
+        captured = await waiter
+        thread.join()
+        assert captured.captured_at == 7.0
+
+    asyncio.run(scenario())
+
+
+def test_get_times_out_without_frames():
+    async def scenario():
+        assert await LatestFrameSlot().get(timeout=0.01) is None
+
+    asyncio.run(scenario())
+
+
+def test_close_releases_waiter_and_ignores_later_frames():
+    async def scenario():
+        slot = LatestFrameSlot()
+        waiter = asyncio.ensure_future(slot.get(timeout=5))
+        await asyncio.sleep(0)
+        slot.close()
+        assert await waiter is None
+        slot.put(frame(1))
+        assert slot.take() is None and slot.frames_put == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from services.headless_analytics import HeadlessAnalytics
+
+
+class FakeService:
+    """Just the RTSPCameraService surface the headless runner drives."""
+
+    def __init__(self):
+        self.saved = []
+        self.active_streams = {}
+        self.consumers = {}
+        self.pipelines = []
+        self.start_ok = True
+
+    def get_saved_cameras(self):
+        return self.saved
+
+    async def start_stream(self, camera_id):
+        if not self.start_ok:
+            return False
+        self.active_streams[camera_id] = {"info": {}}
+        return True
+
+    def add_consumer(self, camera_id):
+        self.consumers[camera_id] = self.consumers.get(camera_id, 0) + 1
+
+    def remove_consumer(self, camera_id):
+        self.consumers[camera_id] -= 1
+
+    def _ensure_pipeline(self, camera_id):
+        self.pipelines.append(camera_id)
+
+    def headless_fps(self, camera_id):
+        return 1.0
+
+
+@pytest.fixture
+def runner():
+    service = FakeService()
+    return service, HeadlessAnalytics(service, enabled=True)
+
+
+def test_starts_headless_cameras_and_follows_rate_changes(runner):
+    service, headless = runner
+    service.saved = [{"id": "a", "headless": True}, {"id": "b"}]
+    asyncio.run(headless.sync())
+    assert headless.attached == {"a"}
+    assert set(service.active_streams) == {"a"}
+    assert service.active_streams["a"]["headless"] is True
+    assert service.consumers == {"a": 1} and service.pipelines == ["a"]
+
+    service.saved[0]["headless_fps"] = 0.5
+    asyncio.run(headless.sync())
+    assert service.consumers == {"a": 1}  # no second reference
+    assert service.active_streams["a"]["info"]["headless_fps"] == 0.5
+
+
+def test_releases_camera_when_flag_is_turned_off(runner):
+    service, headless = runner
+    service.saved = [{"id": "a", "headless": True}]
+    asyncio.run(headless.sync())
+
+    service.saved = [{"id": "a", "headless": False}]
+    asyncio.run(headless.sync())
+    assert headless.attached == set()
+    assert service.consumers == {"a": 0}
+    assert service.active_streams["a"]["headless"] is False
+
+
+def test_reattaches_after_stream_stops(runner):
+    service, headless = runner
+    service.saved = [{"id": "a", "headless": True}]
+    asyncio.run(headless.sync())
+
+    service.active_streams.clear()  # e.g. gave up after repeated failures
+    service.consumers.clear()
+    asyncio.run(headless.sync())
+    assert headless.attached == {"a"}
+    assert service.consumers == {"a": 1}
+    assert service.pipelines == ["a", "a"]
+
+
+def test_failed_start_is_retried_on_next_sync(runner):
+    service, headless = runner
+    service.saved = [{"id": "a", "headless": True}]
+    service.start_ok = False
+    asyncio.run(headless.sync())
+    assert headless.attached == set() and service.consumers == {}
+
+    service.start_ok = True
+    asyncio.run(headless.sync())
+    assert headless.attached == {"a"}
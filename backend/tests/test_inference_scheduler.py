@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from services.detector import Detections, ObjectDetector
+from services.inference_scheduler import InferenceScheduler
+
+
+@pytest.fixture
+def fake_detector(monkeypatch):
+    """ObjectDetector whose models are stand-ins; detection returns no boxes."""
+    monkeypatch.setattr(ObjectDetector, "detect_batch",
+                        lambda self, frames, **kwargs: [Detections.empty() for _ in frames])
+    return monkeypatch
+
+
+def frame():
+    return np.zeros((48, 64, 3), dtype=np.uint8)
+
+
+def test_replica_serves_and_is_ready(fake_detector):
+    fake_detector.setattr(ObjectDetector, "create_replica", lambda self, index=0: object())
+    scheduler = InferenceScheduler(replicas=1, max_wait_ms=0)
+    assert not scheduler.is_ready()
+    annotated, detections = scheduler.submit(frame()).result(timeout=5)
+    assert annotated is None and detections.count == 0
+    assert scheduler.is_ready()
+    assert scheduler.get_stats()["fallback_replicas"] == []
+
+
+def test_failed_replica_falls_back_to_shared_model_and_stays_ready(fake_detector):
+    def fail(self, index=0):
+        raise RuntimeError("weights missing")
+    fake_detector.setattr(ObjectDetector, "create_replica", fail)
+    fake_detector.setattr(ObjectDetector, "model", property(lambda self: object()))
+    scheduler = InferenceScheduler(replicas=1, max_wait_ms=0)
+    _, detections = scheduler.submit(frame()).result(timeout=5)
+    assert detections.count == 0
+    assert scheduler.is_ready()
+    assert scheduler.get_stats()["fallback_replicas"] == [0]
+
+
+def test_not_ready_when_shared_model_fails_too(fake_detector):
+    def fail(self, index=0):
+        raise RuntimeError("weights missing")
+
+    def fail_shared(self):
+        raise RuntimeError("weights missing")
+    fake_detector.setattr(ObjectDetector, "create_replica", fail)
+    fake_detector.setattr(ObjectDetector, "model", property(fail_shared))
+    scheduler = InferenceScheduler(replicas=1, max_wait_ms=0)
+    scheduler.submit(frame()).result(timeout=5)  # the detect stand-in still answers
+    assert not scheduler.is_ready()
+
+
+def test_batch_runs_one_pass_per_class_set(monkeypatch):
+    calls = []
+
+    def detect_batch(self, frames, classes=(0,), **kwargs):
+        calls.append((tuple(classes), len(frames)))
+        return [Detections.empty() for _ in frames]
+    monkeypatch.setattr(ObjectDetector, "detect_batch", detect_batch)
+    monkeypatch.setattr(ObjectDetector, "create_replica", lambda self, index=0: object())
+    scheduler = InferenceScheduler(replicas=1, max_batch_size=3, max_wait_ms=500)
+    futures = [
+        scheduler.submit(frame()),
+        scheduler.submit(frame(), classes=(0, 24, 26)),
+        scheduler.submit(frame()),
+    ]
+    for future in futures:
+        future.result(timeout=5)
+    assert sorted(calls) == [((0,), 2), ((0, 24, 26), 1)]
+    assert scheduler.get_stats()["batches_run"] == 1
+
+
+def test_nms_settings_are_passed_per_group(monkeypatch):
+    calls = []
+
+    def detect_batch(self, frames, classes=(0,), iou=0.45, max_det=100, **kwargs):
+        calls.append((tuple(classes), iou, list(max_det)))
+        return [Detections.empty() for _ in frames]
+    monkeypatch.setattr(ObjectDetector, "detect_batch", detect_batch)
+    monkeypatch.setattr(ObjectDetector, "create_replica", lambda self, index=0: object())
+    scheduler = InferenceScheduler(replicas=1, max_batch_size=2, max_wait_ms=500)
+    futures = [scheduler.submit(frame()), scheduler.submit(frame(), classes=(0, 24), max_det=300, iou=0.7)]
+    for future in futures:
+        future.result(timeout=5)
+    assert sorted(calls) == [((0,), 0.45, [100]), ((0, 24), 0.7, [300])]
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from routers import rtsp_camera as rtsp_router
+from routers.rtsp_camera import MJPEG_BOUNDARY, mjpeg_stream
+from services.stream_hub import FramePacket
+
+
+@pytest.fixture
+def packets(monkeypatch):
+    """Serve a fixed list of packets for any camera, recording when the subscription is released."""
+    state = {"closed": False, "packets": []}
+
+    async def generate_packets(camera_id, variant="full"):
+        try:
+            for packet in state["packets"]:
+                yield packet
+        finally:
+            state["closed"] = True
+
+    monkeypatch.setattr(rtsp_router.rtsp_camera_service, "get_stream_status", lambda camera_id: {"id": camera_id})
+    monkeypatch.setattr(rtsp_router.rtsp_camera_service, "generate_packets", generate_packets)
+    return state
+
+
+def packet(seq, timestamp, jpeg):
+    return FramePacket(seq=seq, variants={"full": jpeg, "half": b"h"}, count=seq * 2, timestamp=timestamp)
+
+
+async def body(response):
+    return [chunk async for chunk in response.body_iterator]
+
+
+def test_multipart_framing(packets):
+    packets["packets"] = [packet(1, 10.0, b"\xff\xd8one\xff\xd9"), packet(2, 10.1, b"\xff\xd8two\xff\xd9")]
+    response = asyncio.run(mjpeg_stream("cam"))
+    assert response.media_type == f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}"
+    assert response.headers["cache-control"] == "no-cache, no-store"
+
+    chunks = asyncio.run(body(response))
+    assert chunks[0] == (
+        f"--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: 7\r\n"
+        f"X-Person-Count: 2\r\n\r\n"
+    ).encode() + b"\xff\xd8one\xff\xd9\r\n"
+    assert chunks[1].endswith(b"X-Person-Count: 4\r\n\r\n\xff\xd8two\xff\xd9\r\n")
+    assert packets["closed"]
+
+
+def test_per_client_fps_cap_skips_frames(packets):
+    packets["packets"] = [packet(i, 100.0 + i * 0.1, bytes([i])) for i in range(1, 11)]
+    chunks = asyncio.run(body(asyncio.run(mjpeg_stream("cam", fps=2))))
+    # 10 frames over 0.9 s at 2 fps per client
+    assert len(chunks) == 2
+
+
+def test_rejects_bad_parameters(packets):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(mjpeg_stream("cam", variant="huge"))
+    assert error.value.status_code == 400
+    with pytest.raises(HTTPException):
+        asyncio.run(mjpeg_stream("cam", fps=0))
@@ -0,0 +1,50 @@
+import numpy as np
+
+from services.motion_gate import MotionGate
+
+
+def scene(shift: int = 0):
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    frame[80:160, 100 + shift:160 + shift] = 255
+    return frame
+
+
+def test_static_scene_reuses_last_result():
+    gate = MotionGate(max_age=10)
+    assert gate.should_infer(scene(), now=0.0)
+    gate.update("result", now=0.0)
+    assert not gate.should_infer(scene(), now=1.0)
+    assert gate.last_result == "result"
+    assert gate.get_stats()["skipped"] == 1
+
+
+def test_motion_triggers_inference():
+    gate = MotionGate(max_age=10)
+    gate.should_infer(scene(), now=0.0)
+    gate.update("first", now=0.0)
+    assert gate.should_infer(scene(shift=60), now=1.0)
+
+
+def test_result_expires_after_max_age():
+    gate = MotionGate(max_age=5)
+    gate.should_infer(scene(), now=0.0)
+    gate.update("first", now=0.0)
+    assert not gate.should_infer(scene(), now=4.0)
+    assert gate.should_infer(scene(), now=5.0)
+
+
+def test_slow_changes_accumulate_against_last_inferred_frame():
+    gate = MotionGate(threshold=0.015, max_age=100)
+    gate.should_infer(scene(), now=0.0)
+    gate.update("first", now=0.0)
+    # Each step is tiny, but the reference stays at the last inferred frame
+    results = [gate.should_infer(scene(shift=step), now=float(step)) for step in range(1, 40)]
+    assert not results[0]
+    assert any(results)
+
+
+def test_disabled_gate_always_infers():
+    gate = MotionGate(enabled=False)
+    gate.should_infer(scene(), now=0.0)
+    gate.update("first", now=0.0)
+    assert gate.should_infer(scene(), now=1.0)
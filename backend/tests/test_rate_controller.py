@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from services import rate_controller as rate_module
+from services.rate_controller import RATE_DECREASE, RATE_INCREASE, RateController
+
+
+@pytest.fixture
+def controller():
+    controller = RateController(enabled=True)
+    controller.register("a", min_fps=2, max_fps=10)
+    controller.register("b", min_fps=1, max_fps=4)
+    return controller
+
+
+def adjust(controller, cpu, backlog=0.0):
+    controller.cpu = cpu
+    controller.backlog = backlog
+    controller._adjust()
+
+
+def test_cameras_start_at_max_fps(controller):
+    assert controller.rate("a", 0) == 10
+    assert controller.rate("b", 0) == 4
+    assert controller.rate("unknown", 7.5) == 7.5
+
+
+def test_saturation_cuts_multiplicatively_down_to_min(controller):
+    adjust(controller, cpu=0.95)
+    assert controller.state == "saturated"
+    assert controller.rate("a", 0) == pytest.approx(10 * RATE_DECREASE)
+    assert controller.rate("b", 0) == pytest.approx(4 * RATE_DECREASE)
+    for _ in range(20):
+        adjust(controller, cpu=0.95)
+    assert controller.rate("a", 0) == 2
+    assert controller.rate("b", 0) == 1
+
+
+def test_inference_backlog_counts_as_saturation(controller):
+    adjust(controller, cpu=0.1, backlog=1.5)
+    assert controller.state == "saturated"
+    assert controller.rate("a", 0) < 10
+
+
+def test_headroom_grows_additively_up_to_max(controller):
+    for _ in range(3):
+        adjust(controller, cpu=0.95)
+    before = controller.rate("a", 0), controller.rate("b", 0)
+    adjust(controller, cpu=0.2)
+    assert controller.state == "headroom"
+    assert controller.rate("a", 0) == pytest.approx(before[0] + RATE_INCREASE)
+    assert controller.rate("b", 0) == pytest.approx(min(4, before[1] + RATE_INCREASE))
+    for _ in range(20):
+        adjust(controller, cpu=0.2)
+    assert controller.rate("a", 0) == 10 and controller.rate("b", 0) == 4
+
+
+def test_between_thresholds_or_with_backlog_holds_rates(controller):
+    adjust(controller, cpu=0.95)
+    rates = controller.rate("a", 0), controller.rate("b", 0)
+    adjust(controller, cpu=0.75)
+    assert controller.state == "steady"
+    adjust(controller, cpu=0.2, backlog=0.5)
+    assert controller.state == "steady"
+    assert (controller.rate("a", 0), controller.rate("b", 0)) == rates
+
+
+def test_new_camera_starts_at_fair_share_when_throttled(controller):
+    for _ in range(2):
+        adjust(controller, cpu=0.95)
+    throttled = [controller.rate("a", 0), controller.rate("b", 0)]
+    controller.register("c", min_fps=1, max_fps=30)
+    assert controller.rate("c", 0) == pytest.approx(sum(throttled) / 2)
+
+
+def test_cpu_includes_capture_workers(monkeypatch):
+    controller = RateController(enabled=True)
+    workers = [{"pid": 101, "alive": True}, {"pid": 102, "alive": False}]
+    monkeypatch.setattr(rate_module.capture_pool, "get_stats", lambda: {"workers": workers})
+    cpu_seconds = {101: 5.0, 102: 50.0}
+    monkeypatch.setattr(rate_module, "_process_cpu_seconds", lambda pid: cpu_seconds[pid])
+
+    # A live worker seen for the first time counts its CPU since start; dead workers are skipped
+    assert controller._sample_worker_cpu() == 5.0
+    cpu_seconds[101] = 7.5
+    assert controller._sample_worker_cpu() == 2.5
+    assert controller._sample_worker_cpu() == 0.0
+
+
+def test_reads_own_cpu_from_proc():
+    seconds = rate_module._process_cpu_seconds(os.getpid())
+    if seconds is None:
+        pytest.skip("/proc not available")
+    assert seconds >= 0
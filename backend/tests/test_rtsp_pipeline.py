@@ -0,0 +1,77 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from services import rtsp_camera as rtsp_module
+from services.frame_slot import LatestFrameSlot
+from services.motion_gate import MotionGate
+from services.rtsp_camera import FRAME_SIZE, STREAM_VARIANTS, RTSPCameraService, _encode_variants
+from services.stream_hub import stream_hub
+from services.stream_metrics import StreamMetrics
+from services.stream_supervisor import StreamHealth
+
+
+def test_variants_are_encoded_at_their_own_size():
+    frame = np.zeros((FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.uint8)
+    encoded = _encode_variants(frame, {"full", "thumb"})
+    assert set(encoded) == {"full", "thumb"}
+    for name, jpeg in encoded.items():
+        decoded = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        assert (decoded.shape[1], decoded.shape[0]) == STREAM_VARIANTS[name][0]
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """A service with one fake camera whose counting engine and count store are stand-ins."""
+    encodes = []
+
+    def encode(frame, variants):
+        encodes.append(sorted(variants))
+        return {name: name.encode() for name in variants}
+
+    async def process_frame(self, camera_id, camera_info, frame, annotate=True):
+        return (frame if annotate else None), 3, None
+
+    monkeypatch.setattr(rtsp_module, "_encode_variants", encode)
+    monkeypatch.setattr(rtsp_module, "CLIPS_ENABLED", False)
+    monkeypatch.setattr(rtsp_module.count_store, "record", lambda *args: None)
+    monkeypatch.setattr(RTSPCameraService, "_process_frame", process_frame)
+
+    def start(service):
+        service.frame_slots["cam"] = LatestFrameSlot()
+        service.active_streams["cam"] = {
+            "info": {"name": "Cam", "location": "Test"},
+            "motion_gate": MotionGate(),
+            "metrics": StreamMetrics(),
+            "health": StreamHealth(),
+        }
+
+    yield start, encodes
+    stream_hub.close("cam")
+
+
+def test_each_variant_is_encoded_once_per_frame_for_all_subscribers(pipeline):
+    start, encodes = pipeline
+
+    async def scenario():
+        service = RTSPCameraService()
+        start(service)
+        subscribers = [service.generate_packets("cam", variant) for variant in ("full", "full", "full", "thumb")]
+        nexts = [asyncio.ensure_future(packets.__anext__()) for packets in subscribers]
+        await asyncio.sleep(0.05)  # let every subscriber register before the frame arrives
+
+        service.frame_slots["cam"].put(np.zeros((8, 8, 3), dtype=np.uint8), 1.0)
+        packets = await asyncio.wait_for(asyncio.gather(*nexts), 5)
+
+        assert encodes == [["full", "thumb"]]
+        assert len({id(packet) for packet in packets}) == 1
+        assert packets[0].variants == {"full": b"full", "thumb": b"thumb"}
+        assert packets[0].count == 3
+        for packets_gen in subscribers:
+            await packets_gen.aclose()
+        service.active_streams.clear()
+        await asyncio.sleep(0.6)  # pipeline notices the stream is gone
+
+    asyncio.run(scenario())
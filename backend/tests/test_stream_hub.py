@@ -0,0 +1,61 @@
+import asyncio
+
+from services.stream_hub import DEFAULT_VARIANT, StreamHub
+
+
+def test_subscribers_share_one_packet():
+    async def scenario():
+        hub = StreamHub()
+        channel = hub.subscribe("cam")
+        assert hub.subscribe("cam") is channel
+        waiters = [asyncio.ensure_future(channel.wait_next(0, timeout=1)) for _ in range(3)]
+        await asyncio.sleep(0)
+        packet = channel.publish({DEFAULT_VARIANT: b"jpeg"}, count=4)
+        received = await asyncio.gather(*waiters)
+        assert all(item is packet for item in received)
+        assert packet.seq == 1 and packet.frame_bytes == b"jpeg"
+        assert hub.subscriber_count("cam") == 2
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscriber_skips_to_newest_packet():
+    async def scenario():
+        channel = StreamHub().subscribe("cam")
+        for count in range(5):
+            channel.publish({DEFAULT_VARIANT: bytes([count])}, count=count)
+        # A subscriber that last saw seq 1 gets the newest packet, not a backlog
+        packet = await channel.wait_next(1, timeout=1)
+        assert packet.seq == 5 and packet.count == 4
+        assert await channel.wait_next(5, timeout=0.01) is None
+
+    asyncio.run(scenario())
+
+
+def test_wanted_variants_follow_subscriptions():
+    async def scenario():
+        hub = StreamHub()
+        channel = hub.subscribe("cam", "half")
+        hub.subscribe("cam", "thumb")
+        assert channel.wanted_variants() == {"half", "thumb"}
+        hub.unsubscribe(channel, "thumb")
+        assert channel.wanted_variants() == {"half"}
+        hub.unsubscribe(channel, "half")
+        hub.unsubscribe(channel, "half")  # extra releases never go negative
+        assert channel.wanted_variants() == set() and channel.subscribers == 0
+
+    asyncio.run(scenario())
+
+
+def test_close_releases_waiters_and_resubscribe_gets_new_channel():
+    async def scenario():
+        hub = StreamHub()
+        channel = hub.subscribe("cam")
+        waiter = asyncio.ensure_future(channel.wait_next(0, timeout=5))
+        await asyncio.sleep(0)
+        hub.close("cam")
+        assert await waiter is None
+        assert hub.subscriber_count("cam") == 0
+        assert hub.subscribe("cam") is not channel
+
+    asyncio.run(scenario())
@@ -0,0 +1,52 @@
+import pytest
+
+from services.stream_metrics import RateWindow, RollingWindow, StreamMetrics, percentile, render_prometheus
+
+
+def test_nearest_rank_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 0.99) == 99
+    assert percentile([7.0], 0.99) == 7.0
+
+
+def test_rolling_window_keeps_recent_samples_and_lifetime_totals():
+    window = RollingWindow(size=100)
+    for value in range(1, 201):
+        window.add(float(value))
+    summary = window.summary()
+    # Percentiles over the last 100 samples (101..200); totals over all 200
+    assert summary["window"] == 100
+    assert summary["p50"] == 150 and summary["p95"] == 195 and summary["p99"] == 199
+    assert summary["max"] == 200 and summary["mean"] == 150.5
+    assert summary["count"] == 200 and summary["sum"] == sum(range(1, 201))
+
+
+def test_empty_window_summary():
+    summary = RollingWindow(size=10).summary()
+    assert summary["window"] == 0 and summary["p95"] is None and summary["mean"] is None
+
+
+def test_rate_window():
+    rates = RateWindow(size=10)
+    assert rates.rate(now=0) == 0.0
+    for i in range(10):
+        rates.mark(now=i * 0.5)
+    assert rates.rate(now=4.5) == pytest.approx(2.0)
+    # A stalled source reads as slowing down
+    assert rates.rate(now=13.5) == pytest.approx(9 / 13.5)
+    assert rates.total == 10
+
+
+def test_prometheus_rendering():
+    metrics = StreamMetrics(window=10)
+    metrics.record("inference_ms", 12.0)
+    snapshot = {**metrics.snapshot(), "subscribers": 3}
+    text = render_prometheus({'cam "1"': snapshot})
+    assert '# TYPE crowdex_stream_subscribers gauge' in text
+    assert 'crowdex_stream_subscribers{camera="cam \\"1\\""} 3.0' in text
+    assert 'crowdex_stream_inference_milliseconds{camera="cam \\"1\\"",quantile="0.95"} 12.0' in text
+    assert 'crowdex_stream_inference_milliseconds_count{camera="cam \\"1\\""} 1' in text
+    assert 'crowdex_stream_decode_milliseconds{camera="cam \\"1\\"",quantile="0.5"} NaN' in text
+    assert text.endswith("\n")
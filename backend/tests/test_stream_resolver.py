@@ -0,0 +1,72 @@
+import asyncio
+import stat
+import sys
+import threading
+import time
+
+import pytest
+
+from services import stream_resolver as resolver_module
+from services.stream_resolver import StreamResolver, parse_expiry
+
+PAGE = "https://www.youtube.com/watch?v=abc"
+
+
+@pytest.fixture
+def fake_yt_dlp(tmp_path, monkeypatch):
+    """A yt-dlp stand-in printing a googlevideo URL that expires in an hour."""
+    expire = int(time.time()) + 3600
+    script = tmp_path / "yt-dlp"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        f"print('https://r1.googlevideo.com/videoplayback?expire={expire}&id=1')\n"
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(resolver_module, "find_yt_dlp", lambda: str(script))
+    return expire
+
+
+async def _bind(resolver):
+    resolver.bind()
+
+
+async def _cancel_others():
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_parse_expiry():
+    assert parse_expiry("https://x.googlevideo.com/videoplayback?expire=1700000000&a=b") == 1700000000
+    assert parse_expiry("https://x.googlevideo.com/api/manifest/hls/expire/1700000000/id/1") == 1700000000
+    assert parse_expiry("https://example.com/stream.m3u8") is None
+
+
+def test_threadsafe_without_loop_resolves_synchronously(fake_yt_dlp):
+    resolver = StreamResolver()
+    url = resolver.resolve_threadsafe(PAGE)
+    assert url is not None and parse_expiry(url) == fake_yt_dlp
+    # Cached, but no refresh task tied to a throwaway loop
+    assert resolver.cached(PAGE) == url
+    assert resolver._refreshes == {}
+    assert resolver.resolve_threadsafe(PAGE) == url
+    assert resolver.runs == 1 and resolver.cache_hits == 1
+
+
+def test_threadsafe_runs_on_bound_loop(fake_yt_dlp):
+    resolver = StreamResolver()
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(_bind(resolver), loop).result(5)
+        url = resolver.resolve_threadsafe(PAGE)
+        assert parse_expiry(url) == fake_yt_dlp
+        task = resolver._refreshes[PAGE]
+        assert task.get_loop() is loop and not task.done()
+    finally:
+        asyncio.run_coroutine_threadsafe(_cancel_others(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
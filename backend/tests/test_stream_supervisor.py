@@ -0,0 +1,154 @@
+import pytest
+
+from services import stream_supervisor as supervisor_module
+from services.stream_supervisor import StreamHealth, StreamSupervisor, backoff_delay
+
+
+class FakeThread:
+    def __init__(self, alive=True):
+        self.alive = alive
+
+    def is_alive(self):
+        return self.alive
+
+
+class FakeMetrics:
+    def __init__(self):
+        self.reconnects = 0
+
+    def record_reconnect(self):
+        self.reconnects += 1
+
+
+class FakeService:
+    """The parts of RTSPCameraService the supervisor uses."""
+
+    def __init__(self):
+        self.active_streams = {}
+        self.consumers = {}
+        self.stopped = []
+        self.started = []
+
+    def add(self, camera_id, now=0.0):
+        self.active_streams[camera_id] = {
+            "health": StreamHealth(), "thread": FakeThread(), "metrics": FakeMetrics(), "last_consumed": now,
+        }
+        return self.active_streams[camera_id]
+
+    def consumer_count(self, camera_id):
+        return self.consumers.get(camera_id, 0)
+
+    def stop_stream(self, camera_id, reason="stopped"):
+        self.stopped.append((camera_id, reason))
+        self.active_streams.pop(camera_id, None)
+
+    def _start_capture(self, camera_id):
+        self.started.append(camera_id)
+        self.active_streams[camera_id]["thread"] = FakeThread()
+
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    # Upper end of the jitter range: delay == the full exponential step
+    monkeypatch.setattr(supervisor_module.random, "uniform", lambda low, high: high)
+
+
+def test_backoff_doubles_up_to_cap(no_jitter):
+    assert [backoff_delay(n, base=1, cap=10) for n in range(1, 7)] == [1, 2, 4, 8, 10, 10]
+    assert backoff_delay(0, base=1, cap=10) == 1
+
+
+def test_backoff_jitter_stays_in_upper_half():
+    delays = [backoff_delay(4, base=1, cap=60) for _ in range(200)]
+    assert all(4 <= delay <= 8 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_failed_capture_restarts_after_backoff(no_jitter):
+    service = FakeService()
+    service.consumers["cam"] = 1
+    stream = service.add("cam")
+    supervisor = StreamSupervisor(service, idle_timeout=60, max_failures=3)
+
+    stream["thread"].alive = False
+    stream["health"].ended("error", "connection refused")
+    supervisor.check("cam", now=100.0)
+    health = stream["health"]
+    assert health.state == "reconnecting" and health.failures == 1
+    assert health.next_restart_at == 101.0
+
+    supervisor.check("cam", now=100.5)
+    assert service.started == []
+    supervisor.check("cam", now=101.0)
+    assert service.started == ["cam"]
+    assert health.restarts == 1 and stream["metrics"].reconnects == 1
+
+
+def test_gives_up_after_max_failures(no_jitter):
+    service = FakeService()
+    service.consumers["cam"] = 1
+    stream = service.add("cam")
+    supervisor = StreamSupervisor(service, idle_timeout=60, max_failures=2)
+    now = 0.0
+    for expected_delay in (1, 2):
+        stream["thread"].alive = False
+        stream["health"].ended("error", "timeout")
+        supervisor.check("cam", now=now)
+        assert stream["health"].next_restart_at == now + expected_delay
+        now += expected_delay
+        supervisor.check("cam", now=now)
+    stream["thread"].alive = False
+    supervisor.check("cam", now=now)
+    assert stream["health"].state == "failed"
+    assert service.stopped == [("cam", "failed")]
+
+
+def test_end_of_file_loops_immediately_and_resets_streak(no_jitter):
+    service = FakeService()
+    service.consumers["cam"] = 1
+    stream = service.add("cam")
+    stream["health"].failures = 2
+    supervisor = StreamSupervisor(service, idle_timeout=60, max_failures=3)
+    stream["thread"].alive = False
+    stream["health"].ended("eof")
+    supervisor.check("cam", now=50.0)
+    assert stream["health"].failures == 0
+    assert stream["health"].next_restart_at == 50.0
+
+
+def test_stable_session_restarts_failure_streak(no_jitter):
+    service = FakeService()
+    service.consumers["cam"] = 1
+    stream = service.add("cam")
+    health = stream["health"]
+    health.failures = 5
+    health.connected_at = 0.0
+    health.last_frame_at = supervisor_module.STABLE_SECONDS + 1
+    stream["thread"].alive = False
+    health.ended("error", "reset by peer")
+    StreamSupervisor(service, idle_timeout=60, max_failures=3).check("cam", now=100.0)
+    assert health.failures == 1 and health.state == "reconnecting"
+
+
+def test_idle_stream_is_stopped():
+    service = FakeService()
+    service.add("cam", now=0.0)
+    supervisor = StreamSupervisor(service, idle_timeout=60)
+    supervisor.check("cam", now=30.0)
+    assert service.stopped == []
+    service.consumers["cam"] = 1
+    supervisor.check("cam", now=59.0)  # consumed: idle clock restarts
+    service.consumers["cam"] = 0
+    supervisor.check("cam", now=100.0)
+    assert service.stopped == []
+    supervisor.check("cam", now=119.0)
+    assert service.stopped == [("cam", "idle")]
+
+
+def test_healthy_stream_without_frames_is_stalled():
+    service = FakeService()
+    service.consumers["cam"] = 1
+    stream = service.add("cam")
+    stream["health"].frame(10.0)
+    StreamSupervisor(service).check("cam", now=10.0 + supervisor_module.STALL_SECONDS + 1)
+    assert stream["health"].state == "stalled"
@@ -0,0 +1,16 @@
+from routers.threat_analysis import _build_detectors
+
+
+def test_each_analysis_gets_its_own_detectors():
+    threat_types = ["fight", "abandoned_object", "accident"]
+    first = _build_detectors(threat_types, testing_mode=True)
+    second = _build_detectors(threat_types, testing_mode=False)
+
+    assert set(first) == set(threat_types)
+    for threat_type in threat_types:
+        assert first[threat_type] is not second[threat_type]
+        assert first[threat_type].testing_mode and not second[threat_type].testing_mode
+
+
+def test_only_requested_detectors_are_built():
+    assert list(_build_detectors(["accident"], testing_mode=False)) == ["accident"]
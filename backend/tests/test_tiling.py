@@ -0,0 +1,50 @@
+import numpy as np
+
+from services.detector import Detections, merge_tiles, tile_windows
+
+
+def dets(boxes, confidences):
+    return Detections(
+        boxes=np.array(boxes, dtype=np.float32).reshape(-1, 4),
+        confidences=np.array(confidences, dtype=np.float32),
+        classes=np.zeros(len(confidences), dtype=np.int32),
+    )
+
+
+# A 1000x640 frame in 640px tiles with 20% overlap: x 0-640 and 360-1000, seam strip x 360-640
+WINDOWS = tile_windows(640, 1000, tile_size=640, overlap=0.2)
+
+
+def test_tile_windows_cover_frame_with_full_size_tiles():
+    assert WINDOWS.tolist() == [[0, 0, 640, 640], [360, 0, 1000, 640]]
+    windows = tile_windows(1080, 1920, 640, 0.2)
+    assert (windows[:, 2] - windows[:, 0] == 640).all() and (windows[:, 3] - windows[:, 1] == 640).all()
+    assert windows[:, 2].max() == 1920 and windows[:, 3].max() == 1080
+
+
+def test_overlapping_people_in_one_tile_are_kept():
+    # Two distinct, heavily overlapping people, plus a small box nested in a larger one
+    left = dets([[100, 100, 200, 400], [130, 110, 230, 410], [400, 100, 600, 500], [450, 150, 500, 250]],
+                [0.9, 0.8, 0.7, 0.6])
+    merged = merge_tiles([left, Detections.empty()], WINDOWS)
+    assert merged.count == 4
+
+
+def test_person_split_across_seam_is_merged():
+    # Tile 0 sees the left part of a person at x 580-700 (cut at its edge x=640);
+    # tile 1 sees the whole person (local x 220-340)
+    partial = dets([[580, 100, 640, 400]], [0.6])
+    full = dets([[220, 100, 340, 400]], [0.9])
+    merged = merge_tiles([partial, full], WINDOWS)
+    assert merged.count == 1
+    assert merged.boxes[0].tolist() == [580, 100, 700, 400]
+    assert np.isclose(merged.confidences[0], 0.9)
+
+
+def test_overlapping_people_in_seam_seen_by_both_tiles_count_twice():
+    # Two overlapping people inside the shared strip, each found by both tiles
+    people = [[400, 100, 500, 400], [430, 100, 530, 400]]
+    tile0 = dets(people, [0.9, 0.8])
+    tile1 = dets([[x1 - 360, y1, x2 - 360, y2] for x1, y1, x2, y2 in people], [0.85, 0.75])
+    merged = merge_tiles([tile0, tile1], WINDOWS)
+    assert merged.count == 2